@@ -0,0 +1,279 @@
+#!/usr/bin/env python
+"""
+File Description: File defining the vectorized batch simulation function used for DWRS.
+    Instead of building Crane, Robot and Ship objects for a single replication, this engine simulates R replications in
+    lock-step. The state of the docking station is held in NumPy arrays of shape (R,), (R, C), (R, T) and (R, L) and
+    the Brain.decision rules are applied to all replications at once with masked array operations. Work ends are stored
+    as time steps instead of being counted down, and at every time step only the cranes that can act are visited, in
+    the same order as in the time stepped engine, so each replication gives identical results in deterministic mode.
+"""
+
+# ******************************************    Libraries to be imported    ****************************************** #
+from __future__ import print_function, division
+import numpy as np
+from distributions import Exponential
+from samplers import Sampler, replication_rng, source_rng
+from online_stats import TAIL_QUANTILE, BatchOnlineStats
+from utils import ENGINE_VERSION
+from result_cache import cache_key
+from sim_class_def import WORK_NONE, WORK_CSP, WORK_CPT, WORK_CST
+
+# Number of replications simulated together by the main simulation when using the batch engine.
+BATCH_SIZE = 1000
+
+
+# ****************************************        Function Declaration        **************************************** #
+def simulate_batch(params, num_reps, rng=np.random):
+    """
+    Function that implements the simulation of a batch of replications in lock-step.
+
+    :param dict params: A dictionary containing parameters.
+    :param int num_reps: Number of replications (R) simulated together.
+    :param rng: The random number generator to sample from (np.random.Generator, the global np.random or
+        RandomStreams).
+    :return: The result dictionary of the simulation, holding an array of R values for every result.
+    """
+    sim_ctrl = params['SIM_CTRL']
+    det_params = params['D_PARAMS']
+    st_params = params['S_PARAMS']
+
+    t_sim_in = sim_ctrl['T_SIM_IN']
+    num_cranes, num_robots = det_params['C'], det_params['T']
+    max_len, capacity = det_params['L'], det_params['P']
+
+    if params['MODE'] == 'deterministic':
+        arr_sampler = Sampler(det_params['A_MEAN'], rng)
+    else:
+        arr_sampler = Sampler(Exponential(det_params['A_MEAN']), source_rng(rng, 'ARRIVAL'))
+    k_sampler = Sampler(st_params['K'], source_rng(rng, 'K'))
+    csp_sampler = Sampler(st_params['CSP'], source_rng(rng, 'CSP'), minimum=1)
+    cpt_sampler = Sampler(st_params['CPT'], source_rng(rng, 'CPT'), minimum=1)
+    cst_sampler = Sampler(st_params['CST'], source_rng(rng, 'CST'), minimum=1)
+
+    # Ship queue: a ring buffer of (arrival time, number of containers) per replication.
+    next_arr = arr_sampler.draw_block(num_reps)
+    q_arr_time = np.zeros((num_reps, max(max_len, 1)), dtype=int)
+    q_num_cont = np.zeros((num_reps, max(max_len, 1)), dtype=int)
+    q_head = np.zeros(num_reps, dtype=int)
+    q_len = np.zeros(num_reps, dtype=int)
+
+    # Robots. Instead of counting down their remaining work time every time step, the time step at which they are free
+    # again is stored: a robot is working at the time steps before r_free_at. A docking station without robots holds a
+    # robot that is always locked, so that the robot axis is never empty.
+    r_locked = np.zeros((num_reps, max(num_robots, 1)), dtype=bool)
+    r_locked[:, num_robots:] = True
+    r_free_at = np.zeros((num_reps, max(num_robots, 1)), dtype=int)
+
+    # Cranes, their pallets and docked ships, stored flat at index (replication * C + crane) for fast indexing.
+    # A docked ship count of -1 means that no ship is docked. A crane finishes its work at the time step c_done_at, or
+    # at the first time step its robot is free after it, and c_done_at is past the simulation when it has no work.
+    crane_order = np.arange(num_reps * num_cranes).reshape(num_reps, num_cranes)
+    ranks = np.arange(num_cranes)
+    c_rank = np.tile(ranks, num_reps)
+    c_work_type = np.zeros(num_reps * num_cranes, dtype=int)
+    c_work_time = np.full(num_reps * num_cranes, -1, dtype=int)
+    c_done_at = np.full(num_reps * num_cranes, t_sim_in, dtype=int)
+    c_robot = np.full(num_reps * num_cranes, -1, dtype=int)
+    c_pallet = np.zeros(num_reps * num_cranes, dtype=int)
+    c_ship = np.full(num_reps * num_cranes, -1, dtype=int)
+    c_serv_start = np.zeros(num_reps * num_cranes, dtype=int)
+
+    # Most cranes have nothing to do at most time steps: they are working, or have no ship while the queue is empty. A
+    # crane is only visited from the time step c_visit_at on, which is its c_done_at unless it can dock, undock or
+    # decide on a new work. Only the replications whose work times changed have their cranes sorted again.
+    c_visit_at = np.full(num_reps * num_cranes, t_sim_in, dtype=int)
+    resort = np.zeros(num_reps, dtype=bool)
+
+    # A robot is suitable if it is free or finishes its work before the estimated time of the crane work.
+    cst_wait = max(cst_sampler.dist.estimate, 1)
+    cpt_wait = max(cpt_sampler.dist.estimate, 1)
+
+    # Statistics.
+    s_stats = BatchOnlineStats(num_reps, quantiles=(TAIL_QUANTILE,))
+    wq_stats = BatchOnlineStats(num_reps, quantiles=(TAIL_QUANTILE,))
+    q_sum, q_max = np.zeros(num_reps, dtype=int), np.zeros(num_reps, dtype=int)
+    c_var = np.zeros(num_reps, dtype=int)
+
+    for t_step in range(t_sim_in):
+        # Ship arrivals. Ships balk if the queue is full. The cranes of the replications are visited to dock them.
+        arrive = np.flatnonzero(next_arr == t_step)
+        if len(arrive):
+            num_cont = k_sampler.draw_block(len(arrive))
+            fits = q_len[arrive] < max_len
+            ind, num_cont = arrive[fits], num_cont[fits]
+            pos = (q_head[ind] + q_len[ind]) % max_len
+            q_arr_time[ind, pos] = t_step
+            q_num_cont[ind, pos] = num_cont
+            q_len[ind] += 1
+            c_visit_at[crane_order[ind]] = t_step
+
+            # Several arrivals in the same time step count as a single arrival.
+            while len(arrive):
+                next_arr[arrive] += arr_sampler.draw_block(len(arrive))
+                arrive = arrive[next_arr[arrive] == t_step]
+
+        # Cranes are served in the order of their work time, with ties kept in the previous order.
+        ind = np.flatnonzero(resort)
+        if len(ind) and num_cranes > 1:
+            ind_order = crane_order[ind]
+            ind_order = np.take_along_axis(ind_order, np.argsort(c_work_time[ind_order], axis=1, kind='stable'), axis=1)
+            crane_order[ind] = ind_order
+            c_rank[ind_order] = ranks
+        resort[ind] = False
+
+        # The cranes to visit at this time step, in the order of their replications.
+        due = np.flatnonzero(c_visit_at <= t_step)
+        due_rank = c_rank[due]
+
+        for rank in range(num_cranes):
+            crane = due[due_rank == rank] if num_cranes > 1 else due
+            if not len(crane):
+                continue
+            visit = crane // num_cranes
+            ship = c_ship[crane]
+
+            # Dock the next ship in the queue to cranes without a ship.
+            sel = np.flatnonzero((ship < 0) & (q_len[visit] > 0))
+            if len(sel):
+                ind, ind_c = visit[sel], crane[sel]
+                head = q_head[ind]
+                c_ship[ind_c] = q_num_cont[ind, head]
+                c_serv_start[ind_c] = t_step
+                wq_stats.push(ind, t_step - q_arr_time[ind, head])
+                q_head[ind] = (head + 1) % max_len
+                q_len[ind] -= 1
+
+            # Undock empty ships.
+            sel = np.flatnonzero(ship == 0)
+            if len(sel):
+                ind, ind_c = visit[sel], crane[sel]
+                s_stats.push(ind, t_step - c_serv_start[ind_c])
+                c_ship[ind_c] = -1
+
+            # The Brain.decision rules, applied to the idle cranes with a docked ship or a loaded pallet.
+            ship, pallet = c_ship[crane], c_pallet[crane]
+            sel = np.flatnonzero((c_work_type[crane] == WORK_NONE) & ((ship >= 0) | (pallet > 0)))
+            if len(sel):
+                ind, ind_c = visit[sel], crane[sel]
+                has_ship, pallet = ship[sel] >= 0, pallet[sel]
+
+                # The first unlocked robot that is free or about to finish its work.
+                wait_end = np.where(has_ship, t_step + cst_wait, t_step + cpt_wait)
+                robot_ok = ~r_locked[ind] & (r_free_at[ind] < wait_end[:, None])
+                robot = robot_ok.argmax(axis=1)
+                found = robot_ok[np.arange(len(ind)), robot]
+
+                work_sel = ((WORK_CSP, has_ship & ~found & (pallet < capacity), csp_sampler),
+                            (WORK_CPT, ~has_ship & found, cpt_sampler), (WORK_CST, has_ship & found, cst_sampler))
+                for code, code_sel, sampler in work_sel:
+                    code_sel = np.flatnonzero(code_sel)
+                    if not len(code_sel):
+                        continue
+                    code_ind, code_c = ind[code_sel], ind_c[code_sel]
+                    resort[code_ind] = True
+                    work_time = sampler.draw_block(len(code_sel))
+                    c_work_type[code_c] = code
+                    c_work_time[code_c] = work_time
+                    c_done_at[code_c] = t_step + work_time - 1
+                    if code == WORK_CPT:
+                        c_pallet[code_c] -= 1
+                    else:
+                        c_ship[code_c] -= 1
+                    if code != WORK_CSP:
+                        c_robot[code_c] = robot[code_sel]
+                        r_locked[code_ind, robot[code_sel]] = True
+
+            # Cranes finish their work.
+            sel = np.flatnonzero(c_done_at[crane] <= t_step)
+            if len(sel):
+                ind, ind_c = visit[sel], crane[sel]
+                to_pallet = c_work_type[ind_c] == WORK_CSP
+                c_pallet[ind_c[to_pallet]] += 1
+
+                # A crane handing over to a robot that is still working has to wait for it. The robot counts the
+                # container as transported when it finishes its work within the simulation.
+                robot = c_robot[ind_c]
+                wait = ~to_pallet & (r_free_at[ind, robot] > t_step)
+                handover = ~to_pallet & ~wait
+                r_free_at[ind[handover], robot[handover]] = t_step + det_params['TC']
+                r_locked[ind[handover], robot[handover]] = False
+                if t_step + det_params['TC'] < t_sim_in:
+                    c_var[ind[handover]] += 1
+
+                ind, ind_c = ind[~wait], ind_c[~wait]
+                resort[ind] = True
+                c_work_type[ind_c] = WORK_NONE
+                c_work_time[ind_c] = -1
+                c_done_at[ind_c] = t_sim_in
+                c_robot[ind_c] = -1
+
+            # The next visit of the cranes: at the next time step if they can dock, undock or decide on a new work.
+            ship = c_ship[crane]
+            visit_now = (ship == 0) | ((ship < 0) & (q_len[visit] > 0)) | (
+                (c_work_type[crane] == WORK_NONE) & ((ship >= 0) | (c_pallet[crane] > 0)))
+            c_visit_at[crane] = np.where(visit_now, t_step, c_done_at[crane])
+
+        q_sum += q_len
+        np.maximum(q_max, q_len, out=q_max)
+
+    result = dict()
+    result['MEAN_SERV_TIME'] = s_stats.mean         # Mean service time
+    result['MEAN_WQ_TIME'] = wq_stats.mean          # Mean queue wait time
+    result['MEAN_Q_LEN'] = q_sum / t_sim_in         # Mean queue length
+    result['CARGO_TRANS'] = c_var                   # Number of cargo containers transported to city
+    result['SHIPS_SERVICED'] = s_stats.count        # Number of ships processed
+
+    result['STD_SERV_TIME'] = s_stats.std
+    result['P90_SERV_TIME'] = s_stats.quantile(TAIL_QUANTILE)
+    result['MAX_SERV_TIME'] = s_stats.maximum
+    result['STD_WQ_TIME'] = wq_stats.std
+    result['P90_WQ_TIME'] = wq_stats.quantile(TAIL_QUANTILE)
+    result['MAX_WQ_TIME'] = wq_stats.maximum
+    result['MAX_Q_LEN'] = q_max
+    return result
+
+
+# ****************************************        Function Declaration        **************************************** #
+def replicate_batch(params, seed_seq, num_reps, cache=None):
+    """
+    Function that runs a batch of replications with its own random number generator.
+    Being a module level function, it can be dispatched to the workers of a process pool.
+
+    :param dict params: A dictionary containing parameters.
+    :param np.random.SeedSequence seed_seq: The seed sequence of this batch.
+    :param int num_reps: Number of replications in the batch.
+    :param ResultCache cache: Optional result cache. A cached result is returned instead of simulating again.
+    :return: The result dictionary of the batch, holding an array of num_reps values for every result.
+    """
+    if cache is None:
+        return simulate_batch(params, num_reps, rng=replication_rng(params, seed_seq))
+
+    key = cache_key(params, seed_seq, ENGINE_VERSION, num_reps)
+    result = cache.get(key)
+    if result is None:
+        result = simulate_batch(params, num_reps, rng=replication_rng(params, seed_seq))
+        cache.put(key, result)
+    return result
+
+
+# ****************************************        Function Declaration        **************************************** #
+def split_batch_result(batch_result):
+    """
+    Function that splits the result dictionary of a batch into the result dictionaries of its replications.
+
+    :param dict batch_result: The result dictionary of a batch.
+    :return: A list of result dictionaries, one per replication.
+    """
+    num_reps = len(batch_result['SHIPS_SERVICED'])
+    return [{key: val[ind] for key, val in batch_result.items()} for ind in range(num_reps)]
+
+
+# ******************************************        Isolated Testing        ****************************************** #
+if __name__ == '__main__':
+    raise NotImplementedError('Isolated testing not implemented. Test it with the simulation function.')
+
+"""
+Author(s): Yash Bansod, Shivam Mishra
+Repository: https://github.com/YashBansod
+Organization: University of Maryland at College Park
+"""
@@ -0,0 +1,227 @@
+#!/usr/bin/env python
+"""
+Dock Worker Robot Simulation Benchmark.
+"""
+
+# ******************************************    Libraries to be imported    ****************************************** #
+from __future__ import print_function, division
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+import numpy as np
+from os.path import join, exists
+from utils import load_params, param_interpreter
+from simulation_func import replicate
+from batch_simulation import replicate_batch
+
+# Benchmark configurations: (name, parameter file, {parameter name: value} overrides). The slow configuration has work
+# times of tens of minutes, where the next-event engine skips most time steps.
+CONFIGS = [('ex_1', 'parameters_ex_1.py', {}),
+           ('ex_2', 'parameters_ex_2.py', {}),
+           ('ex_1_long', 'parameters_ex_1.py', {'T_SIM_IN': 14400}),
+           ('ex_2_long', 'parameters_ex_2.py', {'T_SIM_IN': 14400}),
+           ('ex_1_large', 'parameters_ex_1.py', {'C': 8, 'T': 16, 'L': 100, 'A_MEAN': 10}),
+           ('ex_2_large', 'parameters_ex_2.py', {'C': 8, 'T': 16, 'L': 100, 'A_MEAN': 10}),
+           ('ex_1_slow', 'parameters_ex_1.py', {'CSP': ('triangular', 20, 30, 40), 'CPT': ('triangular', 20, 30, 40),
+                                                'CST': ('triangular', 30, 50, 60), 'TC': 60, 'A_MEAN': 300})]
+ENGINES = ('time_step', 'event', 'batch')
+
+# Measures compared between benchmark runs, with True if higher is better.
+MEASURES = {'REPS_PER_SEC': True, 'NS_PER_MINUTE': False, 'PEAK_MEM_KB': False}
+
+
+# ******************************************        Main Program Start      ****************************************** #
+def main(args):
+    """
+    The main of the program.
+    """
+    if args.compare:
+        history = load_history(args.history)
+        if len(history) < 2:
+            raise ValueError("The benchmark history needs at least two entries to compare.")
+        regressions = compare(history[args.base], history[-1], args.threshold)
+        if regressions:
+            sys.exit(1)
+        return
+
+    entry = {'TIME': time.strftime('%Y-%m-%d %H:%M:%S'), 'COMMIT': _git_commit(), 'PYTHON': platform.python_version(),
+             'NUMPY': np.__version__, 'NUM_REPS': args.num_reps, 'RESULTS': dict()}
+    for name, param_file, overrides in CONFIGS:
+        for engine in ENGINES:
+            params = load_config(join(args.dir_path, param_file), overrides, engine)
+            result = bench_config(params, args.num_reps, args.repeat, args.memory)
+            entry['RESULTS']['%s/%s' % (name, engine)] = result
+            print("%-24s %-13s %10.1f reps/s %12.1f ns/minute %12s KB peak" % (
+                '%s/%s' % (name, engine), params['MODE'], result['REPS_PER_SEC'], result['NS_PER_MINUTE'],
+                '-' if result['PEAK_MEM_KB'] is None else '%.1f' % result['PEAK_MEM_KB']))
+
+    history = load_history(args.history)
+    history.append(entry)
+    with open(args.history, 'w') as history_file:
+        json.dump(history, history_file, indent=2)
+
+    if len(history) > 1:
+        compare(history[args.base], history[-1], args.threshold)
+
+
+# ****************************************        Function Declaration        **************************************** #
+def load_config(param_path, overrides, engine):
+    """
+    This function is used to load the parameters of a benchmark configuration.
+
+    :param str param_path: Path of the parameter file.
+    :param dict overrides: The values of the SIM_CTRL, D_PARAMS or S_PARAMS parameters to change.
+    :param str engine: The simulation engine to benchmark.
+    :return: The interpreted parameter dictionary.
+    """
+    params = load_params(param_path)
+    for name, val in overrides.items():
+        section = next(section for section in ('SIM_CTRL', 'D_PARAMS', 'S_PARAMS') if name in params[section])
+        params[section][name] = val
+    params['SIM_CTRL']['ENGINE'] = engine
+    return param_interpreter(params)
+
+
+# ****************************************        Function Declaration        **************************************** #
+def bench_config(params, num_reps, repeat, memory=True):
+    """
+    This function is used to benchmark a configuration. The object engines run num_reps replications one after the
+    other, the batch engine runs them in lock-step. The time is the best of a number of repetitions. The peak memory is
+    measured in a separate run, of a single replication for the object engines and of the whole batch for the batch
+    engine, as tracing the allocations slows the simulation down.
+
+    :param dict params: The interpreted parameter dictionary.
+    :param int num_reps: Number of replications.
+    :param int repeat: Number of timed repetitions.
+    :param bool memory: Whether to measure the peak memory.
+    :return: A dictionary of the measures in MEASURES. The peak memory is None if it is not measured.
+    """
+    seed_seq = np.random.SeedSequence(0)
+    batch = params['SIM_CTRL']['ENGINE'] == 'batch'
+
+    def run(reps):
+        if batch:
+            replicate_batch(params, seed_seq, reps)
+        else:
+            for rep_seq in seed_seq.spawn(reps):
+                replicate(params, rep_seq)
+
+    run_time = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run(num_reps)
+        run_time = min(run_time, time.perf_counter() - start)
+
+    peak_mem = None
+    if memory:
+        tracemalloc.start()
+        run(num_reps if batch else 1)
+        peak_mem = tracemalloc.get_traced_memory()[1] / 1024
+        tracemalloc.stop()
+
+    result = dict()
+    result['REPS_PER_SEC'] = num_reps / run_time
+    result['NS_PER_MINUTE'] = 1e9 * run_time / (num_reps * params['SIM_CTRL']['T_SIM_IN'])
+    result['PEAK_MEM_KB'] = peak_mem
+    return result
+
+
+# ****************************************        Function Declaration        **************************************** #
+def compare(base, new, threshold):
+    """
+    This function is used to compare two benchmark runs and to print the regressions.
+
+    :param dict base: The history entry of the base run.
+    :param dict new: The history entry of the new run.
+    :param float threshold: The relative change of a measure beyond which it is a regression.
+    :return: A list of (configuration, measure, relative change) tuples of the regressions.
+    :rtype: list[tuple]
+    """
+    print("\nComparing %s (%s) against base %s (%s), threshold %d%%." % (
+        new['TIME'], new['COMMIT'], base['TIME'], base['COMMIT'], round(100 * threshold)))
+
+    regressions = []
+    for config, new_result in sorted(new['RESULTS'].items()):
+        if config not in base['RESULTS']:
+            continue
+        for measure, higher_better in MEASURES.items():
+            base_val, new_val = base['RESULTS'][config][measure], new_result[measure]
+            if base_val is None or new_val is None:
+                continue
+            change = (new_val - base_val) / base_val if base_val else 0.0
+            if (change < -threshold) if higher_better else (change > threshold):
+                regressions.append((config, measure, change))
+                print("REGRESSION %-24s %-14s %+7.1f%% (%.1f -> %.1f)" % (config, measure, 100 * change, base_val,
+                                                                         new_val))
+
+    if not regressions:
+        print("No regressions.")
+    return regressions
+
+
+# ****************************************        Function Declaration        **************************************** #
+def load_history(path):
+    """
+    This function is used to load the benchmark history.
+
+    :param str path: Path of the JSON history file.
+    :return: The list of history entries, empty if the file does not exist.
+    """
+    if not exists(path):
+        return []
+    with open(path) as history_file:
+        return json.load(history_file)
+
+
+# ****************************************        Function Declaration        **************************************** #
+def _git_commit():
+    """
+    This function is used to get the commit of the benchmarked code.
+
+    :return: The abbreviated commit hash, None outside of a git repository.
+    """
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# ******************************************        Main Program End        ****************************************** #
+if __name__ == '__main__':
+
+    argparser = argparse.ArgumentParser(description='DWRS Simulator Benchmark File.')
+
+    argparser.add_argument('--dir_path', default='./example_parameters/', type=str,
+                           help='Directory path of the example parameter files.')
+    argparser.add_argument('-n', '--num_reps', default=20, type=int, help='Number of replications per configuration.')
+    argparser.add_argument('-r', '--repeat', default=3, type=int, help='Number of timed repetitions.')
+    argparser.add_argument('--history', default='./test_results/benchmark_history.json', type=str,
+                           help='Path of the JSON benchmark history file.')
+    argparser.add_argument('--skip_memory', action='store_false', dest='memory',
+                           help='Skip the peak memory measurement, which traces every allocation.')
+    argparser.add_argument('-c', '--compare', action='store_true', dest='compare',
+                           help='Compare the last benchmark run against the base run without benchmarking.')
+    argparser.add_argument('-b', '--base', default=-2, type=int, help='History index of the base run to compare to.')
+    argparser.add_argument('-t', '--threshold', default=0.1, type=float,
+                           help='Relative change of a measure flagged as regression.')
+
+    sim_args = argparser.parse_args()
+
+    print(__doc__)
+
+    try:
+        main(sim_args)
+        print('\nFile executed successfully!\n')
+    except KeyboardInterrupt:
+        print('\nProcess interrupted by user. Bye!')
+
+"""
+Author(s): Yash Bansod, Shivam Mishra
+Repository: https://github.com/YashBansod
+Organization: University of Maryland at College Park
+"""
@@ -5,12 +5,14 @@ Dock Worker Robot Simulation Deterministic Test Routine.
 
 # ******************************************    Libraries to be imported    ****************************************** #
 from __future__ import print_function, division
-import importlib.util
 import argparse
 import numpy as np
 from os.path import join
-from utils import param_interpreter
-from simulation_func import simulate
+from utils import load_params
+from sweep import expand_grid, plan_sweep, run_sweep
+from result_store import ResultStore
+from result_cache import ResultCache
+from output_functions import plan_output
 
 
 # ******************************************        Main Program Start      ****************************************** #
@@ -21,43 +23,31 @@ def main(args):
     exp_id = 'exp_1'
 
     param_path = join(args.dir_path, args.parameter)
-    spec = importlib.util.spec_from_file_location("", param_path)
-    p_module = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(p_module)
-    param_dict = param_interpreter(p_module.PARAM_DICT)
-    st_params = param_dict['S_PARAMS']
-
-    k_val_range = [6, 9, 12]
-    csp_val_range = [3, 4, 5]
-    cpt_val_range = [2, 3, 4]
-    cst_val_range = [5, 7, 9]
-
-    num_exp = len(k_val_range) * len(csp_val_range) * len(cpt_val_range) * len(cst_val_range)
-
-    mean_s_time_arr = np.zeros(num_exp)     # Mean service time
-    mean_wq_time_arr = np.zeros(num_exp)    # Mean queue wait time
-    mean_q_len_arr = np.zeros(num_exp)      # Mean queue length
-    num_c_arr = np.zeros(num_exp)           # Number of cargo containers transported to city
-    num_s_arr = np.zeros(num_exp)           # Number of ships processed
-
-    np.random.seed(args.seed)
-
-    ind = 0
-    for k_val in k_val_range:
-        st_params['K'] = k_val
-        for csp_val in csp_val_range:
-            st_params['CSP'] = csp_val
-            for cpt_val in cpt_val_range:
-                st_params['CPT'] = cpt_val
-                for cst_val in cst_val_range:
-                    st_params['CST'] = cst_val
-                    sim_result = simulate(param_dict)
-                    mean_s_time_arr[ind] = sim_result['MEAN_SERV_TIME']
-                    mean_wq_time_arr[ind] = sim_result['MEAN_WQ_TIME']
-                    mean_q_len_arr[ind] = sim_result['MEAN_Q_LEN']
-                    num_c_arr[ind] = sim_result['CARGO_TRANS']
-                    num_s_arr[ind] = sim_result['SHIPS_SERVICED']
-                    ind += 1
+    param_dict = load_params(param_path)
+
+    grid = [('K', [6, 9, 12]),
+            ('CSP', [3, 4, 5]),
+            ('CPT', [2, 3, 4]),
+            ('CST', [5, 7, 9])]
+    points = expand_grid(param_dict, grid)
+    num_exp = len(points)
+
+    store = ResultStore(args.store) if args.store is not None else None
+    cache = ResultCache(args.cache) if args.cache is not None else None
+    try:
+        if store is not None:
+            plan_output(plan_sweep(points, 1, seed=args.seed, store=store))
+        sim_results = run_sweep(points, 1, seed=args.seed, workers=args.workers, store=store,
+                                cache=cache)
+    finally:
+        if store is not None:
+            store.close()
+
+    mean_s_time_arr = sim_results['MEAN_SERV_TIME'][:, 0]     # Mean service time
+    mean_wq_time_arr = sim_results['MEAN_WQ_TIME'][:, 0]      # Mean queue wait time
+    mean_q_len_arr = sim_results['MEAN_Q_LEN'][:, 0]          # Mean queue length
+    num_c_arr = sim_results['CARGO_TRANS'][:, 0]              # Number of cargo containers transported to city
+    num_s_arr = sim_results['SHIPS_SERVICED'][:, 0]           # Number of ships processed
 
     if args.write:
         header = 'S_T, WQ_T, Q_L, C, S'
@@ -83,6 +73,9 @@ if __name__ == '__main__':
     argparser.add_argument('-v', '--verbose', action='store_true', dest='debug', help='Print text results.')
     argparser.add_argument('-w', '--write', action='store_true', dest='write', help='Write results as pickle file.')
     argparser.add_argument('-s', '--seed', default=None, type=int, help='Set seed for repeating executions')
+    argparser.add_argument('-k', '--workers', default=1, type=int, help='Number of worker processes for replications.')
+    argparser.add_argument('--store', default=None, type=str, help='Path of a result store to checkpoint and resume.')
+    argparser.add_argument('--cache', default=None, type=str, help='Directory of the result cache.')
 
     sim_args = argparser.parse_args()
 
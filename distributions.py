@@ -0,0 +1,395 @@
+#!/usr/bin/env python
+"""
+File Description: File defining the distribution classes used in the simulation.
+    The parameter file specifies a distribution either as an integer (a deterministic value) or as a tuple such as
+    ('triangular', 4, 6, 7). The param_interpreter compiles every such entry once into a distribution object, which
+    carries a vectorized sampler, its exact quantile function and mean, and a cached time estimate. The simulation hot
+    path then never has to parse tuples or strings.
+    When sampling from a RandomStream instead of a random number generator, the samples are drawn by the inverse
+    transform of the uniform values of the stream. One uniform value is used per sample, which keeps the streams of
+    different configurations synchronized for common random numbers and allows antithetic values.
+"""
+
+# ******************************************    Libraries to be imported    ****************************************** #
+from __future__ import print_function, division
+import math
+import numpy as np
+
+# Quantile of a distribution used as the time estimate of a work.
+ESTIMATE_QUANTILE = 0.9
+
+# Coefficients of the rational approximation of the standard normal quantile function (P. J. Acklam), of relative error
+# below 1.15e-9: numerator and denominator of the central region, and of the tails below and above P_LOW.
+ACKLAM_A = (-3.969683028665376e+01, 2.209460984245205e+02, -2.759285104469687e+02, 1.383577518672690e+02,
+            -3.066479806614716e+01, 2.506628277459239e+00)
+ACKLAM_B = (-5.447609879822406e+01, 1.615858368580409e+02, -1.556989798598866e+02, 6.680131188771972e+01,
+            -1.328068155288572e+01, 1.0)
+ACKLAM_C = (-7.784894002430293e-03, -3.223964580411365e-01, -2.400758277161838e+00, -2.549732539343734e+00,
+            4.374664141464968e+00, 2.938163982698783e+00)
+ACKLAM_D = (7.784695709041462e-03, 3.224671290700398e-01, 2.445134137142996e+00, 3.754408661907416e+00, 1.0)
+P_LOW = 0.02425
+
+
+# ****************************************        Function Declaration        **************************************** #
+def norm_ppf(p):
+    """
+    This function is used to compute the quantile function of the standard normal distribution.
+    The quantile is found with Newton's method on the cumulative distribution function.
+
+    :param float p: The probability at which the quantile is evaluated. Must lie in (0, 1).
+    :return: The p quantile of the standard normal distribution.
+    :rtype: float
+    """
+    if not 0 < p < 1:
+        raise ValueError("Probability must lie in the open interval (0, 1).")
+
+    val = 0.0
+    for _ in range(100):
+        step = (0.5 * math.erfc(-val / math.sqrt(2)) - p) / (math.exp(-0.5 * val * val) / math.sqrt(2 * math.pi))
+        val -= step
+        if abs(step) < 1e-12:
+            break
+    return val
+
+
+# ****************************************        Function Declaration        **************************************** #
+def norm_ppf_array(p):
+    """
+    This function is used to compute the quantile function of the standard normal distribution on an array.
+    Unlike norm_ppf, it evaluates the rational approximation of Acklam on the whole array, without a Python loop.
+
+    :param ndarray p: The probabilities at which the quantile is evaluated. Must lie in (0, 1).
+    :return: The p quantiles of the standard normal distribution.
+    :rtype: ndarray
+    """
+    p = np.asarray(p, dtype=float)
+    # The tails are evaluated on the smaller of p and 1 - p, and mirrored above 0.5.
+    central = np.abs(p - 0.5) <= 0.5 - P_LOW
+    q = p - 0.5
+    r = q * q
+    val = q * np.polyval(ACKLAM_A, r) / np.polyval(ACKLAM_B, r)
+
+    tail = ~central
+    if tail.any():
+        p_tail = np.minimum(p[tail], 1 - p[tail])
+        t = np.sqrt(-2 * np.log(p_tail))
+        val_tail = np.polyval(ACKLAM_C, t) / np.polyval(ACKLAM_D, t)
+        val[tail] = np.where(p[tail] < 0.5, val_tail, -val_tail)
+    return val
+
+
+# ******************************************    Class Declaration Start     ****************************************** #
+class Distribution(object):
+    """
+    Distribution Class
+    Base class of all distributions. The samples are rounded up to the next integer as time is simulated in minutes.
+    """
+    name = None
+    deterministic = False
+
+    def __init__(self, *args):
+        """
+        Constructor of Distribution Class.
+
+        :param args: The arguments of the distribution, in the order used by the parameter file.
+        """
+        self.args = args
+        self.mean = self._mean()
+        self.estimate = self.quantile(ESTIMATE_QUANTILE)
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    @property
+    def spec(self):
+        """
+        The specification of this distribution in the format of the parameter file.
+        """
+        return (self.name,) + self.args
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def sample(self, sz, rng=np.random):
+        """
+        Draw samples from the distribution.
+
+        :param int sz: Number of values to draw.
+        :param rng: The random number generator to sample from (np.random.Generator, the global np.random or a
+            RandomStream).
+        :return: The samples from the distribution.
+        :rtype: ndarray
+        """
+        if isinstance(rng, RandomStream):
+            return np.ceil(self._ppf(rng.random(sz))).astype(int)
+        return np.ceil(self._draw(sz, rng)).astype(int)
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def quantile(self, p):
+        raise NotImplementedError
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def _ppf(self, u):
+        # Vectorized quantile function used for the inverse transform of uniform values.
+        raise NotImplementedError
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def _draw(self, sz, rng):
+        raise NotImplementedError
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def _mean(self):
+        raise NotImplementedError
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def __eq__(self, other):
+        return type(self) == type(other) and self.args == other.args
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def __hash__(self):
+        return hash(self.spec)
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def __repr__(self):
+        return '%s%r' % (type(self).__name__, self.args)
+
+# ******************************************    Class Declaration End       ****************************************** #
+
+
+# ******************************************    Class Declaration Start     ****************************************** #
+class Constant(Distribution):
+    """
+    Constant Class
+    A deterministic value.
+    """
+    name = 'constant'
+    deterministic = True
+
+    def __init__(self, value):
+        """
+        Constructor of Constant Class.
+
+        :param int value: The deterministic value.
+        """
+        self.value = value
+        super(Constant, self).__init__(value)
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    @property
+    def spec(self):
+        return self.value
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def sample(self, sz, rng=np.random):
+        return np.full(sz, self.value, dtype=int)
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def quantile(self, p):
+        return self.value
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def _mean(self):
+        return self.value
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def __repr__(self):
+        return 'Constant(%r)' % self.value
+
+# ******************************************    Class Declaration End       ****************************************** #
+
+
+# ******************************************    Class Declaration Start     ****************************************** #
+class Uniform(Distribution):
+    """
+    Uniform Class
+    Arguments: (low, high)
+    """
+    name = 'uniform'
+
+    def quantile(self, p):
+        low, high = self.args
+        return low + p * (high - low)
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def _ppf(self, u):
+        return self.quantile(u)
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def _draw(self, sz, rng):
+        return rng.uniform(*self.args, size=sz)
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def _mean(self):
+        low, high = self.args
+        return (low + high) / 2
+
+# ******************************************    Class Declaration End       ****************************************** #
+
+
+# ******************************************    Class Declaration Start     ****************************************** #
+class Triangular(Distribution):
+    """
+    Triangular Class
+    Arguments: (left, mode, right)
+    """
+    name = 'triangular'
+
+    def quantile(self, p):
+        left, mode, right = self.args
+        if p < (mode - left) / (right - left):
+            return left + math.sqrt(p * (right - left) * (mode - left))
+        return right - math.sqrt((1 - p) * (right - left) * (right - mode))
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def _ppf(self, u):
+        left, mode, right = self.args
+        return np.where(u < (mode - left) / (right - left), left + np.sqrt(u * (right - left) * (mode - left)),
+                        right - np.sqrt((1 - u) * (right - left) * (right - mode)))
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def _draw(self, sz, rng):
+        return rng.triangular(*self.args, size=sz)
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def _mean(self):
+        return sum(self.args) / 3
+
+# ******************************************    Class Declaration End       ****************************************** #
+
+
+# ******************************************    Class Declaration Start     ****************************************** #
+class Exponential(Distribution):
+    """
+    Exponential Class
+    Arguments: (scale,)
+    """
+    name = 'exponential'
+
+    def quantile(self, p):
+        return -math.log(1 - p) * self.args[0]
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def _ppf(self, u):
+        return -np.log1p(-u) * self.args[0]
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def _draw(self, sz, rng):
+        return rng.exponential(*self.args, size=sz)
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def _mean(self):
+        return self.args[0]
+
+# ******************************************    Class Declaration End       ****************************************** #
+
+
+# ******************************************    Class Declaration Start     ****************************************** #
+class Normal(Distribution):
+    """
+    Normal Class
+    Arguments: (loc, scale)
+    """
+    name = 'normal'
+
+    def quantile(self, p):
+        loc, scale = self.args
+        return loc + scale * norm_ppf(p)
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def _ppf(self, u):
+        loc, scale = self.args
+        # The uniform values of a stream lie in [0, 1), the quantile function is only finite on (0, 1).
+        return loc + scale * norm_ppf_array(np.clip(u, 1e-12, 1 - 1e-12))
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def _draw(self, sz, rng):
+        return rng.normal(*self.args, size=sz)
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def _mean(self):
+        return self.args[0]
+
+# ******************************************    Class Declaration End       ****************************************** #
+
+
+DISTRIBUTIONS = {cls.name: cls for cls in (Uniform, Triangular, Exponential, Normal)}
+
+
+# ******************************************    Class Declaration Start     ****************************************** #
+class RandomStream(object):
+    """
+    RandomStream Class
+    A stream of uniform values in [0, 1) drawn from its own random number generator. An antithetic stream hands out
+    1 - u for every value u of the stream seeded with the same seed.
+    """
+
+    def __init__(self, seed_seq, antithetic=False):
+        """
+        Constructor of RandomStream Class.
+
+        :param np.random.SeedSequence seed_seq: The seed sequence of the stream.
+        :param bool antithetic: Whether the stream hands out antithetic values.
+        """
+        self.rng = np.random.default_rng(seed_seq)
+        self.antithetic = antithetic
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def random(self, sz):
+        """
+        Draw uniform values from the stream.
+
+        :param int sz: Number of values to draw.
+        :return: The uniform values.
+        :rtype: ndarray
+        """
+        u = self.rng.random(sz)
+        if self.antithetic:
+            u = 1 - u
+            # 1 - 0 falls outside of [0, 1).
+            u[u == 1] = 0
+        return u
+
+# ******************************************    Class Declaration End       ****************************************** #
+
+
+# ****************************************        Function Declaration        **************************************** #
+def compile_distribution(dist):
+    """
+    This function is used to compile a distribution specification into a distribution object.
+
+    :param dist: An integer specifying a deterministic value, a tuple specifying a random distribution or an already
+        compiled distribution object.
+    :return: The distribution object.
+    :rtype: Distribution
+    """
+    if isinstance(dist, Distribution):
+        return dist
+    elif type(dist) == int:
+        return Constant(dist)
+    elif type(dist) == tuple:
+        dist_type = dist[0].lower()
+        if dist_type not in DISTRIBUTIONS:
+            raise NotImplementedError("Procedure to handle the given distribution is not implemented.")
+        return DISTRIBUTIONS[dist_type](*dist[1:])
+    else:
+        raise ValueError("Invalid distribution specified.")
+
+
+# ******************************************        Isolated Testing        ****************************************** #
+if __name__ == '__main__':
+    import time
+
+    # The vectorized quantile function must match the Newton solution of norm_ppf, whose upper tail loses precision to
+    # the cumulative distribution function rounding to 1.
+    test_p = np.concatenate((np.linspace(1e-6, 1 - 1e-6, 10001), np.random.default_rng(0).random(10000)))
+    test_exact = np.array([norm_ppf(val) for val in test_p])
+    test_err = np.abs(norm_ppf_array(test_p) - test_exact) / np.maximum(np.abs(test_exact), 1.0)
+    print("Maximum relative error of norm_ppf_array: %2.2e" % test_err.max())
+    assert test_err.max() < 2e-9
+
+    test_u = np.random.default_rng(1).random(100000)
+    test_start = time.perf_counter()
+    Normal(5, 1.5).sample(len(test_u), RandomStream(np.random.SeedSequence(0)))
+    print("Inverse transform of %d normal samples: %2.1f ms" % (len(test_u), 1e3 * (time.perf_counter() - test_start)))
+
+"""
+Author(s): Yash Bansod, Shivam Mishra
+Repository: https://github.com/YashBansod
+Organization: University of Maryland at College Park
+"""
@@ -0,0 +1,61 @@
+PARAM_DICT = dict()
+
+# Simulation Control Parameters
+PARAM_DICT['SIM_CTRL'] = dict()
+sim_ctrl = PARAM_DICT['SIM_CTRL']
+# Number of simulation time steps (in minutes)
+sim_ctrl['T_SIM_IN'] = 1440
+# Number of simulations to run
+sim_ctrl['N'] = 30
+# Simulation engine: 'time_step' (minute by minute), 'event' (next-event, for work times of tens of minutes) or 'batch'
+# (vectorized replications)
+sim_ctrl['ENGINE'] = 'time_step'
+# Variance reduction: None, 'crn' (dedicated random stream per random source, for common random numbers) or
+# 'antithetic' (crn with antithetic pairs of simulations)
+sim_ctrl['VARIANCE_REDUCTION'] = None
+# Sequential stopping rule: maximum half-width of the confidence interval of the mean relative to the mean, per result
+# (e.g. {'MEAN_WQ_TIME': 0.02}). If given, simulations are run in rounds of N until every target is met.
+sim_ctrl['CI_TARGET'] = None
+# Confidence level of the stopping rule
+sim_ctrl['CI_LEVEL'] = 0.95
+# Maximum number of simulations to run with the stopping rule
+sim_ctrl['N_MAX'] = 3000
+# Minutes taken by a robot to move between two terminals, which is also the window after which the terminals exchange
+# robots
+sim_ctrl['TRANSFER_TIME'] = 30
+# Queue length from which a terminal without idle robots gets a robot from another terminal
+sim_ctrl['TRANSFER_QUEUE'] = 3
+
+# Deterministic Parameters
+PARAM_DICT['D_PARAMS'] = dict()
+det_params = PARAM_DICT['D_PARAMS']
+# Maximum length of the queue
+det_params['L'] = 20
+# Number of cranes at the docking station.
+det_params['C'] = 2
+# Number of transportation robots at the docking station.
+det_params['T'] = 4
+# Number of containers each pallet on docking station can accommodate.
+det_params['P'] = 15
+# Mean inter-arrival time (in minutes)
+det_params['A_MEAN'] = 50
+# Minutes taken by the robot to transfer cargo-containers from the dock to city.
+det_params['TC'] = 8
+
+# Stochastic Parameters
+PARAM_DICT['S_PARAMS'] = dict()
+st_params = PARAM_DICT['S_PARAMS']
+# Cargo-containers on the ship
+st_params['K'] = ('triangular', 4, 6, 7)
+# Minutes taken to transport cargo-containers from ship to pallet.
+st_params['CSP'] = ('triangular', 1, 3, 4)
+# Minutes taken to transport cargo-containers from pallet to transportation robot.
+st_params['CPT'] = ('triangular', 0, 2, 3)
+# Minutes taken to transport cargo-containers from ship to transportation robot.
+st_params['CST'] = ('triangular', 3, 5, 6)
+
+# Terminals of the port, each given by the deterministic parameters that differ from the ones above
+PARAM_DICT['TERMINALS'] = [{'A_MEAN': 10, 'T': 2},
+                           {'A_MEAN': 30, 'T': 8},
+                           {'A_MEAN': 15},
+                           {'A_MEAN': 12, 'C': 3, 'T': 6}]
@@ -5,14 +5,27 @@ Main Dock Worker Robot Simulation.
 
 # ******************************************    Libraries to be imported    ****************************************** #
 from __future__ import print_function, division
-import importlib.util
 import argparse
+import subprocess
+import sys
+import time
 import numpy as np
-from tqdm import tqdm
-from os.path import join
-from utils import param_interpreter
-from output_functions import text_output, graph_output
-from simulation_func import simulate
+from itertools import repeat, chain
+from os.path import join, dirname, abspath
+from concurrent.futures import ProcessPoolExecutor
+from utils import load_params, param_interpreter
+from output_functions import text_output, graph_output, ci_output, steady_state_output, profile_output, progress
+from simulation_func import METRICS, replicate
+from port_simulation import replicate_port
+from steady_state import replicate_steady_state
+from batch_simulation import BATCH_SIZE, replicate_batch, split_batch_result
+from result_cache import ResultCache
+from stopping_rule import targets_met
+from profiler import Profiler
+from ship_trace import TraceWriter
+
+# Number of runs of every import timed by the startup report.
+STARTUP_RUNS = 3
 
 
 # ******************************************        Main Program Start      ****************************************** #
@@ -21,27 +34,77 @@ def main(args):
     The main of the program.
     """
     param_path = join(args.dir_path, args.parameter)
-    spec = importlib.util.spec_from_file_location("", param_path)
-    p_module = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(p_module)
-    param_dict = param_interpreter(p_module.PARAM_DICT)
-
-    mean_s_time_arr = np.zeros(param_dict['SIM_CTRL']['N'])     # Mean service time
-    mean_wq_time_arr = np.zeros(param_dict['SIM_CTRL']['N'])    # Mean queue wait time
-    mean_q_len_arr = np.zeros(param_dict['SIM_CTRL']['N'])      # Mean queue length
-    num_c_arr = np.zeros(param_dict['SIM_CTRL']['N'])           # Number of cargo containers transported to city
-    num_s_arr = np.zeros(param_dict['SIM_CTRL']['N'])           # Number of ships processed
-
-    np.random.seed(args.seed)
-
-    for sim_num in tqdm(range(param_dict['SIM_CTRL']['N'])):
-        sim_result = simulate(param_dict)
-
-        mean_s_time_arr[sim_num] = sim_result['MEAN_SERV_TIME']
-        mean_wq_time_arr[sim_num] = sim_result['MEAN_WQ_TIME']
-        mean_q_len_arr[sim_num] = sim_result['MEAN_Q_LEN']
-        num_c_arr[sim_num] = sim_result['CARGO_TRANS']
-        num_s_arr[sim_num] = sim_result['SHIPS_SERVICED']
+    if args.check_startup:
+        startup_report(param_path, args.seed)
+        return
+
+    param_dict = param_interpreter(load_params(param_path))
+
+    sim_ctrl = param_dict['SIM_CTRL']
+    profiler = None
+    if args.profile or args.profile_stats is not None:
+        if sim_ctrl['ENGINE'] == 'batch' or args.workers > 1 or param_dict.get('TERMINALS') is not None or \
+                sim_ctrl['STEADY_STATE']:
+            raise NotImplementedError("Profiling is only implemented for the object engines in a single process.")
+        profiler = Profiler()
+    trace = None
+    if args.trace is not None:
+        if sim_ctrl['ENGINE'] == 'batch' or args.workers > 1 or param_dict.get('TERMINALS') is not None or \
+                sim_ctrl['STEADY_STATE']:
+            raise NotImplementedError("Tracing is only implemented for the object engines in a single process.")
+        trace = TraceWriter(args.trace, compress=args.trace_compress)
+    cache = ResultCache(args.cache) if args.cache is not None else None
+    # The terminals of a port are simulated in parallel instead of the replications.
+    ports = param_dict.get('TERMINALS') is not None
+    executor = (ProcessPoolExecutor(max_workers=args.workers)
+                if args.workers > 1 and not ports and not sim_ctrl['STEADY_STATE'] else None)
+    root_seq = np.random.SeedSequence(args.seed)
+    sim_results = {metric: [] for metric in METRICS}
+    steady_result = None
+    try:
+        if sim_ctrl['STEADY_STATE']:
+            # A single long simulation, whose batches after the warm-up stand for the N simulations.
+            steady_result = replicate_steady_state(param_dict, root_seq.spawn(1)[0], cache)
+            sim_results = {metric: steady_result[metric] for metric in METRICS}
+        else:
+            # With the stopping rule, rounds of N simulations are run until the confidence interval targets are met.
+            num_sims = sim_ctrl['N']
+            while num_sims > 0:
+                for sim_result in progress(_run_round(param_dict, root_seq, num_sims, executor, args.workers, cache,
+                                                      profiler, trace),
+                                           total=num_sims):
+                    for metric in METRICS:
+                        sim_results[metric].append(sim_result[metric])
+
+                num_done = len(sim_results['SHIPS_SERVICED'])
+                if sim_ctrl['CI_TARGET'] is None or targets_met(sim_results, param_dict):
+                    break
+                num_sims = min(sim_ctrl['N'], sim_ctrl['N_MAX'] - num_done)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        if trace is not None:
+            trace.close()
+
+    mean_s_time_arr = np.array(sim_results['MEAN_SERV_TIME'], dtype=float)    # Mean service time
+    mean_wq_time_arr = np.array(sim_results['MEAN_WQ_TIME'], dtype=float)     # Mean queue wait time
+    mean_q_len_arr = np.array(sim_results['MEAN_Q_LEN'], dtype=float)         # Mean queue length
+    num_c_arr = np.array(sim_results['CARGO_TRANS'], dtype=float)             # Number of cargo containers transported
+    num_s_arr = np.array(sim_results['SHIPS_SERVICED'], dtype=float)          # Number of ships processed
+
+    if sim_ctrl['CI_TARGET'] is not None:
+        # The outputs report the number of simulations actually run.
+        sim_ctrl['N'] = len(num_s_arr)
+        ci_output(param_dict, sim_results)
+
+    if steady_result is not None:
+        steady_state_output(param_dict, steady_result)
+
+    if args.profile:
+        profile_output(profiler.to_dict())
+
+    if args.profile_stats is not None:
+        profiler.dump_stats(args.profile_stats)
 
     if args.debug:
         text_output(param_dict, mean_s_time_arr, mean_wq_time_arr, mean_q_len_arr, num_c_arr, num_s_arr)
@@ -50,6 +113,77 @@ def main(args):
         graph_output(param_dict, mean_s_time_arr, mean_wq_time_arr, mean_q_len_arr, num_c_arr, num_s_arr)
 
 
+# ****************************************        Function Declaration        **************************************** #
+def startup_report(param_path, seed=None):
+    """
+    Function that reports the time taken by the startup of the main simulation: the imports, each timed in a fresh
+    interpreter as the best of STARTUP_RUNS runs, then loading and interpreting the parameters and a first simulation.
+
+    :param str param_path: Path of the parameter file.
+    :param int seed: The seed of the first simulation.
+    """
+    commands = (('Interpreter startup', 'pass'),
+                ('Import numpy', 'import numpy'),
+                ('Import main_simulation', 'import main_simulation'),
+                ('Import tqdm (progress bars)', 'import tqdm'),
+                ('Import matplotlib (-d only)', 'from matplotlib import pyplot'))
+    print("Startup times (ms):")
+    for name, command in commands:
+        run_times = []
+        for _ in range(STARTUP_RUNS):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, '-c', command], check=True, cwd=dirname(abspath(__file__)))
+            run_times.append(time.perf_counter() - start)
+        print("%-32s %8.1f" % (name, 1e3 * min(run_times)))
+
+    start = time.perf_counter()
+    param_dict = load_params(param_path)
+    print("%-32s %8.1f" % ('Load %s' % param_path, 1e3 * (time.perf_counter() - start)))
+    start = time.perf_counter()
+    param_dict = param_interpreter(param_dict)
+    print("%-32s %8.1f" % ('Interpret parameters', 1e3 * (time.perf_counter() - start)))
+    start = time.perf_counter()
+    next(iter(_run_round(param_dict, np.random.SeedSequence(seed), 1, None, 1, None)))
+    print("%-32s %8.1f" % ('First simulation', 1e3 * (time.perf_counter() - start)))
+
+
+# ****************************************        Function Declaration        **************************************** #
+def _run_round(param_dict, root_seq, num_sims, executor, workers, cache, profiler=None, trace=None):
+    """
+    Function that runs a round of simulations, each with its own random stream spawned from the root seed sequence.
+    Spawning continues where the previous round stopped, so the results do not depend on how they are split in rounds.
+
+    :param dict param_dict: A dictionary containing the interpreted parameters.
+    :param np.random.SeedSequence root_seq: The seed sequence of the program.
+    :param int num_sims: Number of simulations to run.
+    :param ProcessPoolExecutor executor: The pool of worker processes, None to run the simulations in this process.
+    :param int workers: Number of worker processes of the pool, or of the processes simulating the terminals of a port.
+    :param ResultCache cache: Optional result cache.
+    :param Profiler profiler: Optional profiler of the simulations run in this process.
+    :param TraceWriter trace: Optional trace of the simulations run in this process.
+    :return: An iterator over the result dictionaries of the simulations.
+    """
+    if param_dict.get('TERMINALS') is not None:
+        return map(replicate_port, repeat(param_dict), root_seq.spawn(num_sims), repeat(cache), repeat(workers))
+
+    if param_dict['SIM_CTRL']['ENGINE'] == 'batch':
+        # The batch engine simulates blocks of replications in lock-step, each block with its own random stream.
+        batch_sizes = [min(BATCH_SIZE, num_sims - ind) for ind in range(0, num_sims, BATCH_SIZE)]
+        seed_seqs = root_seq.spawn(len(batch_sizes))
+        if executor is None:
+            batch_results = map(replicate_batch, repeat(param_dict), seed_seqs, batch_sizes, repeat(cache))
+        else:
+            batch_results = executor.map(replicate_batch, repeat(param_dict), seed_seqs, batch_sizes, repeat(cache))
+        return chain.from_iterable(map(split_batch_result, batch_results))
+
+    # Every replication gets its own independent random stream, so the results do not depend on the number of workers.
+    seed_seqs = root_seq.spawn(num_sims)
+    if executor is None:
+        return map(replicate, repeat(param_dict), seed_seqs, repeat(cache), repeat(profiler), repeat(trace))
+    chunk_size = max(1, num_sims // (4 * workers))
+    return executor.map(replicate, repeat(param_dict), seed_seqs, repeat(cache), chunksize=chunk_size)
+
+
 # ******************************************        Main Program End        ****************************************** #
 if __name__ == '__main__':
 
@@ -61,6 +195,18 @@ if __name__ == '__main__':
     argparser.add_argument('-v', '--verbose', action='store_true', dest='debug', help='Print text results.')
     # argparser.add_argument('-w', '--write', action='store_true', dest='write', help='Write results as pickle file.')
     argparser.add_argument('-s', '--seed', default=None, type=int, help='Set seed for repeating executions')
+    argparser.add_argument('-k', '--workers', default=1, type=int, help='Number of worker processes for replications.')
+    argparser.add_argument('--cache', default=None, type=str, help='Directory of the result cache.')
+    argparser.add_argument('--profile', action='store_true', dest='profile',
+                           help='Print the time spent in every phase of the simulation.')
+    argparser.add_argument('--profile_stats', default=None, type=str,
+                           help='Write the phase profile to a file readable by pstats.')
+    argparser.add_argument('--trace', default=None, type=str,
+                           help='Directory to write the trace of every ship and crane operation to.')
+    argparser.add_argument('--trace_compress', action='store_true', dest='trace_compress',
+                           help='Write the trace as compressed chunks instead of memory-mappable columns.')
+    argparser.add_argument('--check_startup', action='store_true', dest='check_startup',
+                           help='Report the time taken by the startup of the simulation and exit.')
 
     sim_args = argparser.parse_args()
 
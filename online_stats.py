@@ -0,0 +1,476 @@
+#!/usr/bin/env python
+"""
+File Description: File defining the online statistics accumulators used by the simulation engines.
+    Instead of storing every wait and service time of a replication, the engines push the values into accumulators
+    holding a constant amount of state: the count and sum, Welford's running mean and variance, the minimum and maximum,
+    and P-square (P2) quantile markers (R. Jain and I. Chlamtac, 1985). The queue length is accumulated as a time
+    average that is only updated when the length changes.
+    The Batch classes are the vectorized counterparts used by the batch engine. They apply the same arithmetic in the
+    same order, so a replication gives identical statistics in every engine. As the batch engine pushes the values of
+    a few replications at a time, BatchOnlineStats buffers them and applies them in rounds, the n-th round holding the
+    n-th buffered value of every replication, so every update works on arrays of about one value per replication.
+"""
+
+# ******************************************    Libraries to be imported    ****************************************** #
+from __future__ import print_function, division
+import math
+import numpy as np
+
+# Quantile of the ship wait and service times reported by the simulation.
+TAIL_QUANTILE = 0.9
+# Number of values per replication buffered by BatchOnlineStats before they are applied.
+BATCH_BUFFER = 64
+
+
+# ******************************************    Class Declaration Start     ****************************************** #
+class P2Quantile(object):
+    """
+    P2Quantile Class
+    Streaming estimate of a quantile with five markers. The estimate is exact while at most five values are pushed.
+    """
+
+    def __init__(self, p):
+        """
+        Constructor of P2Quantile Class.
+
+        :param float p: The probability of the estimated quantile. Must lie in (0, 1).
+        """
+        self.p = p
+        self.count = 0
+        self._q = []                                        # Marker heights
+        self._n = [0, 1, 2, 3, 4]                           # Marker positions
+        self._np = [0, 2 * p, 4 * p, 2 + 2 * p, 4]          # Desired marker positions
+        self._dn = [0, p / 2, p, (1 + p) / 2, 1]            # Increments of the desired marker positions
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def push(self, x):
+        """
+        Add a value to the estimate.
+
+        :param float x: The value.
+        """
+        self.count += 1
+        q, n = self._q, self._n
+        if self.count <= 5:
+            q.append(x)
+            if self.count == 5:
+                q.sort()
+            return
+
+        if x < q[0]:
+            q[0] = x
+        elif x > q[4]:
+            q[4] = x
+        k = 0
+        while k < 3 and q[k + 1] <= x:
+            k += 1
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self._np[i] += self._dn[i]
+
+        for i in (1, 2, 3):
+            d = self._np[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                q_new = q[i] + d / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+                    + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1]))
+                if not q[i - 1] < q_new < q[i + 1]:
+                    q_new = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                q[i] = q_new
+                n[i] += d
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def value(self):
+        """
+        :return: The estimated quantile, NaN if no value was pushed.
+        """
+        if self.count == 0:
+            return float('nan')
+        if self.count <= 5:
+            return _interpolate(sorted(self._q), self.p)
+        return self._q[2]
+
+# ******************************************    Class Declaration End       ****************************************** #
+
+
+# ******************************************    Class Declaration Start     ****************************************** #
+class OnlineStats(object):
+    """
+    OnlineStats Class
+    """
+
+    def __init__(self, quantiles=()):
+        """
+        Constructor of OnlineStats Class.
+
+        :param tuple quantiles: The probabilities of the quantiles to estimate.
+        """
+        self.count = 0
+        self.total = 0
+        self.min_val = float('inf')
+        self.max_val = float('-inf')
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._quantiles = [P2Quantile(p) for p in quantiles]
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def push(self, x):
+        """
+        Add a value to the statistics.
+
+        :param float x: The value.
+        """
+        self.count += 1
+        self.total += x
+        delta = x - self._mean
+        self._mean += delta / self.count
+        self._m2 += delta * (x - self._mean)
+        if x < self.min_val:
+            self.min_val = x
+        if x > self.max_val:
+            self.max_val = x
+        for quantile in self._quantiles:
+            quantile.push(x)
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    @property
+    def mean(self):
+        # The mean is taken from the exact sum, Welford's running mean only serves the variance.
+        return self.total / self.count if self.count else float('nan')
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    @property
+    def var(self):
+        return self._m2 / self.count if self.count else float('nan')
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    @property
+    def std(self):
+        return math.sqrt(self.var)
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    @property
+    def maximum(self):
+        return self.max_val if self.count else float('nan')
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    @property
+    def minimum(self):
+        return self.min_val if self.count else float('nan')
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def quantile(self, p):
+        """
+        :param float p: The probability of the quantile. It must be one of the quantiles given to the constructor.
+        :return: The estimated quantile.
+        """
+        for quantile in self._quantiles:
+            if quantile.p == p:
+                return quantile.value()
+        raise KeyError("Quantile %s is not estimated." % p)
+
+# ******************************************    Class Declaration End       ****************************************** #
+
+
+# ******************************************    Class Declaration Start     ****************************************** #
+class TimeAverage(object):
+    """
+    TimeAverage Class
+    Time average of a piecewise constant value, starting at 0 at time 0.
+    """
+
+    def __init__(self):
+        """
+        Constructor of TimeAverage Class.
+        """
+        self.value = 0
+        self.time = 0
+        self.area = 0
+        self.min_val = 0
+        self.max_val = 0
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def update(self, time, value):
+        """
+        Change the value.
+
+        :param int time: The time from which the new value holds.
+        :param value: The new value.
+        """
+        self.area += self.value * (time - self.time)
+        self.time = time
+        self.value = value
+        if value < self.min_val:
+            self.min_val = value
+        if value > self.max_val:
+            self.max_val = value
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def mean(self, end_time):
+        """
+        :param int end_time: The time at which the average ends.
+        :return: The time average of the value over [0, end_time).
+        """
+        return (self.area + self.value * (end_time - self.time)) / end_time
+
+# ******************************************    Class Declaration End       ****************************************** #
+
+
+# ******************************************    Class Declaration Start     ****************************************** #
+class BatchP2Quantile(object):
+    """
+    BatchP2Quantile Class
+    Vectorized P2Quantile holding an estimate for each of a number of replications.
+    """
+
+    def __init__(self, p, size):
+        """
+        Constructor of BatchP2Quantile Class.
+
+        :param float p: The probability of the estimated quantile. Must lie in (0, 1).
+        :param int size: Number of replications.
+        """
+        self.p = p
+        self.count = np.zeros(size, dtype=int)
+        self._q = np.zeros((size, 5))
+        self._n = np.tile(np.arange(5.0), (size, 1))
+        self._np = np.tile([0, 2 * p, 4 * p, 2 + 2 * p, 4], (size, 1))
+        self._dn = np.array([0, p / 2, p, (1 + p) / 2, 1])
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def push(self, ind, x):
+        """
+        Add a value to the estimates of some replications.
+
+        :param ndarray ind: The distinct indices of the replications.
+        :param ndarray x: The value of each replication.
+        """
+        count = self.count[ind]
+        self.count[ind] += 1
+
+        init = count < 5
+        if init.any():
+            ind_i = ind[init]
+            self._q[ind_i, count[init]] = x[init]
+            full = ind_i[count[init] == 4]
+            self._q[full] = np.sort(self._q[full], axis=1)
+            ind, x = ind[~init], x[~init]
+            if len(ind) == 0:
+                return
+
+        q, n, n_des = self._q[ind], self._n[ind], self._np[ind] + self._dn
+        q[:, 0] = np.minimum(q[:, 0], x)
+        q[:, 4] = np.maximum(q[:, 4], x)
+        k = (q[:, 1:4] <= x[:, None]).sum(axis=1)
+        n += np.arange(5) > k[:, None]
+
+        for i in (1, 2, 3):
+            d = n_des[:, i] - n[:, i]
+            move = ((d >= 1) & (n[:, i + 1] - n[:, i] > 1)) | ((d <= -1) & (n[:, i - 1] - n[:, i] < -1))
+            if not move.any():
+                continue
+            d = np.where(d > 0, 1.0, -1.0)
+            q_new = q[:, i] + d / (n[:, i + 1] - n[:, i - 1]) * (
+                (n[:, i] - n[:, i - 1] + d) * (q[:, i + 1] - q[:, i]) / (n[:, i + 1] - n[:, i])
+                + (n[:, i + 1] - n[:, i] - d) * (q[:, i] - q[:, i - 1]) / (n[:, i] - n[:, i - 1]))
+            q_next = np.where(d > 0, q[:, i + 1], q[:, i - 1])
+            n_next = np.where(d > 0, n[:, i + 1], n[:, i - 1])
+            q_lin = q[:, i] + d * (q_next - q[:, i]) / (n_next - n[:, i])
+            q_new = np.where((q[:, i - 1] < q_new) & (q_new < q[:, i + 1]), q_new, q_lin)
+            q[:, i] = np.where(move, q_new, q[:, i])
+            n[:, i] += np.where(move, d, 0)
+
+        self._q[ind], self._n[ind], self._np[ind] = q, n, n_des
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def value(self):
+        """
+        :return: The estimated quantile of every replication, NaN if no value was pushed.
+        """
+        values = self._q[:, 2].copy()
+        for count in range(6):
+            sel = self.count == count
+            if count == 0:
+                values[sel] = np.nan
+            elif sel.any():
+                values[sel] = [_interpolate(sorted(row[:count]), self.p) for row in self._q[sel]]
+        return values
+
+# ******************************************    Class Declaration End       ****************************************** #
+
+
+# ******************************************    Class Declaration Start     ****************************************** #
+class BatchOnlineStats(object):
+    """
+    BatchOnlineStats Class
+    Vectorized OnlineStats holding the statistics of each of a number of replications.
+    """
+
+    def __init__(self, size, quantiles=()):
+        """
+        Constructor of BatchOnlineStats Class.
+
+        :param int size: Number of replications.
+        :param tuple quantiles: The probabilities of the quantiles to estimate.
+        """
+        self.size = size
+        self._count = np.zeros(size, dtype=int)
+        self.total = np.zeros(size)
+        self.min_val = np.full(size, np.inf)
+        self.max_val = np.full(size, -np.inf)
+        self._mean = np.zeros(size)
+        self._m2 = np.zeros(size)
+        self._quantiles = [BatchP2Quantile(p, size) for p in quantiles]
+        self._buffer_ind = []
+        self._buffer_x = []
+        self._buffered = 0
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def push(self, ind, x):
+        """
+        Add a value to the statistics of some replications. The value is buffered until the statistics are read or the
+        buffer is full.
+
+        :param ndarray ind: The distinct indices of the replications.
+        :param ndarray x: The value of each replication.
+        """
+        self._buffer_ind.append(ind)
+        self._buffer_x.append(x)
+        self._buffered += len(ind)
+        if self._buffered >= BATCH_BUFFER * self.size:
+            self.flush()
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def flush(self):
+        """
+        Apply the buffered values, in rounds holding at most one value of every replication.
+        """
+        if not self._buffered:
+            return
+        ind = np.concatenate(self._buffer_ind)
+        x = np.concatenate(self._buffer_x)
+        self._buffer_ind, self._buffer_x, self._buffered = [], [], 0
+
+        # The rank of a value among the buffered values of its replication, in the order they were pushed.
+        order = np.argsort(ind, kind='stable')
+        ind, x = ind[order], x[order]
+        counts = np.bincount(ind, minlength=self.size)
+        starts = np.cumsum(counts) - counts
+        rank = np.arange(len(ind)) - starts[ind]
+
+        order = np.argsort(rank, kind='stable')
+        ind, x = ind[order], x[order]
+        bounds = np.cumsum(np.bincount(rank))
+        start = 0
+        for end in bounds:
+            self._apply(ind[start:end], x[start:end])
+            start = end
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def _apply(self, ind, x):
+        self._count[ind] += 1
+        self.total[ind] += x
+        delta = x - self._mean[ind]
+        self._mean[ind] += delta / self._count[ind]
+        self._m2[ind] += delta * (x - self._mean[ind])
+        self.min_val[ind] = np.minimum(self.min_val[ind], x)
+        self.max_val[ind] = np.maximum(self.max_val[ind], x)
+        for quantile in self._quantiles:
+            quantile.push(ind, x)
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    @property
+    def count(self):
+        self.flush()
+        return self._count
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    @property
+    def mean(self):
+        self.flush()
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return self.total / self._count
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    @property
+    def var(self):
+        self.flush()
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return self._m2 / self._count
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    @property
+    def std(self):
+        return np.sqrt(self.var)
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    @property
+    def maximum(self):
+        return np.where(self.count > 0, self.max_val, np.nan)
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    @property
+    def minimum(self):
+        return np.where(self.count > 0, self.min_val, np.nan)
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def quantile(self, p):
+        """
+        :param float p: The probability of the quantile. It must be one of the quantiles given to the constructor.
+        :return: The estimated quantile of every replication.
+        """
+        self.flush()
+        for quantile in self._quantiles:
+            if quantile.p == p:
+                return quantile.value()
+        raise KeyError("Quantile %s is not estimated." % p)
+
+# ******************************************    Class Declaration End       ****************************************** #
+
+
+# ****************************************        Function Declaration        **************************************** #
+def _interpolate(values, p):
+    """
+    This function is used to compute the p quantile of a few sorted values by linear interpolation.
+    """
+    pos = p * (len(values) - 1)
+    low = int(pos)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (pos - low) * (values[high] - values[low])
+
+
+# ******************************************        Isolated Testing        ****************************************** #
+if __name__ == '__main__':
+    test_rng = np.random.default_rng(0)
+    test_values = test_rng.exponential(10, size=100000)
+
+    test_stats = OnlineStats(quantiles=(TAIL_QUANTILE,))
+    for test_val in test_values:
+        test_stats.push(test_val)
+
+    print("Mean: %2.4f (exact %2.4f)" % (test_stats.mean, test_values.mean()))
+    print("Standard deviation: %2.4f (exact %2.4f)" % (test_stats.std, test_values.std()))
+    print("Minimum: %2.4f, Maximum: %2.4f" % (test_stats.minimum, test_stats.maximum))
+    print("P2 quantile %s: %2.4f (exact %2.4f)" % (TAIL_QUANTILE, test_stats.quantile(TAIL_QUANTILE),
+                                                   np.quantile(test_values, TAIL_QUANTILE)))
+
+    # The buffered batch statistics must equal the statistics of every replication pushed one value at a time.
+    test_batch = BatchOnlineStats(50, quantiles=(TAIL_QUANTILE,))
+    test_reps = [OnlineStats(quantiles=(TAIL_QUANTILE,)) for _ in range(50)]
+    for _ in range(500):
+        test_ind = np.flatnonzero(test_rng.random(50) < 0.3)
+        test_x = test_rng.integers(0, 100, len(test_ind))
+        test_batch.push(test_ind, test_x)
+        for test_rep, test_val in zip(test_ind, test_x):
+            test_reps[test_rep].push(test_val)
+    assert np.array_equal(test_batch.quantile(TAIL_QUANTILE), [rep.quantile(TAIL_QUANTILE) for rep in test_reps])
+    assert np.array_equal(test_batch.std, [rep.std for rep in test_reps])
+    print("Batch statistics of 50 replications match the statistics of the single replications.")
+
+"""
+Author(s): Yash Bansod, Shivam Mishra
+Repository: https://github.com/YashBansod
+Organization: University of Maryland at College Park
+"""
@@ -5,14 +5,38 @@ File Description: File defining the various outputs functions used by the simula
 
 # ******************************************    Libraries to be imported    ****************************************** #
 from __future__ import print_function, division
-from matplotlib import pyplot as plt
+import sys
+import numpy as np
+from stopping_rule import ci_half_width, target_met
+
+
+# ****************************************        Function Declaration        **************************************** #
+def progress(iterable, total=None):
+    """
+    Function that shows a progress bar over an iterable when the standard error is a terminal.
+    tqdm is only imported then, so runs writing to files or pipes do not pay for it.
+
+    :param iterable: The iterable.
+    :param int total: The number of items of the iterable.
+    :return: The iterable, wrapped in a progress bar if shown.
+    """
+    if not sys.stderr.isatty():
+        return iterable
+    from tqdm import tqdm
+    return tqdm(iterable, total=total)
 
 
 # ****************************************        Function Declaration        **************************************** #
 def text_output(params, mean_s_time_arr, mean_wq_time_arr, mean_q_len_arr, num_c_arr, num_s_arr):
     sim_ctrl = params['SIM_CTRL']
+    if sim_ctrl.get('STEADY_STATE'):
+        # The values are those of the batches of a single run.
+        runs = "once for %d time steps, split in %d batches" % (sim_ctrl['T_SIM_IN'], len(num_s_arr))
+    else:
+        runs = "%d times for %d time steps" % (sim_ctrl['N'], sim_ctrl['T_SIM_IN'])
+
     if params['MODE'] == 'deterministic':
-        print("\nSimulation ran %d times for %d time steps." % (sim_ctrl['N'], sim_ctrl['T_SIM_IN']))
+        print("\nSimulation ran %s." % runs)
         print("Mean service time for ships was: %2.2f minutes" % mean_s_time_arr.mean())
         print("Mean queue wait time for ships was: %2.2f minutes" % mean_wq_time_arr.mean())
         print("Mean queue length was: %2.2f ships" % mean_q_len_arr.mean())
@@ -20,7 +44,7 @@ def text_output(params, mean_s_time_arr, mean_wq_time_arr, mean_q_len_arr, num_c
         print("Number of ships serviced by the dock: %d ships." % num_s_arr.mean())
 
     elif params['MODE'] == 'stochastic':
-        print("\nSimulation ran %d times for %d time steps." % (sim_ctrl['N'], sim_ctrl['T_SIM_IN']))
+        print("\nSimulation ran %s." % runs)
         print("\nMean service time for ships was: %2.2f minutes" % mean_s_time_arr.mean())
         print("Standard deviation of service time for ships was: %2.2f minutes" % mean_s_time_arr.std())
 
@@ -40,8 +64,60 @@ def text_output(params, mean_s_time_arr, mean_wq_time_arr, mean_q_len_arr, num_c
         raise NotImplementedError
 
 
+# ****************************************        Function Declaration        **************************************** #
+def ci_output(params, sim_results):
+    sim_ctrl = params['SIM_CTRL']
+    num_sims = len(sim_results['SHIPS_SERVICED'])
+    print("\nStopping rule ran %d simulations (maximum %d) at %d%% confidence." % (num_sims, sim_ctrl['N_MAX'],
+                                                                                 round(100 * sim_ctrl['CI_LEVEL'])))
+    for metric, target in sim_ctrl['CI_TARGET'].items():
+        values = np.asarray(sim_results[metric], dtype=float)
+        mean, half_width = ci_half_width(values, sim_ctrl['CI_LEVEL'])
+        print("%s: %2.4f +/- %2.4f (%2.2f%%, target %2.2f%%, %s)"
+              % (metric, mean, half_width, 100 * half_width / abs(mean) if mean else float('inf'), 100 * target,
+                 'met' if target_met(values, target, sim_ctrl['CI_LEVEL']) else 'not met'))
+
+
+# ****************************************        Function Declaration        **************************************** #
+def plan_output(plan):
+    counts = {status: plan.count(status) for status in ('stored', 'partial', 'invalidated', 'new')}
+    print("\nSweep plan of %d grid points: %d stored, %d partially stored, %d invalidated, %d new."
+          % (len(plan), counts['stored'], counts['partial'], counts['invalidated'], counts['new']))
+    print("Grid points to simulate: %d." % (len(plan) - counts['stored']))
+
+
+# ****************************************        Function Declaration        **************************************** #
+def steady_state_output(params, steady_result):
+    sim_ctrl = params['SIM_CTRL']
+    print("\nSteady state run of %d time steps: warm-up of %d time steps truncated, %d batches of %d time steps."
+          % (sim_ctrl['T_SIM_IN'], steady_result['WARM_UP'], sim_ctrl['N'], steady_result['BATCH_LEN']))
+    print("Batch means at %d%% confidence:" % round(100 * sim_ctrl['CI_LEVEL']))
+    for metric, values in steady_result.items():
+        if metric in ('WARM_UP', 'BATCH_LEN'):
+            continue
+        mean, half_width = ci_half_width(np.asarray(values, dtype=float), sim_ctrl['CI_LEVEL'])
+        print("%s: %2.4f +/- %2.4f (%2.2f%%)"
+              % (metric, mean, half_width, 100 * half_width / abs(mean) if mean else float('inf')))
+
+
+# ****************************************        Function Declaration        **************************************** #
+def profile_output(profile):
+    phase_time = sum(phase['TIME'] for phase in profile['PHASES'].values())
+    print("\nProfile of %d simulations: %2.4f s total, %2.4f s in the instrumented phases."
+          % (profile['REPLICATIONS'], profile['TOTAL_TIME'], phase_time))
+    for name, phase in profile['PHASES'].items():
+        if phase['CALLS']:
+            print("%-14s %10d calls %10.4f s %9.1f ns/call %6.2f%%"
+                  % (name, phase['CALLS'], phase['TIME'], phase['NS_PER_CALL'],
+                     100 * phase['TIME'] / profile['TOTAL_TIME'] if profile['TOTAL_TIME'] else 0.0))
+    print("Decisions: %s" % ', '.join('%s %d' % item for item in profile['DECISIONS'].items()))
+    print("Time steps cranes waited for robots: %d" % profile['ROBOT_WAITS'])
+
+
 # ****************************************        Function Declaration        **************************************** #
 def graph_output(params, mean_s_time_arr, mean_wq_time_arr, mean_q_len_arr, num_c_arr, num_s_arr):
+    # pyplot takes longer to import than the rest of the simulator, so it is only imported to plot.
+    from matplotlib import pyplot as plt
     sim_ctrl = params['SIM_CTRL']
     if params['MODE'] == 'deterministic':
         raise NotImplementedError
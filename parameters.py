@@ -7,6 +7,22 @@ sim_ctrl = PARAM_DICT['SIM_CTRL']
 sim_ctrl['T_SIM_IN'] = 1440
 # Number of simulations to run
 sim_ctrl['N'] = 30
+# Simulation engine: 'time_step' (minute by minute), 'event' (next-event, for work times of tens of minutes) or 'batch'
+# (vectorized replications)
+sim_ctrl['ENGINE'] = 'time_step'
+# Variance reduction: None, 'crn' (dedicated random stream per random source, for common random numbers) or
+# 'antithetic' (crn with antithetic pairs of simulations)
+sim_ctrl['VARIANCE_REDUCTION'] = None
+# Sequential stopping rule: maximum half-width of the confidence interval of the mean relative to the mean, per result
+# (e.g. {'MEAN_WQ_TIME': 0.02}). If given, simulations are run in rounds of N until every target is met.
+sim_ctrl['CI_TARGET'] = None
+# Confidence level of the stopping rule
+sim_ctrl['CI_LEVEL'] = 0.95
+# Maximum number of simulations to run with the stopping rule
+sim_ctrl['N_MAX'] = 3000
+# Steady state mode: a single simulation of T_SIM_IN time steps, whose warm-up is truncated and whose remainder is
+# split in N batches (batch means), instead of N simulations starting from an empty docking station
+sim_ctrl['STEADY_STATE'] = False
 
 # Deterministic Parameters
 PARAM_DICT['D_PARAMS'] = dict()
@@ -0,0 +1,290 @@
+#!/usr/bin/env python
+"""
+File Description: File defining the simulation of a port of several terminals used for DWRS.
+    Every terminal has its own ship queue, cranes and robots, given as overrides of D_PARAMS in PARAM_DICT['TERMINALS'],
+    and is simulated by the time stepped engine with its own random stream. The terminals share nothing but robots: at
+    the end of every window of SIM_CTRL['TRANSFER_TIME'] time steps, an idle robot can be sent from the terminal with
+    the most idle robots to a terminal whose queue reached SIM_CTRL['TRANSFER_QUEUE'] ships while it has no idle robot.
+    The robot leaves at the start of the next window and, as the transfer takes a whole window, arrives at the start of
+    the window after. A transfer decided at the end of a window thus never affects that window, so the terminals can
+    be simulated window by window in parallel processes, exchanging their state only at the window ends. The results
+    do not depend on the number of processes.
+"""
+
+# ******************************************    Libraries to be imported    ****************************************** #
+from __future__ import print_function, division
+from itertools import chain
+from multiprocessing import Pipe, Process
+import numpy as np
+from utils import ENGINE_VERSION, t_arr_creator
+from result_cache import cache_key
+from sim_class_def import ShipQueue, Robot, Pallet, Crane, CraneOrder, Brain
+from samplers import Sampler, replication_rng, source_rng
+from online_stats import TAIL_QUANTILE, OnlineStats, TimeAverage
+from simulation_func import compile_result, run_time_steps, engine_functions
+
+
+# ******************************************    Class Declaration Start     ****************************************** #
+class Terminal(object):
+    """
+    Terminal Class
+    A terminal of the port, simulated by the time stepped engine one window of time steps at a time.
+    """
+
+    def __init__(self, params, rng=np.random):
+        """
+        Constructor of Terminal Class.
+
+        :param dict params: A dictionary containing the parameters of the terminal.
+        :param rng: The random number generator to sample from (np.random.Generator, the global np.random or
+            RandomStreams).
+        """
+        det_params = params['D_PARAMS']
+        self.t_sim_in = params['SIM_CTRL']['T_SIM_IN']
+        self.robot_time = det_params['TC']
+        self.t_step = 0
+        self.c_var = 0
+
+        # The random values are drawn in the same order as in simulate.
+        self.t_arr = t_arr_creator(params, source_rng(rng, 'ARRIVAL'))
+        self.arr_steps = np.flatnonzero(self.t_arr).tolist()
+        self.s_stats, self.wq_stats = OnlineStats(quantiles=(TAIL_QUANTILE,)), OnlineStats(quantiles=(TAIL_QUANTILE,))
+        self.q_stats = TimeAverage()
+
+        self.ship_queue = ShipQueue(max_length=det_params['L'])
+        self.crane_order = CraneOrder([Crane(pallet=Pallet(capacity=det_params['P'])) for _ in range(det_params['C'])])
+        self.robot_list = [Robot(work_time=det_params['TC']) for _ in range(det_params['T'])]
+
+        self.brain = Brain(params, self.robot_list, rng)
+        self.funcs = engine_functions(self.ship_queue, self.crane_order, self.brain,
+                                       Sampler(params['S_PARAMS']['K'], source_rng(rng, 'K')), None)
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def run(self, t_end, robot_change=0):
+        """
+        Simulate the time steps up to t_end.
+
+        :param int t_end: The time step at which the window ends.
+        :param int robot_change: Number of robots arriving at (if positive) or leaving (if negative) the terminal at the
+            start of the window.
+        :return: A tuple of the queue length and the number of idle robots at the end of the window.
+        """
+        for _ in range(robot_change):
+            self.brain.robot_pool.add(Robot(work_time=self.robot_time))
+        for _ in range(-robot_change):
+            self.brain.robot_pool.remove()
+
+        self.c_var += run_time_steps(self.t_step, t_end, self.t_arr, self.arr_steps, self.ship_queue, self.robot_list,
+                                     (self.s_stats, self.wq_stats, self.q_stats), self.funcs)
+        self.t_step = t_end
+        return len(self.ship_queue), sum(1 for robot in self.robot_list if not robot.locked and not robot.working)
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def result(self):
+        """
+        :return: A tuple of the result dictionary of the terminal and the statistics of the service and queue wait
+            times.
+        """
+        result = compile_result(self.s_stats, self.wq_stats, self.q_stats.mean(self.t_sim_in), self.q_stats.max_val,
+                                self.c_var)
+        return result, self.s_stats, self.wq_stats
+
+# ******************************************    Class Declaration End       ****************************************** #
+
+
+# ****************************************        Function Declaration        **************************************** #
+def simulate_port(params, seed_seq, processes=1):
+    """
+    Function that implements the simulation of a port of several terminals.
+
+    :param dict params: A dictionary containing the interpreted parameters, with PARAM_DICT['TERMINALS'] given.
+    :param np.random.SeedSequence seed_seq: The seed sequence of this replication. Every terminal draws from its own
+        stream derived from it.
+    :param int processes: Number of processes the terminals are simulated in.
+    :return: The result dictionary of the port, with the result dictionary of every terminal under 'TERMINALS' and the
+        number of robot transfers under 'ROBOT_TRANSFERS'.
+    """
+    sim_ctrl = params['SIM_CTRL']
+    num_terminals = len(params['TERMINALS'])
+    # The terminals are dealt out to the processes.
+    processes = max(1, min(processes, num_terminals))
+    groups = [list(range(ind, num_terminals, processes)) for ind in range(processes)]
+    terminals, conns, workers = None, [], []
+    try:
+        if len(groups) == 1:
+            terminals = _create_terminals(params, seed_seq, groups[0])
+        else:
+            for group in groups:
+                conn, worker_conn = Pipe()
+                worker = Process(target=_terminal_worker, args=(worker_conn, params, seed_seq, group), daemon=True)
+                worker.start()
+                worker_conn.close()
+                conns.append(conn)
+                workers.append(worker)
+
+        def exchange(msgs):
+            # Sends every group its message and returns the replies in the order of the terminals.
+            if terminals is not None:
+                replies = [_serve(terminals, msgs[0])]
+            else:
+                for conn, msg in zip(conns, msgs):
+                    conn.send(msg)
+                replies = [conn.recv() for conn in conns]
+            ordered = [None] * num_terminals
+            for group, reply in zip(groups, replies):
+                for ind, val in zip(group, reply):
+                    ordered[ind] = val
+            return ordered
+
+        window = sim_ctrl['TRANSFER_TIME']
+        robot_changes, robot_arrivals, num_transfers = [0] * num_terminals, [0] * num_terminals, 0
+        for t_end in chain(range(window, sim_ctrl['T_SIM_IN'], window), [sim_ctrl['T_SIM_IN']]):
+            states = exchange([(t_end, [robot_changes[ind] for ind in group]) for group in groups])
+
+            # Robots sent at the end of the previous window arrive at the start of the next one.
+            robot_changes, robot_arrivals = robot_arrivals, [0] * num_terminals
+            transfer = plan_transfer(states, robot_changes, sim_ctrl['TRANSFER_QUEUE'])
+            if transfer is not None:
+                robot_changes[transfer[0]] -= 1
+                robot_arrivals[transfer[1]] += 1
+                num_transfers += 1
+
+        outputs = exchange([None] * len(groups))
+    finally:
+        for conn in conns:
+            conn.close()
+        for worker in workers:
+            worker.join()
+
+    s_count = sum(s_stats.count for _, s_stats, _ in outputs)
+    wq_count = sum(wq_stats.count for _, _, wq_stats in outputs)
+    result = dict()
+    result['MEAN_SERV_TIME'] = sum(s_stats.total for _, s_stats, _ in outputs) / s_count if s_count else float('nan')
+    result['MEAN_WQ_TIME'] = sum(wq_stats.total for _, _, wq_stats in outputs) / wq_count if wq_count else float('nan')
+    result['MEAN_Q_LEN'] = sum(terminal['MEAN_Q_LEN'] for terminal, _, _ in outputs)
+    result['CARGO_TRANS'] = sum(terminal['CARGO_TRANS'] for terminal, _, _ in outputs)
+    result['SHIPS_SERVICED'] = s_count
+    result['ROBOT_TRANSFERS'] = num_transfers
+    result['TERMINALS'] = [terminal for terminal, _, _ in outputs]
+    return result
+
+
+# ****************************************        Function Declaration        **************************************** #
+def plan_transfer(states, robot_changes, transfer_queue):
+    """
+    Function that decides the robot transfer at the end of a window. The terminal with the longest queue of at least
+    transfer_queue ships and no idle robot gets a robot from the terminal with the most idle robots, if that terminal
+    has at least two. Ties go to the terminal listed first.
+
+    :param list[tuple] states: The (queue length, idle robots) tuple of every terminal.
+    :param list[int] robot_changes: Number of robots every terminal gains or loses at the start of the next window.
+    :param int transfer_queue: The queue length from which a terminal without idle robots asks for a robot.
+    :return: A (from terminal, to terminal) tuple, None if no robot is transferred.
+    """
+    idle = [num_idle + change for (_, num_idle), change in zip(states, robot_changes)]
+    waiting = [ind for ind, (q_len, _) in enumerate(states) if q_len >= transfer_queue and idle[ind] <= 0]
+    if not waiting:
+        return None
+    to_ind = max(waiting, key=lambda ind: states[ind][0])
+    from_ind = max(range(len(states)), key=idle.__getitem__)
+    if idle[from_ind] < 2:
+        return None
+    return from_ind, to_ind
+
+
+# ****************************************        Function Declaration        **************************************** #
+def replicate_port(params, seed_seq, cache=None, processes=1):
+    """
+    Function that runs a single replication of the port simulation.
+
+    :param dict params: A dictionary containing the interpreted parameters, with PARAM_DICT['TERMINALS'] given.
+    :param np.random.SeedSequence seed_seq: The seed sequence of this replication.
+    :param ResultCache cache: Optional result cache. A cached result is returned instead of simulating again.
+    :param int processes: Number of processes the terminals are simulated in.
+    :return: The result dictionary of the port.
+    """
+    if cache is None:
+        return simulate_port(params, seed_seq, processes)
+
+    key = cache_key(params, seed_seq, ENGINE_VERSION)
+    result = cache.get(key)
+    if result is None:
+        result = simulate_port(params, seed_seq, processes)
+        cache.put(key, result)
+    return result
+
+
+# ****************************************        Function Declaration        **************************************** #
+def _create_terminals(params, seed_seq, inds):
+    """
+    Function that creates the terminals of a process, each with its own random stream.
+    """
+    terminals = []
+    for ind in inds:
+        terminal_params = dict(params, D_PARAMS=params['TERMINALS'][ind])
+        # The stream seeds are derived like children of the seed sequence, without changing its spawn counter.
+        terminal_seq = np.random.SeedSequence(seed_seq.entropy, spawn_key=seed_seq.spawn_key + (ind,))
+        terminals.append(Terminal(terminal_params, replication_rng(terminal_params, terminal_seq)))
+    return terminals
+
+
+# ****************************************        Function Declaration        **************************************** #
+def _serve(terminals, msg):
+    """
+    Function that answers a message of the coordinator: a (window end, robot changes) tuple to run a window, or None to
+    collect the results.
+    """
+    if msg is None:
+        return [terminal.result() for terminal in terminals]
+    t_end, robot_changes = msg
+    return [terminal.run(t_end, robot_change) for terminal, robot_change in zip(terminals, robot_changes)]
+
+
+# ****************************************        Function Declaration        **************************************** #
+def _terminal_worker(conn, params, seed_seq, inds):
+    """
+    Function run by a worker process, simulating a group of terminals until the results are collected.
+    """
+    terminals = _create_terminals(params, seed_seq, inds)
+    try:
+        while True:
+            msg = conn.recv()
+            conn.send(_serve(terminals, msg))
+            if msg is None:
+                break
+    except EOFError:
+        # The coordinator stopped early.
+        pass
+    finally:
+        conn.close()
+
+
+# ******************************************        Isolated Testing        ****************************************** #
+if __name__ == '__main__':
+    from utils import load_params, param_interpreter
+
+    test_params = param_interpreter(load_params('./example_parameters/parameters_ex_3.py'))
+
+    # The results must not depend on the number of processes.
+    test_seq = np.random.SeedSequence(0)
+    test_results = [simulate_port(test_params, test_seq, test_processes) for test_processes in (1, 2, 4)]
+    for test_result in test_results:
+        print({key: val for key, val in test_result.items() if key != 'TERMINALS'})
+    assert repr(test_results[0]) == repr(test_results[1]) == repr(test_results[2])
+    print("The results do not depend on the number of processes.")
+
+    # Robots sent away and back reuse their slots, so the robot list of a terminal does not grow with the transfers.
+    test_terminal_params = dict(test_params, D_PARAMS=test_params['TERMINALS'][0])
+    test_terminal = Terminal(test_terminal_params, replication_rng(test_terminal_params, test_seq))
+    test_pool, test_max_robots = test_terminal.brain.robot_pool, len(test_terminal.robot_list)
+    for test_ind in range(100):
+        test_terminal.run(10 * (test_ind + 1), robot_change=1 if test_ind % 2 else -1)
+        test_max_robots = max(test_max_robots, len(test_pool.robot_list) - len(test_pool._removed))
+    assert len(test_terminal.robot_list) == test_max_robots
+    print("After 100 robot transfers the terminal holds %d robot slots." % len(test_terminal.robot_list))
+
+"""
+Author(s): Yash Bansod, Shivam Mishra
+Repository: https://github.com/YashBansod
+Organization: University of Maryland at College Park
+"""
@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+"""
+File Description: File defining the profiler used to instrument the hot path of the simulation.
+    The object engines call the functions of every phase of a time step (arrivals, robot work, crane sorting, docking,
+    decisions, crane work and the final statistics) through local references. Without a profiler these are the plain
+    functions, so disabled instrumentation costs nothing. With a profiler, the references are replaced by wrappers that
+    count the calls and accumulate the time spent per phase, count the decisions per work type and count the time steps
+    in which a crane had to wait for its robot.
+    The results are available as a dictionary, or as pstats.Stats with one pseudo function per phase.
+"""
+
+# ******************************************    Libraries to be imported    ****************************************** #
+from __future__ import print_function, division
+import pstats
+import time
+from sim_class_def import WORK_NAMES
+
+# Phases of a time step, in the order they are run.
+PHASES = ('ARRIVALS', 'ROBOTS', 'FAST_FORWARD', 'SORT', 'DOCKING', 'DECISION', 'INITIATE_WORK', 'CONTINUE_WORK',
+          'STATISTICS')
+
+
+# ******************************************    Class Declaration Start     ****************************************** #
+class Profiler(object):
+    """
+    Profiler Class
+    The timings include the overhead of the timer calls, which is roughly 50 to 100 ns per call.
+    """
+
+    def __init__(self):
+        """
+        Constructor of Profiler Class.
+        """
+        self.calls = {phase: 0 for phase in PHASES}
+        self.time = {phase: 0.0 for phase in PHASES}
+        self.decisions = [0] * len(WORK_NAMES)
+        self.robot_waits = 0
+        self.replications = 0
+        self.total_time = 0.0
+        self.stats = dict()
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def timed(self, func, phase):
+        """
+        Wrap a function to count its calls and time spent in a phase.
+
+        :param func: The function to wrap.
+        :param str phase: The phase of the function, one of PHASES.
+        :return: The wrapped function.
+        """
+        calls, times, clock = self.calls, self.time, time.perf_counter
+
+        def wrapper(*args):
+            start = clock()
+            val = func(*args)
+            times[phase] += clock() - start
+            calls[phase] += 1
+            return val
+        return wrapper
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def timed_decision(self, func):
+        """
+        Wrap Brain.decision to also count the decisions per work type.
+        """
+        decisions, timed_func = self.decisions, self.timed(func, 'DECISION')
+
+        def wrapper(crane):
+            val = timed_func(crane)
+            decisions[val[0]] += 1
+            return val
+        return wrapper
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def timed_continue_work(self, func):
+        """
+        Wrap Crane.continue_work to also count the time steps in which a crane waits for its robot. A waiting crane
+        keeps its remaining time instead of counting it down.
+        """
+        timed_func = self.timed(func, 'CONTINUE_WORK')
+
+        def wrapper(crane):
+            rem_time = crane.get_remaining_time()
+            val = timed_func(crane)
+            if not val and crane.get_remaining_time() == rem_time:
+                self.robot_waits += 1
+            return val
+        return wrapper
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def timed_fast_forward(self, func):
+        """
+        Wrap Crane.fast_forward to also count the skipped time steps in which a crane waits for its robot. A crane
+        waits in every skipped time step starting with one remaining time step.
+        """
+        timed_func = self.timed(func, 'FAST_FORWARD')
+
+        def wrapper(crane, num_steps):
+            self.robot_waits += max(0, num_steps - crane.get_remaining_time() + 1)
+            return timed_func(crane, num_steps)
+        return wrapper
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def add_replication(self, run_time):
+        """
+        Record a finished replication.
+
+        :param float run_time: The total time of the replication in seconds.
+        """
+        self.replications += 1
+        self.total_time += run_time
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def to_dict(self):
+        """
+        :return: A dictionary of the profile. Every phase maps to its number of calls, total time in seconds and mean
+            time per call in nanoseconds.
+        """
+        phases = {phase: {'CALLS': self.calls[phase], 'TIME': self.time[phase],
+                          'NS_PER_CALL': 1e9 * self.time[phase] / self.calls[phase] if self.calls[phase] else 0.0}
+                  for phase in PHASES}
+        return {'REPLICATIONS': self.replications, 'TOTAL_TIME': self.total_time, 'PHASES': phases,
+                'DECISIONS': dict(zip(WORK_NAMES, self.decisions)), 'ROBOT_WAITS': self.robot_waits}
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def create_stats(self):
+        # Called by pstats.Stats. Every phase is reported as a pseudo function of the simulation.
+        self.stats = {('simulation_func.py', 0, phase.lower()): (self.calls[phase], self.calls[phase],
+                                                                 self.time[phase], self.time[phase], {})
+                      for phase in PHASES if self.calls[phase]}
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def get_stats(self):
+        """
+        :return: The profile as pstats.Stats, e.g. to print it with get_stats().sort_stats('tottime').print_stats().
+        """
+        return pstats.Stats(self)
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def dump_stats(self, path):
+        """
+        Write the profile to a file in the format of cProfile, readable by pstats and profile viewers.
+
+        :param str path: Path of the file.
+        """
+        self.get_stats().dump_stats(path)
+
+# ******************************************    Class Declaration End       ****************************************** #
+
+
+# ******************************************        Isolated Testing        ****************************************** #
+if __name__ == '__main__':
+    raise NotImplementedError('Isolated testing not implemented. Test it with the main simulation.')
+
+"""
+Author(s): Yash Bansod, Shivam Mishra
+Repository: https://github.com/YashBansod
+Organization: University of Maryland at College Park
+"""
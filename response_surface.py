@@ -0,0 +1,241 @@
+#!/usr/bin/env python
+"""
+File Description: File defining the response surface used to answer what-if queries without simulating.
+    The response surface holds, for every grid point simulated so far, the mean of every metric over the replications
+    and the variance of that mean. Every grid point is described by the mean of each of its varied parameters, e.g. the
+    mean number of containers of K. A Gaussian process with a squared exponential kernel is fitted to every metric,
+    with the replication variance as the noise of the observations, so that a query returns the predicted mean and its
+    standard deviation. The standard deviation grows away from the simulated points and tells where new simulations are
+    worthwhile.
+"""
+
+# ******************************************    Libraries to be imported    ****************************************** #
+from __future__ import print_function, division
+import itertools
+import math
+import numbers
+import numpy as np
+from distributions import compile_distribution
+from simulation_func import METRICS
+
+# Length scales (relative to the range of the simulated points) and signal variances (relative to the variance of the
+# metric) among which the Gaussian process of every metric is fitted by maximum marginal likelihood.
+LENGTH_SCALES = (0.1, 0.2, 0.35, 0.5, 0.75, 1.0, 1.5, 2.0)
+SIGNAL_VARIANCES = (0.25, 1.0, 4.0)
+JITTER = 1e-8
+
+
+# ****************************************        Function Declaration        **************************************** #
+def spec_mean(val):
+    """
+    This function is used to get the mean of a parameter value.
+
+    :param val: A number, a tuple specifying a random distribution or a compiled distribution object.
+    :return: The number, or the mean of the distribution.
+    :rtype: float
+    """
+    return float(val) if isinstance(val, numbers.Number) else float(compile_distribution(val).mean)
+
+
+# ****************************************        Function Declaration        **************************************** #
+def param_mean(params, name):
+    """
+    This function is used to get the mean of a parameter, the coordinate of a grid point in the response surface.
+
+    :param dict params: A dictionary containing the parameters.
+    :param str name: A key of the SIM_CTRL, D_PARAMS or S_PARAMS section of the parameters.
+    :return: The value of a deterministic parameter, or the mean of a random one.
+    :rtype: float
+    """
+    for section in ('SIM_CTRL', 'D_PARAMS', 'S_PARAMS'):
+        if name in params[section]:
+            return spec_mean(params[section][name])
+    raise KeyError("Parameter %s not found." % name)
+
+
+# ******************************************    Class Declaration Start     ****************************************** #
+class ResponseSurface(object):
+    """
+    ResponseSurface Class
+    """
+
+    def __init__(self, names):
+        """
+        Constructor of ResponseSurface Class.
+
+        :param list[str] names: The names of the varied parameters.
+        """
+        self.names = list(names)
+        self.x = np.zeros((0, len(self.names)))
+        self.y = {metric: np.zeros(0) for metric in METRICS}
+        self.y_var = {metric: np.zeros(0) for metric in METRICS}
+        self.hyper = dict()
+        self._models = dict()
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def __len__(self):
+        return len(self.x)
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def features(self, point):
+        """
+        :param dict point: The parameter dictionary of a grid point.
+        :return: The coordinates of the grid point.
+        :rtype: ndarray
+        """
+        return np.array([param_mean(point, name) for name in self.names])
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def add(self, point, results):
+        """
+        Add the replications of a grid point. The model has to be fitted again afterwards.
+
+        :param dict point: The parameter dictionary of the grid point.
+        :param dict results: A dictionary holding an array of the replication values for every metric. NaN values are
+            left out.
+        """
+        self.x = np.vstack((self.x, self.features(point)))
+        for metric in METRICS:
+            values = np.asarray(results[metric], dtype=float)
+            values = values[~np.isnan(values)]
+            mean = values.mean() if len(values) else float('nan')
+            var = values.var(ddof=1) / len(values) if len(values) > 1 else 0.0
+            self.y[metric] = np.append(self.y[metric], mean)
+            self.y_var[metric] = np.append(self.y_var[metric], var)
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def fit(self, search=True):
+        """
+        Fit the Gaussian process of every metric.
+
+        :param bool search: Whether to search the hyperparameters, else the previously fitted ones are used.
+        """
+        for metric in METRICS:
+            if search or metric not in self.hyper:
+                best = None
+                for length, signal_var in itertools.product(LENGTH_SCALES, SIGNAL_VARIANCES):
+                    model = self._fit_metric(metric, length, signal_var)
+                    if model is not None and (best is None or model['LML'] > best['LML']):
+                        best = model
+                self._models[metric] = best
+                self.hyper[metric] = (best['LENGTH'], best['SIGNAL_VAR']) if best is not None else None
+            else:
+                self._models[metric] = (self._fit_metric(metric, *self.hyper[metric])
+                                        if self.hyper[metric] is not None else None)
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def predict(self, x, metric):
+        """
+        Predict a metric at a number of points.
+
+        :param ndarray x: The coordinates of a point, or a (number of points, number of parameters) array.
+        :param str metric: The metric, one of METRICS.
+        :return: A (mean, standard deviation) tuple, of floats for a single point or of arrays.
+        """
+        model = self._models.get(metric)
+        x = np.asarray(x, dtype=float)
+        if model is None:
+            nan = np.full(x.shape[:-1], np.nan)
+            return (float('nan'), float('nan')) if x.ndim == 1 else (nan, nan)
+
+        x_n = (x - model['LO']) / model['SPAN']
+        dist = ((x_n[..., np.newaxis, :] - model['X']) ** 2).sum(axis=-1)
+        k_star = model['SIGNAL_VAR'] * np.exp(-0.5 * dist / model['LENGTH'] ** 2)
+        mean = model['MU'] + model['SD'] * (k_star @ model['ALPHA'])
+        var = model['SIGNAL_VAR'] - ((k_star @ model['K_INV']) * k_star).sum(axis=-1)
+        std = model['SD'] * np.sqrt(np.maximum(var, 0.0))
+        if x.ndim == 1:
+            return float(mean), float(std)
+        return mean, std
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def save(self, path):
+        """
+        Write the simulated grid points and the fitted hyperparameters to a NPZ file.
+
+        :param str path: Path of the file.
+        """
+        arrays = {'NAMES': np.array(self.names), 'X': self.x}
+        for metric in METRICS:
+            arrays['Y/' + metric] = self.y[metric]
+            arrays['Y_VAR/' + metric] = self.y_var[metric]
+            arrays['HYPER/' + metric] = np.array(self.hyper.get(metric) or (np.nan, np.nan))
+        np.savez(path, **arrays)
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    @classmethod
+    def load(cls, path):
+        """
+        Read a response surface written by save and fit it with its hyperparameters.
+
+        :param str path: Path of the file.
+        :rtype: ResponseSurface
+        """
+        with np.load(path) as arrays:
+            surface = cls([str(name) for name in arrays['NAMES']])
+            surface.x = arrays['X']
+            for metric in METRICS:
+                surface.y[metric] = arrays['Y/' + metric]
+                surface.y_var[metric] = arrays['Y_VAR/' + metric]
+                hyper = arrays['HYPER/' + metric]
+                surface.hyper[metric] = None if np.isnan(hyper).any() else (float(hyper[0]), float(hyper[1]))
+        surface.fit(search=False)
+        return surface
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def _fit_metric(self, metric, length, signal_var):
+        # The coordinates are scaled to the range of the points and the metric is standardized.
+        valid = ~np.isnan(self.y[metric])
+        if valid.sum() < 2:
+            return None
+        x, y, y_var = self.x[valid], self.y[metric][valid], self.y_var[metric][valid]
+        lo = x.min(axis=0)
+        span = np.where(x.max(axis=0) > lo, x.max(axis=0) - lo, 1.0)
+        mu, sd = y.mean(), y.std() if y.std() > 0 else 1.0
+
+        x_n = (x - lo) / span
+        dist = ((x_n[:, np.newaxis, :] - x_n[np.newaxis, :, :]) ** 2).sum(axis=-1)
+        k_mat = signal_var * np.exp(-0.5 * dist / length ** 2) + np.diag(y_var / sd ** 2 + JITTER)
+        try:
+            chol = np.linalg.cholesky(k_mat)
+        except np.linalg.LinAlgError:
+            return None
+        y_n = (y - mu) / sd
+        alpha = np.linalg.solve(chol.T, np.linalg.solve(chol, y_n))
+        lml = -0.5 * y_n @ alpha - np.log(np.diag(chol)).sum() - 0.5 * len(y) * math.log(2 * math.pi)
+        k_inv = np.linalg.solve(chol.T, np.linalg.solve(chol, np.eye(len(y))))
+        return {'X': x_n, 'LO': lo, 'SPAN': span, 'MU': mu, 'SD': sd, 'LENGTH': length, 'SIGNAL_VAR': signal_var,
+                'ALPHA': alpha, 'K_INV': k_inv, 'LML': lml}
+
+# ******************************************    Class Declaration End       ****************************************** #
+
+
+# ******************************************        Isolated Testing        ****************************************** #
+if __name__ == '__main__':
+    import time
+
+    # A smooth function observed with noise on a coarse grid must be predicted in between within a few deviations.
+    test_rng = np.random.default_rng(0)
+    test_surface = ResponseSurface(['A', 'B'])
+    for test_a, test_b in itertools.product(np.linspace(0, 4, 5), np.linspace(0, 4, 5)):
+        test_point = {'SIM_CTRL': dict(), 'D_PARAMS': {'A': test_a, 'B': test_b}, 'S_PARAMS': dict()}
+        test_values = np.sin(test_a) + 0.5 * test_b + test_rng.normal(0, 0.05, 30)
+        test_surface.add(test_point, {metric: test_values for metric in METRICS})
+    test_surface.fit()
+
+    test_x = test_rng.uniform(0, 4, (200, 2))
+    test_mean, test_std = test_surface.predict(test_x, 'MEAN_WQ_TIME')
+    test_err = np.abs(test_mean - (np.sin(test_x[:, 0]) + 0.5 * test_x[:, 1]))
+    print("Mean absolute error %2.4f, mean predicted deviation %2.4f." % (test_err.mean(), test_std.mean()))
+    print("Deviation far from the points %2.4f." % test_surface.predict(np.array([10.0, 10.0]), 'MEAN_WQ_TIME')[1])
+
+    test_start = time.perf_counter()
+    for test_ind in range(1000):
+        test_surface.predict(test_x[test_ind % 200], 'MEAN_WQ_TIME')
+    print("Query time %2.1f us." % (1e6 * (time.perf_counter() - test_start) / 1000))
+
+"""
+Author(s): Yash Bansod, Shivam Mishra
+Repository: https://github.com/YashBansod
+Organization: University of Maryland at College Park
+"""
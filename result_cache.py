@@ -0,0 +1,228 @@
+#!/usr/bin/env python
+"""
+File Description: File defining the content-addressed result cache of the simulation.
+    A simulation result is fully determined by the interpreted parameters, the seed and the version of the simulation
+    engine. The cache keys every result by a canonical hash of these, so identical requests are answered without
+    simulating again. Results are kept in an in-process memo and, optionally, in an on-disk directory whose total size
+    is bounded by evicting the least recently used entries. Several processes can write to the same directory: each
+    one measures the directory again after writing a sixteenth of the maximum size, so the directory never exceeds its
+    maximum size by more than a sixteenth per process.
+"""
+
+# ******************************************    Libraries to be imported    ****************************************** #
+from __future__ import print_function, division
+import os
+import pickle
+import tempfile
+from collections import OrderedDict
+from utils import param_digest
+
+# Default bounds of the cache.
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_MEMO_SIZE = 4096
+# The on-disk cache is measured again after every 1 / RESCAN_FRACTION of its maximum size written by this process.
+RESCAN_FRACTION = 16
+
+
+# ****************************************        Function Declaration        **************************************** #
+def cache_key(params, seed_seq, engine_version, *extra):
+    """
+    This function is used to compute the cache key of a simulation run.
+
+    :param dict params: A dictionary containing the interpreted parameters.
+    :param np.random.SeedSequence seed_seq: The seed sequence of the run.
+    :param int engine_version: Version of the simulation engine.
+    :param extra: Further JSON serializable values that change the result of the run.
+    :return: The key of the run.
+    :rtype: str
+    """
+    return param_digest(params, engine_version, seed_seq.entropy, list(seed_seq.spawn_key), *extra)
+
+
+# ******************************************    Class Declaration Start     ****************************************** #
+class ResultCache(object):
+    """
+    ResultCache Class
+    """
+
+    def __init__(self, path=None, max_bytes=DEFAULT_MAX_BYTES, memo_size=DEFAULT_MEMO_SIZE):
+        """
+        Constructor of ResultCache Class.
+
+        :param str path: Directory of the on-disk cache. Only the in-process memo is used if None.
+        :param int max_bytes: Maximum total size of the on-disk cache in bytes.
+        :param int memo_size: Maximum number of results kept in the in-process memo.
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.memo_size = memo_size
+        self._memo = OrderedDict()
+        # The size of the on-disk cache when it was last measured, plus the bytes written by this process since.
+        self._disk_bytes = 0
+        self._bytes_since_scan = 0
+
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+            self._scan()
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def get(self, key):
+        """
+        Look up a result in the cache.
+
+        :param str key: The key of the result.
+        :return: The cached result or None if the key is not in the cache.
+        """
+        if key in self._memo:
+            self._memo.move_to_end(key)
+            return self._memo[key]
+
+        if self.path is None:
+            return None
+        file_path = os.path.join(self.path, key + '.pkl')
+        try:
+            with open(file_path, 'rb') as cache_file:
+                result = pickle.load(cache_file)
+            # The modification time of an entry is its last access time for the LRU eviction.
+            os.utime(file_path)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+        self._remember(key, result)
+        return result
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def put(self, key, result):
+        """
+        Add a result to the cache.
+
+        :param str key: The key of the result.
+        :param result: The result to cache.
+        """
+        self._remember(key, result)
+        if self.path is None:
+            return
+
+        # Write to a temporary file first, so other processes never read a partially written entry.
+        file_desc, tmp_path = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+        with os.fdopen(file_desc, 'wb') as cache_file:
+            pickle.dump(result, cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+        file_path = os.path.join(self.path, key + '.pkl')
+        # An entry written again replaces its file, whose size no longer counts.
+        try:
+            self._disk_bytes -= os.path.getsize(file_path)
+        except OSError:
+            pass
+        size = os.path.getsize(tmp_path)
+        os.replace(tmp_path, file_path)
+        self._disk_bytes += size
+        self._bytes_since_scan += size
+
+        # Other processes write to the directory too, so the size is measured again before deciding on an eviction.
+        if self._disk_bytes > self.max_bytes or self._bytes_since_scan * RESCAN_FRACTION > self.max_bytes:
+            self._scan()
+            if self._disk_bytes > self.max_bytes:
+                self._evict()
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def _remember(self, key, result):
+        """
+        Add a result to the in-process memo, dropping the least recently used result if it is full.
+        """
+        self._memo[key] = result
+        self._memo.move_to_end(key)
+        if len(self._memo) > self.memo_size:
+            self._memo.popitem(last=False)
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def _disk_entries(self):
+        """
+        List the entries of the on-disk cache.
+
+        :return: A list of (access time, file path, size) tuples.
+        """
+        entries = []
+        for file_name in os.listdir(self.path):
+            if file_name.endswith('.pkl'):
+                file_path = os.path.join(self.path, file_name)
+                try:
+                    stat = os.stat(file_path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, file_path, stat.st_size))
+        return entries
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def _scan(self):
+        """
+        Measure the size of the on-disk cache.
+        """
+        self._disk_bytes = sum(size for _, _, size in self._disk_entries())
+        self._bytes_since_scan = 0
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def _evict(self):
+        """
+        Remove the least recently used entries until the on-disk cache is back to 90% of its maximum size.
+        """
+        entries = sorted(self._disk_entries())
+        self._disk_bytes = sum(size for _, _, size in entries)
+        for _, file_path, size in entries:
+            if self._disk_bytes <= 0.9 * self.max_bytes:
+                break
+            try:
+                os.remove(file_path)
+            except OSError:
+                continue
+            self._disk_bytes -= size
+        self._bytes_since_scan = 0
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def __getstate__(self):
+        # The memo is not sent to worker processes, they share results through the on-disk cache.
+        state = self.__dict__.copy()
+        state['_memo'] = OrderedDict()
+        return state
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def __setstate__(self, state):
+        # The size of the on-disk cache sent to a worker process is out of date, so the worker measures it again.
+        self.__dict__.update(state)
+        if self.path is not None:
+            self._scan()
+
+# ******************************************    Class Declaration End       ****************************************** #
+
+
+# ******************************************        Isolated Testing        ****************************************** #
+if __name__ == '__main__':
+    import itertools
+    from concurrent.futures import ProcessPoolExecutor
+    import numpy as np
+    from utils import load_params, param_interpreter
+    from simulation_func import replicate
+
+    # Worker processes writing to a small cache must keep it near its maximum size, like a single process does.
+    test_params = param_interpreter(load_params('parameters.py'))
+    test_seqs = np.random.SeedSequence(0).spawn(400)
+    for test_workers in (1, 4):
+        with tempfile.TemporaryDirectory() as test_dir:
+            test_cache = ResultCache(test_dir, max_bytes=20000)
+            if test_workers == 1:
+                list(map(replicate, itertools.repeat(test_params), test_seqs, itertools.repeat(test_cache)))
+            else:
+                # Every chunk of replications gets its own copy of the cache, like in the main simulation.
+                test_chunk = len(test_seqs) // (4 * test_workers)
+                with ProcessPoolExecutor(max_workers=test_workers) as test_executor:
+                    list(test_executor.map(replicate, itertools.repeat(test_params), test_seqs,
+                                           itertools.repeat(test_cache), chunksize=test_chunk))
+            test_bytes = sum(size for _, _, size in test_cache._disk_entries())
+            print("%d replications in %d processes: %d bytes in the cache of at most %d bytes."
+                  % (len(test_seqs), test_workers, test_bytes, test_cache.max_bytes))
+            assert test_bytes <= test_cache.max_bytes * (1 + test_workers / RESCAN_FRACTION)
+
+"""
+Author(s): Yash Bansod, Shivam Mishra
+Repository: https://github.com/YashBansod
+Organization: University of Maryland at College Park
+"""
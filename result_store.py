@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+"""
+File Description: File defining the on-disk result store used to checkpoint parameter sweeps.
+    Every finished replication of a sweep is appended to an SQLite database, keyed by a hash of its interpreted
+    parameters, its seed and the version of the simulation engine. When a sweep is run again with the same seed, the
+    replications already in the store are read back instead of being simulated, so an interrupted sweep resumes where
+    it stopped and a grid extended by a few values only simulates the new grid points. The store also records the
+    engine version every grid point was last simulated with, so replications left behind by a change of the engine are
+    told apart from grid points never simulated.
+"""
+
+# ******************************************    Libraries to be imported    ****************************************** #
+from __future__ import print_function, division
+import sqlite3
+import threading
+from utils import ENGINE_VERSION, param_digest
+from simulation_func import METRICS
+
+
+# ****************************************        Function Declaration        **************************************** #
+def replication_key(params, seed_seq):
+    """
+    This function is used to compute the store key of a replication.
+
+    :param dict params: A dictionary containing the interpreted parameters.
+    :param np.random.SeedSequence seed_seq: The seed sequence of the replication.
+    :return: The key of the replication.
+    :rtype: str
+    """
+    return param_digest(params, seed_seq.entropy, list(seed_seq.spawn_key), ENGINE_VERSION)
+
+
+# ****************************************        Function Declaration        **************************************** #
+def point_key(params, entropy):
+    """
+    This function is used to compute the store key of a grid point, independent of the engine version.
+
+    :param dict params: A dictionary containing the interpreted parameters.
+    :param int entropy: The entropy of the seed sequence of the sweep.
+    :return: The key of the grid point.
+    :rtype: str
+    """
+    return param_digest(params, entropy)
+
+
+# ******************************************    Class Declaration Start     ****************************************** #
+class ResultStore(object):
+    """
+    ResultStore Class
+    """
+
+    def __init__(self, path):
+        """
+        Constructor of ResultStore Class.
+
+        :param str path: Path of the SQLite database file. It is created if it does not exist.
+        """
+        self.path = path
+        # The streamed sweeps read and write the store from threads off the event loop, one at a time.
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._conn.execute('CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, %s)'
+                           % ', '.join('%s REAL' % metric for metric in METRICS))
+        self._conn.execute('CREATE TABLE IF NOT EXISTS points (key TEXT PRIMARY KEY, version INTEGER)')
+        self._conn.commit()
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def get_many(self, keys):
+        """
+        Read the results of a number of replications.
+
+        :param list[str] keys: The keys of the replications.
+        :return: A dictionary mapping the keys found in the store to their result dictionaries.
+        """
+        found = dict()
+        keys = list(keys)
+        with self._lock:
+            # SQLite limits the number of parameters of a single query.
+            for ind in range(0, len(keys), 500):
+                block = keys[ind:ind + 500]
+                rows = self._conn.execute('SELECT key, %s FROM results WHERE key IN (%s)'
+                                          % (', '.join(METRICS), ', '.join('?' * len(block))), block)
+                for row in rows:
+                    # SQLite stores NaN as NULL.
+                    found[row[0]] = {metric: float('nan') if val is None else val
+                                     for metric, val in zip(METRICS, row[1:])}
+        return found
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def get_versions(self, point_keys):
+        """
+        Read the engine versions the grid points were last simulated with.
+
+        :param list[str] point_keys: The keys of the grid points.
+        :return: A dictionary mapping the keys found in the store to their engine versions.
+        """
+        found = dict()
+        point_keys = list(point_keys)
+        with self._lock:
+            for ind in range(0, len(point_keys), 500):
+                block = point_keys[ind:ind + 500]
+                found.update(self._conn.execute('SELECT key, version FROM points WHERE key IN (%s)'
+                                                % ', '.join('?' * len(block)), block))
+        return found
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def put_many(self, items, point_keys=()):
+        """
+        Append the results of a number of replications and commit them to disk.
+
+        :param list[tuple] items: A list of (key, result dictionary) pairs.
+        :param point_keys: The keys of the grid points of the replications, recorded with the current engine version.
+        """
+        rows = [(key,) + tuple(float(result[metric]) for metric in METRICS) for key, result in items]
+        with self._lock:
+            self._conn.executemany('INSERT OR REPLACE INTO results VALUES (?, %s)' % ', '.join('?' * len(METRICS)),
+                                   rows)
+            self._conn.executemany('INSERT OR REPLACE INTO points VALUES (?, ?)',
+                                   [(key, ENGINE_VERSION) for key in set(point_keys)])
+            self._conn.commit()
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+# ******************************************    Class Declaration End       ****************************************** #
+
+
+# ******************************************        Isolated Testing        ****************************************** #
+if __name__ == '__main__':
+    raise NotImplementedError('Isolated testing not implemented. Test it with the test routines.')
+
+"""
+Author(s): Yash Bansod, Shivam Mishra
+Repository: https://github.com/YashBansod
+Organization: University of Maryland at College Park
+"""
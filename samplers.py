@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+"""
+File Description: File defining the sampler class used to draw random variates in the simulation.
+    Drawing a single value from NumPy creates a 1-element array for every draw. A Sampler instead draws vectorized
+    blocks of values and hands them out one by one from a buffer, refilling the buffer when it runs out.
+
+    Seeding contract: A Sampler owns no random state. It draws its blocks from the random number generator it is given,
+    so the values handed out only depend on the state of that generator and on the sequence of draws. The simulation
+    creates its samplers from the random number generator of the replication, hence a replication seeded with the same
+    seed reproduces the same values.
+
+    Variance reduction: With SIM_CTRL['VARIANCE_REDUCTION'] set, every random source of a replication (the arrivals,
+    the containers per ship and the CSP, CPT and CST work times) draws from its own RandomStream instead of a shared
+    generator. The n-th value of a source then uses the n-th uniform value of its stream in every configuration, so
+    configurations simulated with the same seed are compared on common random numbers. In 'antithetic' mode the odd
+    replications reuse the seed of the preceding even replication with antithetic streams.
+"""
+
+# ******************************************    Libraries to be imported    ****************************************** #
+from __future__ import print_function, division
+import numpy as np
+from distributions import RandomStream, compile_distribution
+
+# Size of the first block drawn by a sampler. The block size doubles on every refill up to MAX_BLOCK_SIZE.
+MIN_BLOCK_SIZE = 64
+MAX_BLOCK_SIZE = 4096
+
+# Random sources with a dedicated stream in the variance reduction modes.
+SOURCES = ('ARRIVAL', 'K', 'CSP', 'CPT', 'CST')
+
+
+# ******************************************    Class Declaration Start     ****************************************** #
+class Sampler(object):
+    """
+    Sampler Class
+    """
+
+    def __init__(self, dist, rng=np.random, block_size=MIN_BLOCK_SIZE, minimum=None):
+        """
+        Constructor of Sampler Class.
+
+        :param int or tuple or Distribution dist: An integer specifying a deterministic value, a tuple specifying a
+            distribution or a compiled distribution object.
+        :param rng: The random number generator to sample from (np.random.Generator or the global np.random).
+        :param int block_size: Number of values drawn on the first refill of the buffer.
+        :param int minimum: Optional lower bound the values are clipped to, e.g. 1 for the work times, which last at
+            least one time step.
+        """
+        self.dist = compile_distribution(dist)
+        self.rng = rng
+        self.block_size = block_size
+        self.minimum = minimum
+        self._constant = self.dist.value if self.dist.deterministic else None
+        if self._constant is not None and minimum is not None:
+            self._constant = max(self._constant, minimum)
+        self._buffer = []
+        self._index = 0
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def draw(self):
+        """
+        Draw a single value from the distribution.
+
+        :return: A sample from the distribution.
+        :rtype: int
+        """
+        if self._constant is not None:
+            return self._constant
+
+        if self._index >= len(self._buffer):
+            self._refill()
+
+        val = self._buffer[self._index]
+        self._index += 1
+        return val
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def draw_block(self, sz):
+        """
+        Draw a block of values from the distribution. Values left in the buffer are handed out first.
+
+        :param int sz: Number of values to draw.
+        :return: The samples from the distribution.
+        :rtype: ndarray
+        """
+        if self._constant is not None:
+            return np.full(sz, self._constant, dtype=int)
+
+        if self._index >= len(self._buffer):
+            return self._sample(sz)
+
+        val = np.asarray(self._buffer[self._index:self._index + sz], dtype=int)
+        self._index += len(val)
+        if len(val) < sz:
+            val = np.concatenate((val, self._sample(sz - len(val))))
+        return val
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def _refill(self):
+        """
+        Refill the buffer with a new block of values.
+        """
+        self._buffer = self._sample(self.block_size).tolist()
+        self._index = 0
+        self.block_size = min(2 * self.block_size, MAX_BLOCK_SIZE)
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def _sample(self, sz):
+        val = self.dist.sample(sz, self.rng)
+        if self.minimum is not None:
+            np.maximum(val, self.minimum, out=val)
+        return val
+
+# ******************************************    Class Declaration End       ****************************************** #
+
+
+# ******************************************    Class Declaration Start     ****************************************** #
+class RandomStreams(object):
+    """
+    RandomStreams Class
+    The random streams of the sources of a replication.
+    """
+
+    def __init__(self, seed_seq, antithetic=False):
+        """
+        Constructor of RandomStreams Class.
+
+        :param np.random.SeedSequence seed_seq: The seed sequence of the replication.
+        :param bool antithetic: Whether the streams hand out antithetic values.
+        """
+        # The stream seeds are derived like children of the seed sequence, without changing its spawn counter.
+        self.streams = {source: RandomStream(np.random.SeedSequence(seed_seq.entropy,
+                                                                    spawn_key=seed_seq.spawn_key + (ind,)), antithetic)
+                        for ind, source in enumerate(SOURCES)}
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def __getitem__(self, source):
+        return self.streams[source]
+
+# ******************************************    Class Declaration End       ****************************************** #
+
+
+# ****************************************        Function Declaration        **************************************** #
+def source_rng(rng, source):
+    """
+    This function is used to get the random number generator of a random source.
+
+    :param rng: The random number generator of the replication (np.random.Generator, the global np.random or
+        RandomStreams).
+    :param str source: The random source, one of SOURCES.
+    :return: The dedicated stream of the source for RandomStreams, else the random number generator itself.
+    """
+    if isinstance(rng, RandomStreams):
+        return rng[source]
+    return rng
+
+
+# ****************************************        Function Declaration        **************************************** #
+def replication_rng(params, seed_seq):
+    """
+    This function is used to create the random number generator of a replication.
+
+    :param dict params: A dictionary containing the interpreted parameters.
+    :param np.random.SeedSequence seed_seq: The seed sequence of the replication.
+    :return: A np.random.Generator, or RandomStreams in the variance reduction modes.
+    """
+    mode = params['SIM_CTRL']['VARIANCE_REDUCTION']
+    if mode is None:
+        return np.random.default_rng(seed_seq)
+
+    antithetic = False
+    if mode == 'antithetic' and seed_seq.spawn_key and seed_seq.spawn_key[-1] % 2 == 1:
+        seed_seq = np.random.SeedSequence(seed_seq.entropy, spawn_key=seed_seq.spawn_key[:-1] +
+                                          (seed_seq.spawn_key[-1] - 1,))
+        antithetic = True
+    return RandomStreams(seed_seq, antithetic)
+
+
+# ******************************************        Isolated Testing        ****************************************** #
+if __name__ == '__main__':
+    raise NotImplementedError('Isolated testing not implemented. Test it with the simulation function.')
+
+"""
+Author(s): Yash Bansod, Shivam Mishra
+Repository: https://github.com/YashBansod
+Organization: University of Maryland at College Park
+"""
@@ -0,0 +1,289 @@
+#!/usr/bin/env python
+"""
+File Description: File defining the per ship and per crane operation trace of the simulation.
+    While the simulation runs, every ship leaving the docking station (serviced or balked) and every work started by a
+    crane is streamed to a trace directory. The ships and crane operations are held in tables, and the columns of a
+    table are written in chunks of rows:
+    - uncompressed, every column is a raw binary file the chunks are appended to, so the reader memory-maps the columns
+      and never loads more than the rows accessed.
+    - compressed, every chunk is a compressed NPZ file, so the reader loads the chunks one at a time.
+    The layout, the column types and the chunk sizes are kept in a JSON meta file, rewritten after every chunk.
+"""
+
+# ******************************************    Libraries to be imported    ****************************************** #
+from __future__ import print_function, division
+import json
+import os
+from os.path import join
+import numpy as np
+
+# Columns of the tables and their types. Ships still in the queue or docked at the end of a simulation have a service
+# start or end time of -1.
+TABLES = {'ships': (('REP', 'int32'), ('ARR_TIME', 'int32'), ('SERV_START', 'int32'), ('SERV_END', 'int32'),
+                    ('NUM_CONTAINERS', 'int32'), ('BALKED', 'bool')),
+          'cranes': (('REP', 'int32'), ('TIME', 'int32'), ('CRANE', 'int16'), ('WORK_TYPE', 'int8'),
+                     ('WORK_TIME', 'int32'), ('ROBOT', 'int32'))}
+TRACE_VERSION = 1
+DEFAULT_CHUNK_SIZE = 65536
+
+
+# ******************************************    Class Declaration Start     ****************************************** #
+class TraceWriter(object):
+    """
+    TraceWriter Class
+    """
+
+    def __init__(self, path, chunk_size=DEFAULT_CHUNK_SIZE, compress=False):
+        """
+        Constructor of TraceWriter Class.
+
+        :param str path: The trace directory. The files of an existing trace in it are removed.
+        :param int chunk_size: Number of rows buffered before they are written.
+        :param bool compress: Whether to write compressed NPZ chunks instead of memory-mappable columns.
+        """
+        self.path = path
+        self.chunk_size = chunk_size
+        self.compress = compress
+        self.rep = -1
+        self._crane_ind = dict()
+        self._rows = {table: [] for table in TABLES}
+        self._chunks = {table: [] for table in TABLES}
+
+        os.makedirs(path, exist_ok=True)
+        self._clear()
+        self._write_meta()
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def start_replication(self, crane_list):
+        """
+        Start the trace of a new simulation.
+
+        :param list[Crane] crane_list: The cranes of the simulation, numbered in this order.
+        """
+        self.rep += 1
+        self._crane_ind = {crane: ind for ind, crane in enumerate(crane_list)}
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def ship(self, ship, balked=False):
+        """
+        Record a ship leaving the docking station.
+
+        :param Ship ship: The ship.
+        :param bool balked: Whether the ship balked as the queue was full.
+        """
+        self._append('ships', (self.rep, ship.arr_time, ship.serv_start, ship.serv_end, ship.total_containers, balked))
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def crane_work(self, t_step, crane):
+        """
+        Record a work started by a crane.
+
+        :param int t_step: The current time step.
+        :param Crane crane: The crane, right after initiating its work.
+        """
+        robot_ind = getattr(crane.to_obj, 'pool_ind', -1)
+        self._append('cranes', (self.rep, t_step, self._crane_ind[crane], crane.work_type, crane.work_time, robot_ind))
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def end_replication(self, ship_queue, crane_list):
+        """
+        Record the ships still queued or docked at the end of the simulation.
+
+        :param ShipQueue ship_queue: The ship queue.
+        :param list[Crane] crane_list: The cranes.
+        """
+        for ship in ship_queue:
+            self.ship(ship)
+        for crane in sorted(crane_list, key=self._crane_ind.__getitem__):
+            if crane.docked_ship is not None:
+                self.ship(crane.docked_ship)
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def close(self):
+        """
+        Write the buffered rows.
+        """
+        for table in TABLES:
+            self._flush(table)
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def __enter__(self):
+        return self
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def _append(self, table, row):
+        rows = self._rows[table]
+        rows.append(row)
+        if len(rows) >= self.chunk_size:
+            self._flush(table)
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def _flush(self, table):
+        rows = self._rows[table]
+        if not rows:
+            return
+        arrays = {column: np.array([row[ind] for row in rows], dtype=dtype)
+                  for ind, (column, dtype) in enumerate(TABLES[table])}
+        if self.compress:
+            np.savez_compressed(join(self.path, '%s.%05d.npz' % (table, len(self._chunks[table]))), **arrays)
+        else:
+            for column, arr in arrays.items():
+                with open(self._column_path(table, column), 'ab') as column_file:
+                    arr.tofile(column_file)
+        self._chunks[table].append(len(rows))
+        self._rows[table] = []
+        self._write_meta()
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def _clear(self):
+        """
+        Remove the files of a trace previously written to the directory: the meta file first, so that an interrupted
+        clean up never leaves a meta file pointing to removed chunks, then the columns and compressed chunks of both
+        layouts. Other files are kept.
+        """
+        if os.path.exists(join(self.path, 'meta.json')):
+            os.remove(join(self.path, 'meta.json'))
+        for file_name in os.listdir(self.path):
+            table, _, ext = file_name.partition('.')
+            if table in TABLES and (ext.endswith('.bin') or ext.endswith('.npz')):
+                os.remove(join(self.path, file_name))
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def _column_path(self, table, column):
+        return join(self.path, '%s.%s.bin' % (table, column))
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def _write_meta(self):
+        meta = {'VERSION': TRACE_VERSION, 'COMPRESS': self.compress,
+                'TABLES': {table: {'COLUMNS': TABLES[table], 'CHUNKS': self._chunks[table]} for table in TABLES}}
+        with open(join(self.path, 'meta.json'), 'w') as meta_file:
+            json.dump(meta, meta_file)
+
+# ******************************************    Class Declaration End       ****************************************** #
+
+
+# ******************************************    Class Declaration Start     ****************************************** #
+class TraceTable(object):
+    """
+    TraceTable Class
+    A table of a trace. Columns are read with table[column], chunks of rows with table.chunks().
+    """
+
+    def __init__(self, path, name, meta):
+        """
+        Constructor of TraceTable Class.
+
+        :param str path: The trace directory.
+        :param str name: The name of the table.
+        :param dict meta: The meta data of the trace.
+        """
+        self.path = path
+        self.name = name
+        self.compress = meta['COMPRESS']
+        self.columns = {column: np.dtype(dtype) for column, dtype in meta['TABLES'][name]['COLUMNS']}
+        self.chunk_sizes = meta['TABLES'][name]['CHUNKS']
+        self.num_rows = sum(self.chunk_sizes)
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def __len__(self):
+        return self.num_rows
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def __getitem__(self, column):
+        """
+        :param str column: The name of the column.
+        :return: The column as a read-only memory-mapped array, or loaded from the chunks if compressed.
+        :rtype: ndarray
+        """
+        if self.compress:
+            return np.concatenate([chunk[column] for chunk in self.chunks()] or
+                                  [np.zeros(0, dtype=self.columns[column])])
+        if self.num_rows == 0:
+            return np.zeros(0, dtype=self.columns[column])
+        return np.memmap(join(self.path, '%s.%s.bin' % (self.name, column)), dtype=self.columns[column], mode='r',
+                         shape=(self.num_rows,))
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def chunks(self):
+        """
+        Iterate over the chunks of the table, holding a single chunk in memory at a time.
+
+        :return: An iterator over dictionaries of the column arrays of a chunk.
+        """
+        if self.compress:
+            for ind in range(len(self.chunk_sizes)):
+                with np.load(join(self.path, '%s.%05d.npz' % (self.name, ind))) as chunk:
+                    yield {column: chunk[column] for column in self.columns}
+        else:
+            columns = {column: self[column] for column in self.columns}
+            start = 0
+            for chunk_size in self.chunk_sizes:
+                yield {column: arr[start:start + chunk_size] for column, arr in columns.items()}
+                start += chunk_size
+
+# ******************************************    Class Declaration End       ****************************************** #
+
+
+# ******************************************    Class Declaration Start     ****************************************** #
+class TraceReader(object):
+    """
+    TraceReader Class
+    Reader of a trace directory. The tables are accessed with reader['ships'] and reader['cranes'].
+    """
+
+    def __init__(self, path):
+        """
+        Constructor of TraceReader Class.
+
+        :param str path: The trace directory.
+        """
+        with open(join(path, 'meta.json')) as meta_file:
+            meta = json.load(meta_file)
+        if meta['VERSION'] != TRACE_VERSION:
+            raise ValueError("Unsupported trace version %s." % meta['VERSION'])
+        self.tables = {name: TraceTable(path, name, meta) for name in meta['TABLES']}
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def __getitem__(self, name):
+        return self.tables[name]
+
+# ******************************************    Class Declaration End       ****************************************** #
+
+
+# ******************************************        Isolated Testing        ****************************************** #
+if __name__ == '__main__':
+    import tempfile
+    from utils import param_interpreter
+    from parameters import PARAM_DICT
+    from simulation_func import simulate
+
+    test_params = param_interpreter(PARAM_DICT)
+    with tempfile.TemporaryDirectory() as test_dir:
+        # The uncompressed trace reuses the directory of the compressed one, whose chunks it must remove.
+        for test_compress in (True, False):
+            test_results = []
+            with TraceWriter(test_dir, chunk_size=100, compress=test_compress) as test_writer:
+                for test_seed in range(5):
+                    test_results.append(simulate(test_params, np.random.default_rng(test_seed), trace=test_writer))
+            assert test_compress or not any(test_file.endswith('.npz') for test_file in os.listdir(test_dir))
+
+            # The serviced ships of the trace must give the results of the simulations.
+            test_ships = TraceReader(test_dir)['ships']
+            test_serviced = (test_ships['SERV_END'] >= 0) & ~test_ships['BALKED']
+            for test_rep, test_result in enumerate(test_results):
+                test_sel = test_serviced & (test_ships['REP'] == test_rep)
+                assert test_sel.sum() == test_result['SHIPS_SERVICED']
+                assert np.isclose((test_ships['SERV_END'] - test_ships['SERV_START'])[test_sel].mean(),
+                                  test_result['MEAN_SERV_TIME'])
+            print("Trace (compress=%s) of %d ships and %d crane operations matches the simulation results."
+                  % (test_compress, len(test_ships), len(TraceReader(test_dir)['cranes'])))
+
+"""
+Author(s): Yash Bansod, Shivam Mishra
+Repository: https://github.com/YashBansod
+Organization: University of Maryland at College Park
+"""
@@ -1,12 +1,24 @@
 #!/usr/bin/env python
 """
 File Description: File defining various classes used in the simulation.
+    The classes define __slots__ to keep the per replication state compact, and the cranes encode their work type as
+    an integer code instead of a string.
 """
 
 # ******************************************    Libraries to be imported    ****************************************** #
 from __future__ import print_function, division
 from collections import deque
-from utils import dist_interpreter, time_estimator
+import heapq
+from operator import attrgetter
+import numpy as np
+from utils import dist_interpreter
+from samplers import Sampler, source_rng
+
+# Work type codes of the cranes, and their names.
+WORK_NONE, WORK_CSP, WORK_CPT, WORK_CST = 0, 1, 2, 3
+WORK_NAMES = ('None', 'CSP', 'CPT', 'CST')
+
+_work_time = attrgetter('work_time')
 
 
 # ******************************************    Class Declaration Start     ****************************************** #
@@ -14,6 +26,7 @@ class ShipQueue(object):
     """
     ShipQueue Class
     """
+    __slots__ = ('max_len', 'num_balk', '_queue')
 
     def __init__(self, max_length):
         """
@@ -29,18 +42,24 @@ class ShipQueue(object):
     def __len__(self):
         return len(self._queue)
 
+    # ******************************        Class Method Declaration        ****************************************** #
+    def __iter__(self):
+        return iter(self._queue)
+
     # ******************************        Class Method Declaration        ****************************************** #
     def add_ship(self, ship_obj):
         """
         Add a ship to the queue.
 
         :param Ship ship_obj: An object of type Ship.
+        :return: True if the ship joined the queue, False if it balked.
         """
         # Ship balks if the queue is full.
         if len(self._queue) >= self.max_len:
             self.num_balk += 1
-        else:
-            self._queue.append(ship_obj)
+            return False
+        self._queue.append(ship_obj)
+        return True
 
     # ******************************        Class Method Declaration        ****************************************** #
     def pop_ship(self):
@@ -57,6 +76,7 @@ class Robot(object):
     """
     Robot Class
     """
+    __slots__ = ('working', 'locked', 'work_time', '_rem_time', 'pool', 'pool_ind')
 
     def __init__(self, work_time):
         """
@@ -68,6 +88,8 @@ class Robot(object):
         self.locked = False
         self.work_time = work_time
         self._rem_time = 0
+        self.pool = None
+        self.pool_ind = -1
 
     # ******************************        Class Method Declaration        ****************************************** #
     def initiate_work(self):
@@ -77,6 +99,8 @@ class Robot(object):
         self.working = True
         self.locked = False
         self._rem_time = self.work_time
+        if self.pool is not None:
+            self.pool.release(self)
 
     # ******************************        Class Method Declaration        ****************************************** #
     def continue_work(self):
@@ -92,6 +116,16 @@ class Robot(object):
             return True
         return False
 
+    # ******************************        Class Method Declaration        ****************************************** #
+    def fast_forward(self, num_steps):
+        """
+        Skip a number of time steps during which the Robot is known not to complete its work.
+        Used by the event driven engine to jump over time steps in which nothing happens.
+
+        :param int num_steps: Number of time steps to skip.
+        """
+        self._rem_time -= num_steps
+
     # ******************************        Class Method Declaration        ****************************************** #
     def connect(self):
         """
@@ -108,21 +142,149 @@ class Robot(object):
 # ******************************************    Class Declaration End       ****************************************** #
 
 
+# ******************************************    Class Declaration Start     ****************************************** #
+class RobotPool(object):
+    """
+    RobotPool Class
+    Index of the robots a crane can transfer a container to, i.e. the unlocked robots that are idle or whose remaining
+    time is below a threshold. A robot stays available from the time step it drops below the threshold until it is
+    locked, so the index is updated lazily: robots unlocked by initiating a work wait in a queue ordered by their
+    remaining time until they drop below the threshold, then move to a min-heap of robot_list indices. Locked robots
+    are dropped from the queue and the heap when they are met.
+    All robots share the same work time and count down together, so the queue in the order the robots were unlocked is
+    ordered by remaining time.
+    """
+    __slots__ = ('robot_list', 'thresholds', '_gen', '_pending', '_ready', '_in_ready', '_removed')
+
+    def __init__(self, robot_list, thresholds):
+        """
+        Constructor of RobotPool Class.
+
+        :param list[Robot] robot_list: The list of robots at the docking station. The robots report to this pool.
+        :param tuple[float] thresholds: The remaining time thresholds below which a working robot is available.
+        """
+        self.robot_list = robot_list
+        self.thresholds = thresholds
+        # Number of times every robot was unlocked, telling apart the queue entries of earlier works.
+        self._gen = [0] * len(robot_list)
+        self._pending = [deque() for _ in thresholds]
+        # All robots start idle and unlocked. The sorted list of indices already is a heap.
+        self._ready = [list(range(len(robot_list))) for _ in thresholds]
+        self._in_ready = [[True] * len(robot_list) for _ in thresholds]
+        # Indices of the removed robots, whose slots of robot_list are reused by the robots added.
+        self._removed = []
+        for ind, robot in enumerate(robot_list):
+            robot.pool = self
+            robot.pool_ind = ind
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def release(self, robot):
+        """
+        Register a Robot unlocked by initiating a work.
+
+        :param Robot robot: The robot.
+        """
+        self._gen[robot.pool_ind] += 1
+        entry = (robot, self._gen[robot.pool_ind])
+        for pending in self._pending:
+            pending.append(entry)
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def add(self, robot):
+        """
+        Add an idle Robot joining the docking station. It takes the slot of the last removed robot in robot_list, or is
+        appended to robot_list, so robot_list never holds more robots than the docking station had at once.
+
+        :param Robot robot: The robot.
+        """
+        robot.pool = self
+        if self._removed:
+            # The queue entries of the removed robot are dropped when they are met, as it is locked.
+            robot.pool_ind = self._removed.pop()
+            self.robot_list[robot.pool_ind] = robot
+            self._gen[robot.pool_ind] += 1
+        else:
+            robot.pool_ind = len(self.robot_list)
+            self.robot_list.append(robot)
+            self._gen.append(0)
+            for in_ready in self._in_ready:
+                in_ready.append(False)
+        for ready, in_ready in zip(self._ready, self._in_ready):
+            if not in_ready[robot.pool_ind]:
+                in_ready[robot.pool_ind] = True
+                heapq.heappush(ready, robot.pool_ind)
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def remove(self):
+        """
+        Remove the last idle and unlocked Robot of robot_list from the docking station. The robot stays in robot_list to
+        keep the indices, locked so it is never picked again, until a robot added takes its slot.
+
+        :return: The removed Robot, None if no robot is idle.
+        """
+        for robot in reversed(self.robot_list):
+            if not robot.locked and not robot.working:
+                robot.locked = True
+                self._removed.append(robot.pool_ind)
+                return robot
+        return None
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def first_available(self, key):
+        """
+        Find the first robot of robot_list that is unlocked and either idle or below a threshold.
+
+        :param int key: Index of the threshold in thresholds.
+        :return: The available Robot, None if there is none.
+        """
+        threshold = self.thresholds[key]
+        pending, ready, in_ready = self._pending[key], self._ready[key], self._in_ready[key]
+
+        while pending:
+            robot, gen = pending[0]
+            if robot.locked or gen != self._gen[robot.pool_ind]:
+                pending.popleft()
+            elif not robot.working or robot.get_remaining_time() < threshold:
+                pending.popleft()
+                if not in_ready[robot.pool_ind]:
+                    in_ready[robot.pool_ind] = True
+                    heapq.heappush(ready, robot.pool_ind)
+            else:
+                break
+
+        while ready:
+            robot = self.robot_list[ready[0]]
+            if not robot.locked and (not robot.working or robot.get_remaining_time() < threshold):
+                return robot
+            # The robot is queued again once it is unlocked.
+            in_ready[ready[0]] = False
+            heapq.heappop(ready)
+        return None
+
+# ******************************************    Class Declaration End       ****************************************** #
+
+
 # ******************************************    Class Declaration Start     ****************************************** #
 class Ship(object):
     """
     Ship Class
     """
+    __slots__ = ('arr_time', 'num_containers', 'total_containers', 'serv_start', 'serv_end')
 
-    def __init__(self, arrival_time, num_containers):
+    def __init__(self, arrival_time, num_containers, rng=np.random):
         """
         Constructor of Ship Class.
 
         :param int arrival_time: Time step at which ship arrives.
-        :param int or tuple num_containers: Total number of cargo-containers on the ship.
+        :param int or tuple or Sampler num_containers: Total number of cargo-containers on the ship.
+        :param rng: The random number generator to sample from (np.random.Generator or the global np.random).
         """
         self.arr_time = arrival_time
-        self.num_containers = dist_interpreter(num_containers)
+        if isinstance(num_containers, Sampler):
+            self.num_containers = num_containers.draw()
+        else:
+            self.num_containers = dist_interpreter(num_containers, rng)
+        self.total_containers = self.num_containers
         self.serv_start = -1
         self.serv_end = -1
 
@@ -156,6 +318,7 @@ class Pallet(object):
     """
     Pallet Class
     """
+    __slots__ = ('capacity', 'num_containers')
 
     def __init__(self, capacity):
         """
@@ -174,44 +337,51 @@ class Crane(object):
     """
     Crane Class
     """
+    __slots__ = ('working', 'work_type', 'work_hist', 'work_time', '_rem_time', 'pallet', 'docked_ship', 'from_obj',
+                 'to_obj', 'order')
 
-    def __init__(self, pallet):
+    def __init__(self, pallet, hist_len=0):
         """
         Constructor of Crane Class.
 
         :param Pallet pallet: A pallet connected to this crane. Crane will work on this pallet.
+        :param int hist_len: Number of most recent work types kept in work_hist. No history is kept if 0.
         """
         self.working = False
-        self.work_type = 'None'
-        self.work_hist = []
+        self.work_type = WORK_NONE
+        self.work_hist = deque(maxlen=hist_len) if hist_len > 0 else None
         self.work_time = -1
         self._rem_time = -1
         self.pallet = pallet
         self.docked_ship = None
         self.from_obj = None
         self.to_obj = None
+        self.order = None
 
     # ******************************        Class Method Declaration        ****************************************** #
     def initiate_work(self, work_type, work_time, to_obj):
         """
         Initiate work routine for Crane.
 
-        :param str work_type: One of {"CSP", "CPT", "CST"} specifying the type of work done by the crane.
+        :param int work_type: One of {WORK_CSP, WORK_CPT, WORK_CST} specifying the type of work done by the crane.
         :param int work_time: Denotes the service time associated with the work.
         :param Pallet or Robot to_obj: Points to an object where the crane will unload a cargo container.
         """
         self.working = True
         self.work_type = work_type
-        self.work_hist.append(work_type)
+        if self.work_hist is not None:
+            self.work_hist.append(work_type)
         self.work_time = work_time
         self._rem_time = work_time
+        if self.order is not None:
+            self.order.changed(self)
 
-        if work_type == 'CSP':
+        if work_type == WORK_CSP:
             assert to_obj is self.pallet
             self.from_obj = self.docked_ship
             self.to_obj = to_obj
 
-        elif work_type == 'CPT':
+        elif work_type == WORK_CPT:
             assert type(to_obj) == Robot
             self.from_obj = self.pallet
             self.to_obj = to_obj.connect()
@@ -234,7 +404,7 @@ class Crane(object):
         self._rem_time -= 1
 
         if self._rem_time == 0:
-            if self.work_type == "CSP":
+            if self.work_type == WORK_CSP:
                 assert self.to_obj.num_containers < self.to_obj.capacity
                 self.to_obj.num_containers += 1
 
@@ -250,13 +420,29 @@ class Crane(object):
                 self.to_obj.initiate_work()
 
             self.working = False
-            self.work_type = 'None'
+            self.work_type = WORK_NONE
             self.work_time = -1
             self.from_obj = None
             self.to_obj = None
+            if self.order is not None:
+                self.order.changed(self)
             return True
         return False
 
+    # ******************************        Class Method Declaration        ****************************************** #
+    def fast_forward(self, num_steps):
+        """
+        Skip a number of time steps during which the Crane is known not to complete its work.
+        A Crane waiting for its Robot stays at one remaining time step, exactly as continue_work would leave it.
+
+        :param int num_steps: Number of time steps to skip.
+        """
+        self._rem_time = max(self._rem_time - num_steps, 1)
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def get_remaining_time(self):
+        return self._rem_time
+
     # ******************************        Class Method Declaration        ****************************************** #
     def __lt__(self, other):
         return self.work_time < other.work_time
@@ -264,63 +450,124 @@ class Crane(object):
 # ******************************************    Class Declaration End       ****************************************** #
 
 
+# ******************************************    Class Declaration Start     ****************************************** #
+class CraneOrder(object):
+    """
+    CraneOrder Class
+    Order in which the cranes are served in a time step: by work time, with ties kept in the order of the previous time
+    step, exactly like sorting the crane list with Crane.__lt__ in every time step. Cranes report the changes of their
+    work time, and the order is only sorted again after a change. The sort compares the work times directly instead of
+    calling Crane.__lt__, and is linear on the nearly sorted order.
+    """
+    __slots__ = ('cranes', '_changed')
+
+    def __init__(self, crane_list):
+        """
+        Constructor of CraneOrder Class.
+
+        :param list[Crane] crane_list: The list of cranes at the docking station. The cranes report to this order.
+        """
+        self.cranes = sorted(crane_list, key=_work_time)
+        self._changed = False
+        for crane in self.cranes:
+            crane.order = self
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def changed(self, crane):
+        """
+        Register a Crane whose work time changed.
+
+        :param Crane crane: The crane.
+        """
+        self._changed = True
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def update(self):
+        """
+        Restore the order after the work times changed.
+
+        :return: The list of cranes in serving order.
+        :rtype: list[Crane]
+        """
+        if self._changed:
+            self._changed = False
+            self.cranes.sort(key=_work_time)
+        return self.cranes
+
+# ******************************************    Class Declaration End       ****************************************** #
+
+
 # ******************************************    Class Declaration Start     ****************************************** #
 class Brain(object):
     """
     Brain Class
     """
+    __slots__ = ('params', 'robot_list', 'robot_pool', 'csp_sampler', 'cpt_sampler', 'cst_sampler', 'cpt_estimate',
+                 'cst_estimate')
 
-    def __init__(self, params, robot_list):
+    def __init__(self, params, robot_list, rng=np.random):
         """
         Constructor of Brain Class.
 
         :param dict params: A dictionary containing parameters.
         :param list[Robot] robot_list: The list of robots at the docking station.
+        :param rng: The random number generator to sample from (np.random.Generator, the global np.random or
+            RandomStreams).
         """
         self.params = params
         self.robot_list = robot_list
+        # A work lasts at least one time step, also when its distribution (e.g. a normal one) reaches zero or below.
+        self.csp_sampler = Sampler(params['S_PARAMS']['CSP'], source_rng(rng, 'CSP'), minimum=1)
+        self.cpt_sampler = Sampler(params['S_PARAMS']['CPT'], source_rng(rng, 'CPT'), minimum=1)
+        self.cst_sampler = Sampler(params['S_PARAMS']['CST'], source_rng(rng, 'CST'), minimum=1)
+        self.cpt_estimate = self.cpt_sampler.dist.estimate
+        self.cst_estimate = self.cst_sampler.dist.estimate
+        self.robot_pool = RobotPool(robot_list, (self.cst_estimate, self.cpt_estimate))
 
     # ******************************        Class Method Declaration        ****************************************** #
     def decision(self, crane):
         """
         The decision function. This function is used to decide the task that a given crane should do.
         :param Crane crane: The crane for which a work decision should to be taken.
-        :return: A tuple specifying (work_type, work_time, to_obj)
+        :return: A tuple specifying (work_type, work_time, to_obj), with work_type one of the work type codes.
         """
         # If a ship is docked to the crane
         if crane.docked_ship is not None:
             # Search for an available robot to transfer the container to.
-            cst_time = dist_interpreter(self.params['S_PARAMS']['CST'])
-            for robot in self.robot_list:
-                if not robot.locked:
-                    if not robot.working:
-                        return 'CST', cst_time, robot
-                    elif robot.get_remaining_time() < time_estimator(self.params['S_PARAMS']['CST']):
-                        return 'CST', cst_time, robot
+            robot = self.robot_pool.first_available(0)
+            if robot is not None:
+                return WORK_CST, self.cst_sampler.draw(), robot
 
             # Else, search for an available pallet to transfer the container to.
-            csp_time = dist_interpreter(self.params['S_PARAMS']['CSP'])
             if crane.pallet.num_containers < crane.pallet.capacity:
-                return 'CSP', csp_time, crane.pallet
+                return WORK_CSP, self.csp_sampler.draw(), crane.pallet
 
         # If no ship is docked to the crane and the pallet is not empty
         elif crane.pallet.num_containers > 0:
             # Search for an available robot to transfer the container to.
-            cpt_time = dist_interpreter(self.params['S_PARAMS']['CPT'])
-            for robot in self.robot_list:
-                if not robot.locked:
-                    if not robot.working:
-                        return 'CPT', cpt_time, robot
-                    elif robot.get_remaining_time() < time_estimator(self.params['S_PARAMS']['CPT']):
-                        return 'CPT', cpt_time, robot
-        return 'None', -1, None
+            robot = self.robot_pool.first_available(1)
+            if robot is not None:
+                return WORK_CPT, self.cpt_sampler.draw(), robot
+        return WORK_NONE, -1, None
 
 # ******************************************    Class Declaration End       ****************************************** #
 
 
 # ******************************************        Isolated Testing        ****************************************** #
 if __name__ == '__main__':
-    raise NotImplementedError('Isolated testing not implemented. Test it with the simulation function.')
+    # The crane order must match sorting the crane list in every time step.
+    test_rng = np.random.default_rng(0)
+    for test_num in range(200):
+        test_cranes = [Crane(pallet=Pallet(capacity=1)) for _ in range(int(test_rng.integers(1, 20)))]
+        test_list = list(test_cranes)
+        test_order = CraneOrder(test_cranes)
+        for _ in range(100):
+            test_list.sort()
+            assert test_order.update() == test_list
+            for test_crane in test_rng.choice(test_cranes, size=int(test_rng.integers(0, 4))):
+                test_crane.work_time = int(test_rng.integers(-1, 6))
+                test_order.changed(test_crane)
+    print("Crane order matches the sorted crane list in 200 random runs.")
 
 """
 Author(s): Yash Bansod, Shivam Mishra
@@ -0,0 +1,358 @@
+#!/usr/bin/env python
+"""
+Dock Worker Robot Simulation Server.
+"""
+
+# ******************************************    Libraries to be imported    ****************************************** #
+from __future__ import print_function, division
+import argparse
+import json
+import signal
+import sys
+import threading
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from os.path import join
+from urllib.request import Request, urlopen
+from utils import ENGINE_VERSION, load_params, param_digest, param_interpreter, specs_to_tuples
+from result_cache import ResultCache
+from simulation_func import METRICS, replicate
+from port_simulation import replicate_port
+from batch_simulation import BATCH_SIZE, replicate_batch, split_batch_result
+from stopping_rule import targets_met
+
+DEFAULT_PORT = 8642
+# Result cache of a worker process. With a cache directory, the workers share the cached results on disk.
+_worker_cache = None
+
+
+# ****************************************        Function Declaration        **************************************** #
+def request_simulation(params, seed=None, num_sims=None, url='http://127.0.0.1:%d' % DEFAULT_PORT):
+    """
+    Function that requests the simulation of a parameter dictionary from a running server.
+
+    :param dict params: A dictionary containing the parameters, not interpreted.
+    :param int seed: The seed of the simulations, None for a random one.
+    :param int num_sims: Number of simulations to run, None for SIM_CTRL['N'] and the stopping rule.
+    :param str url: The address of the server.
+    :return: An iterator over the dictionaries streamed back by the server.
+    """
+    body = json.dumps({'params': params, 'seed': seed, 'n': num_sims}).encode('utf-8')
+    request = Request(url + '/simulate', data=body, headers={'Content-Type': 'application/json'})
+    with urlopen(request) as response:
+        for line in response:
+            yield json.loads(line)
+
+
+# ******************************************    Class Declaration Start     ****************************************** #
+class SimulationServer(ThreadingHTTPServer):
+    """
+    SimulationServer Class
+    A resident HTTP service keeping a warm pool of worker processes. A client posts a parameter dictionary and gets the
+    result of every replication streamed back as a JSON line as soon as it finishes:
+    - POST /simulate with {"params": PARAM_DICT, "seed": 7, "n": 30}, "seed" and "n" (default SIM_CTRL['N']) being
+      optional, streams {"REP": index, "RESULT": result} lines and a final {"DONE": true, "SEED": entropy, "NUM_REPS":
+      number, "MEAN": means} line. The replications are seeded like the main simulation, so the results are identical
+      to a run of main_simulation.py with the same seed.
+    - GET /status returns the counters of the server.
+    Every client is served in its own thread, while the replications of all clients run in the shared pool and result
+    cache. Identical replications requested while one is running are run once and sent to every client waiting for it.
+    """
+    daemon_threads = True
+
+    def __init__(self, address, workers=1, cache_path=None, warm_up_path='parameters.py'):
+        """
+        Constructor of SimulationServer Class.
+
+        :param tuple address: The (host, port) address to listen on.
+        :param int workers: Number of worker processes.
+        :param str cache_path: Directory of the on-disk result cache, shared with the simulation scripts. The workers
+            only keep an in-process cache if None.
+        :param str warm_up_path: Path of the parameter file the workers simulate briefly to warm up.
+        """
+        ThreadingHTTPServer.__init__(self, address, _RequestHandler)
+        self.workers = workers
+        self.executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(cache_path,))
+        self.counters = {'REQUESTS': 0, 'REPLICATIONS': 0, 'TASKS': 0, 'SHARED_TASKS': 0}
+        self._lock = threading.Lock()
+        # Running tasks by key, with the number of requests waiting for them.
+        self._tasks = dict()
+
+        # Every worker is started and runs a first simulation before the first request.
+        for future in [self.executor.submit(_warm_up, warm_up_path) for _ in range(workers)]:
+            future.result()
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def status(self):
+        """
+        :return: A dictionary of the counters of the server.
+        :rtype: dict
+        """
+        with self._lock:
+            return dict(self.counters, WORKERS=self.workers, RUNNING_TASKS=len(self._tasks))
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def run_request(self, params, root_seq, num_sims=None):
+        """
+        Run the replications of a request.
+
+        :param dict params: A dictionary containing the interpreted parameters.
+        :param np.random.SeedSequence root_seq: The seed sequence of the request.
+        :param int num_sims: Number of simulations to run, None for SIM_CTRL['N'] and the stopping rule.
+        :return: An iterator over the (replication index, result dictionary) tuples, in the order the replications
+            finish. Closing it early cancels the replications no other request waits for.
+        """
+        sim_ctrl = params['SIM_CTRL']
+        with self._lock:
+            self.counters['REQUESTS'] += 1
+        sim_results = {metric: [] for metric in METRICS}
+        num_done, num_round = 0, num_sims or sim_ctrl['N']
+        while num_round > 0:
+            waiting = dict()
+            try:
+                for first_rep, kind, seed_seq, num_reps in _round_tasks(params, root_seq, num_round, num_done):
+                    key, future = self._submit(kind, params, seed_seq, num_reps)
+                    waiting[future] = (key, first_rep)
+                for future in as_completed(list(waiting)):
+                    key, first_rep = waiting.pop(future)
+                    self._release(key)
+                    for offset, result in enumerate(future.result()):
+                        for metric in METRICS:
+                            sim_results[metric].append(result[metric])
+                        yield first_rep + offset, result
+            finally:
+                for key, _ in waiting.values():
+                    self._release(key)
+
+            num_done += num_round
+            with self._lock:
+                self.counters['REPLICATIONS'] += num_round
+            if num_sims is not None or sim_ctrl['CI_TARGET'] is None or targets_met(sim_results, params):
+                break
+            num_round = min(sim_ctrl['N'], sim_ctrl['N_MAX'] - num_done)
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def server_close(self):
+        ThreadingHTTPServer.server_close(self)
+        self.executor.shutdown(cancel_futures=True)
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def _submit(self, kind, params, seed_seq, num_reps):
+        # A task running for another request is shared instead of submitted again.
+        key = param_digest(params, ENGINE_VERSION, kind, seed_seq.entropy, list(seed_seq.spawn_key), num_reps)
+        with self._lock:
+            if key in self._tasks:
+                self._tasks[key][1] += 1
+                self.counters['SHARED_TASKS'] += 1
+            else:
+                self._tasks[key] = [self.executor.submit(_run_task, kind, params, seed_seq, num_reps), 1]
+                self.counters['TASKS'] += 1
+            return key, self._tasks[key][0]
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def _release(self, key):
+        # A task no request waits for any more is forgotten, and cancelled if it did not start.
+        with self._lock:
+            task = self._tasks[key]
+            task[1] -= 1
+            if task[1] == 0:
+                task[0].cancel()
+                del self._tasks[key]
+
+# ******************************************    Class Declaration End       ****************************************** #
+
+
+# ******************************************    Class Declaration Start     ****************************************** #
+class _RequestHandler(BaseHTTPRequestHandler):
+    """
+    _RequestHandler Class
+    """
+    protocol_version = 'HTTP/1.1'
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def do_GET(self):
+        if self.path != '/status':
+            self._send_json(404, {'ERROR': "Unknown path %s." % self.path})
+        else:
+            self._send_json(200, self.server.status())
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def do_POST(self):
+        if self.path != '/simulate':
+            self._send_json(404, {'ERROR': "Unknown path %s." % self.path})
+            return
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            params = param_interpreter(specs_to_tuples(body['params']))
+            root_seq = np.random.SeedSequence(body.get('seed'))
+            num_sims = body.get('n')
+            if params['SIM_CTRL']['STEADY_STATE']:
+                raise NotImplementedError("The steady state mode is not served, its batches are not replications.")
+        except (ValueError, KeyError, TypeError, NotImplementedError) as err:
+            self._send_json(400, {'ERROR': "Invalid request: %r" % err})
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        sim_results = {metric: [] for metric in METRICS}
+        replications = self.server.run_request(params, root_seq, num_sims)
+        try:
+            for rep, result in replications:
+                for metric in METRICS:
+                    sim_results[metric].append(result[metric])
+                self._send_chunk({'REP': rep, 'RESULT': result})
+            self._send_chunk({'DONE': True, 'SEED': root_seq.entropy, 'NUM_REPS': len(sim_results['SHIPS_SERVICED']),
+                              'MEAN': {metric: float(np.nanmean(np.asarray(vals, dtype=float)))
+                                       for metric, vals in sim_results.items()}})
+            self.wfile.write(b'0\r\n\r\n')
+        except (BrokenPipeError, ConnectionResetError):
+            # The client left, closing the iterator releases the replications it waited for.
+            self.close_connection = True
+        except Exception as err:
+            self._send_chunk({'ERROR': "Simulation failed: %r" % err})
+            self.wfile.write(b'0\r\n\r\n')
+        finally:
+            replications.close()
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def log_message(self, *args):
+        pass
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def _send_json(self, code, obj):
+        data = json.dumps(obj, default=_json_default).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    # ******************************        Class Method Declaration        ****************************************** #
+    def _send_chunk(self, obj):
+        data = json.dumps(obj, default=_json_default).encode('utf-8') + b'\n'
+        self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+        self.wfile.flush()
+
+# ******************************************    Class Declaration End       ****************************************** #
+
+
+# ****************************************        Function Declaration        **************************************** #
+def _round_tasks(params, root_seq, num_sims, first_rep):
+    """
+    Function that splits a round of simulations in tasks, spawning the seed sequences like the main simulation.
+
+    :return: A list of (index of the first replication, kind, seed sequence, number of replications) tuples.
+    """
+    if params.get('TERMINALS') is not None:
+        return [(first_rep + ind, 'port', seed_seq, 1) for ind, seed_seq in enumerate(root_seq.spawn(num_sims))]
+    if params['SIM_CTRL']['ENGINE'] == 'batch':
+        batch_sizes = [min(BATCH_SIZE, num_sims - ind) for ind in range(0, num_sims, BATCH_SIZE)]
+        return [(first_rep + ind * BATCH_SIZE, 'batch', seed_seq, num_reps)
+                for ind, (seed_seq, num_reps) in enumerate(zip(root_seq.spawn(len(batch_sizes)), batch_sizes))]
+    return [(first_rep + ind, 'replicate', seed_seq, 1) for ind, seed_seq in enumerate(root_seq.spawn(num_sims))]
+
+
+# ****************************************        Function Declaration        **************************************** #
+def _run_task(kind, params, seed_seq, num_reps):
+    """
+    Function that runs a task in a worker process.
+
+    :return: The list of the result dictionaries of the replications of the task.
+    """
+    if kind == 'port':
+        return [replicate_port(params, seed_seq, _worker_cache)]
+    elif kind == 'batch':
+        return split_batch_result(replicate_batch(params, seed_seq, num_reps, _worker_cache))
+    return [replicate(params, seed_seq, _worker_cache)]
+
+
+# ****************************************        Function Declaration        **************************************** #
+def _init_worker(cache_path):
+    global _worker_cache
+    _worker_cache = ResultCache(cache_path)
+
+
+# ****************************************        Function Declaration        **************************************** #
+def _warm_up(param_path):
+    # A short run of a single docking station, whatever the parameter file simulates.
+    params = load_params(param_path)
+    params.pop('TERMINALS', None)
+    params['SIM_CTRL'].update(T_SIM_IN=60, ENGINE='time_step', VARIANCE_REDUCTION=None, CI_TARGET=None,
+                              STEADY_STATE=False)
+    replicate(param_interpreter(params), np.random.SeedSequence(0))
+
+
+# ****************************************        Function Declaration        **************************************** #
+def _json_default(val):
+    if isinstance(val, np.generic):
+        return val.item()
+    raise TypeError("Object of type %s is not JSON serializable." % type(val).__name__)
+
+
+# ******************************************        Main Program Start      ****************************************** #
+def main(args):
+    """
+    The main of the program.
+    """
+    if args.request:
+        # Client mode: simulate the parameter file on a running server.
+        sim_results = {metric: [] for metric in METRICS}
+        for line in request_simulation(load_params(join(args.dir_path, args.parameter)), args.seed, args.num_sims,
+                                       'http://%s:%d' % (args.host, args.port)):
+            if 'ERROR' in line:
+                raise RuntimeError(line['ERROR'])
+            elif 'DONE' in line:
+                print("%d simulations (seed %s):" % (line['NUM_REPS'], line['SEED']))
+                for metric, mean in line['MEAN'].items():
+                    print("%s: %2.4f" % (metric, mean))
+            elif args.debug:
+                print(line['REP'], line['RESULT'])
+        return
+
+    server = SimulationServer((args.host, args.port), workers=args.workers, cache_path=args.cache,
+                              warm_up_path=join(args.dir_path, args.parameter))
+    # A terminated server shuts its worker processes down like an interrupted one.
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    print("Serving on http://%s:%d with %d warm workers." % (args.host, args.port, args.workers))
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+# ******************************************        Main Program End        ****************************************** #
+if __name__ == '__main__':
+
+    argparser = argparse.ArgumentParser(description='DWRS Simulation Server.')
+
+    argparser.add_argument('--host', default='127.0.0.1', type=str, help='Address to serve on or to request from.')
+    argparser.add_argument('--port', default=DEFAULT_PORT, type=int, help='Port to serve on or to request from.')
+    argparser.add_argument('-k', '--workers', default=1, type=int, help='Number of worker processes for replications.')
+    argparser.add_argument('--cache', default=None, type=str, help='Directory of the result cache.')
+    argparser.add_argument('-r', '--request', action='store_true',
+                           help='Request the simulation of the parameter file from a running server.')
+    argparser.add_argument('--dir_path', default='./', type=str, help='Directory path of parameter file.')
+    argparser.add_argument('-p', '--parameter', default='parameters.py', type=str,
+                           help='Name of the parameter file, requested or run by the server to warm its workers up.')
+    argparser.add_argument('-s', '--seed', default=None, type=int, help='Set seed for repeating executions')
+    argparser.add_argument('-n', '--num_sims', default=None, type=int, help='Number of simulations to request.')
+    argparser.add_argument('-v', '--verbose', action='store_true', dest='debug', help='Print every streamed result.')
+
+    sim_args = argparser.parse_args()
+
+    print(__doc__)
+
+    try:
+        main(sim_args)
+        print('\nFile executed successfully!\n')
+    except KeyboardInterrupt:
+        print('\nProcess interrupted by user. Bye!')
+
+"""
+Author(s): Yash Bansod, Shivam Mishra
+Repository: https://github.com/YashBansod
+Organization: University of Maryland at College Park
+"""
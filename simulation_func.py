@@ -6,77 +6,422 @@ File Description: File defining the simulation function used for DWRS. This func
 
 # ******************************************    Libraries to be imported    ****************************************** #
 from __future__ import print_function, division
+import bisect
+import heapq
+import math
+import time
 import numpy as np
-from tqdm import tqdm
-from utils import param_interpreter, t_arr_creator
-from output_functions import text_output
-from parameters import PARAM_DICT
-from sim_class_def import ShipQueue, Robot, Ship, Pallet, Crane, Brain
+from utils import ENGINE_VERSION, param_interpreter, t_arr_creator, time_estimator
+from result_cache import cache_key
+from sim_class_def import WORK_NONE, WORK_CSP, ShipQueue, Robot, Ship, Pallet, Crane, CraneOrder, Brain
+from samplers import Sampler, replication_rng, source_rng
+from online_stats import TAIL_QUANTILE, OnlineStats, TimeAverage
+from batch_simulation import simulate_batch, split_batch_result
+
+# Results of a simulation run.
+METRICS = ('MEAN_SERV_TIME', 'MEAN_WQ_TIME', 'MEAN_Q_LEN', 'CARGO_TRANS', 'SHIPS_SERVICED')
+# Further results describing the spread and the tail of the ship service and queue wait times and of the queue length.
+DETAIL_METRICS = ('STD_SERV_TIME', 'P90_SERV_TIME', 'MAX_SERV_TIME', 'STD_WQ_TIME', 'P90_WQ_TIME', 'MAX_WQ_TIME',
+                  'MAX_Q_LEN')
+
+
+# ****************************************        Function Declaration        **************************************** #
+def simulate(params, rng=np.random, profiler=None, trace=None):
+    """
+    Function that implements the simulation.
+    The engine used is selected by params['SIM_CTRL']['ENGINE'] ('time_step' by default, 'event' or 'batch'). The
+    time stepped engine jumps from a time step leaving the docking station idle straight to the next ship arrival.
+
+    :param dict params: A dictionary containing parameters.
+    :param rng: The random number generator to sample from (np.random.Generator, the global np.random or
+        RandomStreams).
+    :param Profiler profiler: Optional profiler instrumenting the phases of the simulation (not for the batch engine).
+    :param TraceWriter trace: Optional trace the ships and crane operations are written to (not for the batch engine).
+    :return: The result dictionary of the simulation.
+    """
+    sim_ctrl = params['SIM_CTRL']
+    if sim_ctrl.get('ENGINE', 'time_step') == 'event':
+        return simulate_event(params, rng, profiler, trace)
+    elif sim_ctrl.get('ENGINE', 'time_step') == 'batch':
+        if profiler is not None or trace is not None:
+            raise NotImplementedError("Profiling and tracing are not implemented for the batch engine.")
+        return split_batch_result(simulate_batch(params, 1, rng))[0]
+
+    start_time = time.perf_counter()
+
+    det_params = params['D_PARAMS']
+    st_params = params['S_PARAMS']
+
+    t_arr = t_arr_creator(params, source_rng(rng, 'ARRIVAL'))
+    s_stats, wq_stats = OnlineStats(quantiles=(TAIL_QUANTILE,)), OnlineStats(quantiles=(TAIL_QUANTILE,))
+    q_stats = TimeAverage()
+
+    ship_queue = ShipQueue(max_length=det_params['L'])
+    crane_list = [Crane(pallet=Pallet(capacity=det_params['P'])) for _ in range(det_params['C'])]
+    robot_list = [Robot(work_time=det_params['TC']) for _ in range(det_params['T'])]
+    if trace is not None:
+        trace.start_replication(crane_list)
+
+    brain = Brain(params, robot_list, rng)
+    k_sampler = Sampler(st_params['K'], source_rng(rng, 'K'))
+    crane_order = CraneOrder(crane_list)
+    funcs = engine_functions(ship_queue, crane_order, brain, k_sampler, profiler, trace)
+
+    c_var = run_time_steps(0, sim_ctrl['T_SIM_IN'], t_arr, np.flatnonzero(t_arr).tolist(), ship_queue, robot_list,
+                           (s_stats, wq_stats, q_stats), funcs, trace)
+
+    finish = funcs[-1]
+    result = finish(s_stats, wq_stats, q_stats.mean(sim_ctrl['T_SIM_IN']), q_stats.max_val, c_var)
+    if trace is not None:
+        trace.end_replication(ship_queue, crane_order.cranes)
+    if profiler is not None:
+        profiler.add_replication(time.perf_counter() - start_time)
+    return result
 
 
 # ****************************************        Function Declaration        **************************************** #
-def simulate(params):
+def simulate_event(params, rng=np.random, profiler=None, trace=None):
     """
-    Function that implements the simulation
+    Function that implements the simulation using a next-event engine.
+    Instead of stepping through every minute, a heap holds the time steps at which the state can change (ship
+    arrivals, crane completions, robot completions and robots becoming eligible for a new work) and the engine jumps
+    straight between them. Every visited time step is processed exactly like in the time stepped engine and random
+    values are only drawn when they are used, so the results are identical to the time stepped engine for the same
+    seed.
+
+    :param dict params: A dictionary containing parameters.
+    :param rng: The random number generator to sample from (np.random.Generator, the global np.random or
+        RandomStreams).
+    :param Profiler profiler: Optional profiler instrumenting the phases of the simulation.
+    :param TraceWriter trace: Optional trace the ships and crane operations are written to.
+    :return: The result dictionary of the simulation.
     """
+    start_time = time.perf_counter()
     sim_ctrl = params['SIM_CTRL']
     det_params = params['D_PARAMS']
     st_params = params['S_PARAMS']
+    t_sim_in = sim_ctrl['T_SIM_IN']
 
-    t_arr = t_arr_creator(params)
-    q_arr = np.zeros(sim_ctrl['T_SIM_IN'], dtype=np.uint32)
-    wq_list, s_list = [], []
+    t_arr = t_arr_creator(params, source_rng(rng, 'ARRIVAL'))
+    s_stats, wq_stats = OnlineStats(quantiles=(TAIL_QUANTILE,)), OnlineStats(quantiles=(TAIL_QUANTILE,))
+    q_stats = TimeAverage()
     c_var = 0
 
     ship_queue = ShipQueue(max_length=det_params['L'])
     crane_list = [Crane(pallet=Pallet(capacity=det_params['P'])) for _ in range(det_params['C'])]
     robot_list = [Robot(work_time=det_params['TC']) for _ in range(det_params['T'])]
+    if trace is not None:
+        trace.start_replication(crane_list)
+
+    brain = Brain(params, robot_list, rng)
+    k_sampler = Sampler(st_params['K'], source_rng(rng, 'K'))
+    arrive, robot_work, robot_fast_forward, order_cranes, pop_ship, decide, initiate_work, crane_work, \
+        crane_fast_forward, finish = engine_functions(ship_queue, CraneOrder(crane_list), brain, k_sampler, profiler,
+                                                      trace)
+
+    # A working robot can be picked for a new work once its remaining time drops below these estimates.
+    robot_eligible_steps = sorted({max(1, math.floor(det_params['TC'] - time_estimator(st_params[key])) + 1)
+                                   for key in ('CST', 'CPT')})
+
+    event_heap = list({0} | set(np.flatnonzero(t_arr).tolist()))
+    heapq.heapify(event_heap)
+    scheduled = set(event_heap)
+
+    def schedule(time_step):
+        if time_step < t_sim_in and time_step not in scheduled:
+            scheduled.add(time_step)
+            heapq.heappush(event_heap, time_step)
+
+    prev_step = 0
+    while event_heap:
+        t_step = heapq.heappop(event_heap)
+        scheduled.discard(t_step)
+
+        # Nothing completes between two events, so the skipped time steps only count down the remaining times.
+        num_skipped = t_step - prev_step - 1
+        if num_skipped > 0:
+            for robot in robot_list:
+                if robot.working:
+                    robot_fast_forward(robot, num_skipped)
+            for crane in crane_list:
+                if crane.working:
+                    crane_fast_forward(crane, num_skipped)
+
+        if t_arr[t_step]:
+            arrive(t_step)
+
+        for robot in robot_list:
+            if robot.working:
+                c_var += robot_work(robot)
+
+        crane_list = order_cranes()
+        for crane in crane_list:
+            if crane.docked_ship is None:
+                ship = pop_ship()
+                if ship is not None:
+                    crane.docked_ship = ship.dock(t_step)
+                    wq_stats.push(ship.serv_start - ship.arr_time)
+            else:
+                if crane.docked_ship.num_containers == 0:
+                    ship = crane.docked_ship
+                    crane.docked_ship = ship.undock(t_step)
+                    s_stats.push(ship.serv_end - ship.serv_start)
+                    if trace is not None:
+                        trace.ship(ship)
+                    # The crane can dock the next ship in the queue from the next time step.
+                    schedule(t_step + 1)
+
+            if not crane.working:
+                work_type, work_time, to_obj = decide(crane)
+                if work_type != WORK_NONE:
+                    initiate_work(crane, work_type, work_time, to_obj)
+                    if trace is not None:
+                        trace.crane_work(t_step, crane)
 
-    brain = Brain(params, robot_list)
+            if crane.working:
+                robot = crane.to_obj if crane.work_type != WORK_CSP else None
+                if crane_work(crane):
+                    # The crane takes its next decision in the next time step.
+                    schedule(t_step + 1)
+                    if robot is not None:
+                        schedule(t_step + robot.work_time)
+                        for num_steps in robot_eligible_steps:
+                            schedule(t_step + num_steps)
+                else:
+                    # A crane handing over to a robot that is still working has to wait for the robot.
+                    rem_time = crane.get_remaining_time()
+                    if robot is not None and robot.working:
+                        rem_time = max(rem_time, robot.get_remaining_time())
+                    schedule(t_step + rem_time)
+
+            # An emptied ship is undocked in the next time step.
+            if crane.docked_ship is not None and crane.docked_ship.num_containers == 0:
+                schedule(t_step + 1)
+
+        q_len = len(ship_queue)
+        if q_len != q_stats.value:
+            q_stats.update(t_step, q_len)
+        prev_step = t_step
+
+    result = finish(s_stats, wq_stats, q_stats.mean(t_sim_in), q_stats.max_val, c_var)
+    if trace is not None:
+        trace.end_replication(ship_queue, crane_list)
+    if profiler is not None:
+        profiler.add_replication(time.perf_counter() - start_time)
+    return result
+
+
+# ****************************************        Function Declaration        **************************************** #
+def replicate(params, seed_seq, cache=None, profiler=None, trace=None):
+    """
+    Function that runs a single replication of the simulation with its own random number generator.
+    Being a module level function, it can be dispatched to the workers of a process pool.
+
+    :param dict params: A dictionary containing parameters.
+    :param np.random.SeedSequence seed_seq: The seed sequence of this replication.
+    :param ResultCache cache: Optional result cache. A cached result is returned instead of simulating again.
+    :param Profiler profiler: Optional profiler. A profiled replication is always simulated, bypassing the cache.
+    :param TraceWriter trace: Optional trace. A traced replication is always simulated, bypassing the cache.
+    :return: The result dictionary of the simulation.
+    """
+    if params.get('TERMINALS') is not None:
+        raise NotImplementedError("Ports of several terminals are simulated by port_simulation.replicate_port.")
+    if params['SIM_CTRL'].get('STEADY_STATE'):
+        raise NotImplementedError("The steady state mode is simulated by steady_state.replicate_steady_state.")
+    if cache is None or profiler is not None or trace is not None:
+        return simulate(params, rng=replication_rng(params, seed_seq), profiler=profiler, trace=trace)
 
-    for t_step in range(sim_ctrl['T_SIM_IN']):
+    key = cache_key(params, seed_seq, ENGINE_VERSION)
+    result = cache.get(key)
+    if result is None:
+        result = simulate(params, rng=replication_rng(params, seed_seq))
+        cache.put(key, result)
+    return result
+
+
+# ****************************************        Function Declaration        **************************************** #
+def run_time_steps(t_step, t_end, t_arr, arr_steps, ship_queue, robot_list, stats, funcs, trace=None):
+    """
+    Function that runs the time stepped engine from the time step t_step up to t_end. It is shared by simulate and by
+    the terminals of port_simulation, which run it one window at a time.
+    A time step leaving the docking station idle jumps straight to the next ship arrival, or to t_end.
+
+    :param int t_step: The first time step to simulate.
+    :param int t_end: The time step at which the run ends.
+    :param ndarray t_arr: The ship arrivals of every time step.
+    :param list[int] arr_steps: The time steps with a ship arrival, in increasing order.
+    :param ShipQueue ship_queue: The ship queue.
+    :param list[Robot] robot_list: The robots.
+    :param tuple stats: The statistics of the service and queue wait times (OnlineStats) and of the queue length
+        (TimeAverage).
+    :param tuple funcs: The engine functions returned by engine_functions.
+    :param TraceWriter trace: Optional trace the ships and crane operations are written to.
+    :return: The number of containers transported by the robots.
+    :rtype: int
+    """
+    arrive, robot_work, _, order_cranes, pop_ship, decide, initiate_work, crane_work, _, _ = funcs
+    s_stats, wq_stats, q_stats = stats
+    c_var = 0
+
+    while t_step < t_end:
         if t_arr[t_step]:
-            ship_queue.add_ship(Ship(arrival_time=t_step, num_containers=st_params['K']))
+            arrive(t_step)
 
         for robot in robot_list:
             if robot.working:
-                c_var += robot.continue_work()
+                c_var += robot_work(robot)
 
-        crane_list.sort()
+        crane_list = order_cranes()
         for crane in crane_list:
             if crane.docked_ship is None:
-                ship = ship_queue.pop_ship()
+                ship = pop_ship()
                 if ship is not None:
                     crane.docked_ship = ship.dock(t_step)
-                    wq_list.append(ship.serv_start - ship.arr_time)
+                    wq_stats.push(ship.serv_start - ship.arr_time)
             else:
                 if crane.docked_ship.num_containers == 0:
                     ship = crane.docked_ship
                     crane.docked_ship = ship.undock(t_step)
-                    s_list.append(ship.serv_end - ship.serv_start)
+                    s_stats.push(ship.serv_end - ship.serv_start)
+                    if trace is not None:
+                        trace.ship(ship)
 
             if crane.working:
-                crane.continue_work()
+                crane_work(crane)
             else:
-                work_type, work_time, to_obj = brain.decision(crane)
-                if work_type != 'None':
-                    crane.initiate_work(work_type, work_time, to_obj)
-                    crane.continue_work()
+                work_type, work_time, to_obj = decide(crane)
+                if work_type != WORK_NONE:
+                    initiate_work(crane, work_type, work_time, to_obj)
+                    if trace is not None:
+                        trace.crane_work(t_step, crane)
+                    crane_work(crane)
+
+        q_len = len(ship_queue)
+        if q_len != q_stats.value:
+            q_stats.update(t_step, q_len)
+
+        # Nothing happens at an idle docking station until the next ship arrives, so the time steps up to the arrival
+        # are skipped. The queue stays empty over them, so the time average of its length is unchanged.
+        if not q_len and station_idle(crane_list, robot_list):
+            arr_ind = bisect.bisect_right(arr_steps, t_step)
+            t_step = min(arr_steps[arr_ind], t_end) if arr_ind < len(arr_steps) else t_end
+        else:
+            t_step += 1
+    return c_var
 
-        q_arr[t_step] = len(ship_queue)
 
+# ****************************************        Function Declaration        **************************************** #
+def engine_functions(ship_queue, crane_order, brain, k_sampler, profiler, trace=None):
+    """
+    Function that returns the functions called in the hot path of the object engines. The engines call them through
+    local references, so without a profiler they run uninstrumented.
+
+    :param ShipQueue ship_queue: The ship queue.
+    :param CraneOrder crane_order: The serving order of the cranes.
+    :param Brain brain: The brain taking the decisions of the cranes.
+    :param Sampler k_sampler: The sampler of the number of containers of the arriving ships.
+    :param Profiler profiler: Optional profiler instrumenting the functions.
+    :param TraceWriter trace: Optional trace the balked ships are written to.
+    :return: A tuple of the arrival, robot work, robot fast forward, crane ordering, docking, decision, work initiation,
+        crane work, crane fast forward and result functions.
+    """
+    def arrive(t_step):
+        ship = Ship(arrival_time=t_step, num_containers=k_sampler)
+        if not ship_queue.add_ship(ship) and trace is not None:
+            trace.ship(ship, balked=True)
+
+    funcs = (arrive, Robot.continue_work, Robot.fast_forward, crane_order.update, ship_queue.pop_ship, brain.decision,
+             Crane.initiate_work, Crane.continue_work, Crane.fast_forward, compile_result)
+    if profiler is None:
+        return funcs
+
+    return (profiler.timed(arrive, 'ARRIVALS'), profiler.timed(Robot.continue_work, 'ROBOTS'),
+            profiler.timed(Robot.fast_forward, 'FAST_FORWARD'), profiler.timed(crane_order.update, 'SORT'),
+            profiler.timed(ship_queue.pop_ship, 'DOCKING'), profiler.timed_decision(brain.decision),
+            profiler.timed(Crane.initiate_work, 'INITIATE_WORK'), profiler.timed_continue_work(Crane.continue_work),
+            profiler.timed_fast_forward(Crane.fast_forward), profiler.timed(compile_result, 'STATISTICS'))
+
+
+# ****************************************        Function Declaration        **************************************** #
+def compile_result(s_stats, wq_stats, mean_q_len, max_q_len, c_var):
+    """
+    Function that assembles the result dictionary of a simulation run.
+    """
     result = dict()
-    result['MEAN_SERV_TIME'] = np.mean(s_list)      # Mean service time
-    result['MEAN_WQ_TIME'] = np.mean(wq_list)       # Mean queue wait time
-    result['MEAN_Q_LEN'] = q_arr.mean()             # Mean queue length
+    result['MEAN_SERV_TIME'] = s_stats.mean         # Mean service time
+    result['MEAN_WQ_TIME'] = wq_stats.mean          # Mean queue wait time
+    result['MEAN_Q_LEN'] = mean_q_len               # Mean queue length
     result['CARGO_TRANS'] = c_var                   # Number of cargo containers transported to city
-    result['SHIPS_SERVICED'] = len(s_list)          # Number of ships processed
+    result['SHIPS_SERVICED'] = s_stats.count        # Number of ships processed
+
+    result['STD_SERV_TIME'] = s_stats.std
+    result['P90_SERV_TIME'] = s_stats.quantile(TAIL_QUANTILE)
+    result['MAX_SERV_TIME'] = s_stats.maximum
+    result['STD_WQ_TIME'] = wq_stats.std
+    result['P90_WQ_TIME'] = wq_stats.quantile(TAIL_QUANTILE)
+    result['MAX_WQ_TIME'] = wq_stats.maximum
+    result['MAX_Q_LEN'] = max_q_len
     return result
 
 
+# ****************************************        Function Declaration        **************************************** #
+def station_idle(crane_list, robot_list):
+    """
+    Function that tells whether a docking station with an empty ship queue stays unchanged until the next ship arrival.
+    That is the case when no crane has a docked ship, a container on its pallet or a work, and no robot works.
+
+    :param list[Crane] crane_list: The cranes.
+    :param list[Robot] robot_list: The robots.
+    :rtype: bool
+    """
+    for crane in crane_list:
+        if crane.working or crane.docked_ship is not None or crane.pallet.num_containers:
+            return False
+    for robot in robot_list:
+        if robot.working:
+            return False
+    return True
+
+
 # ******************************************    Test run definition     ********************************************** #
 if __name__ == '__main__':
+    import copy
+    from tqdm import tqdm
+    from output_functions import text_output
+    from parameters import PARAM_DICT
+
     try:
+        # Work times drawn at or below zero last a single time step, so the engines agree on a normal distribution.
+        test_dict = copy.deepcopy(PARAM_DICT)
+        test_dict['S_PARAMS']['CST'] = ('normal', 5, 1.5)
+        test_engines = dict()
+        for test_engine in ('time_step', 'event'):
+            test_dict['SIM_CTRL']['ENGINE'] = test_engine
+            test_params = param_interpreter(copy.deepcopy(test_dict))
+            test_engines[test_engine] = [simulate(test_params, np.random.default_rng(test_seed))
+                                         for test_seed in range(300)]
+        assert test_engines['time_step'] == test_engines['event']
+        print("Engines agree on 300 simulations with CST = ('normal', 5, 1.5).")
+
+        # A docking station without robots only fills the pallets. The batch engine agrees in deterministic mode.
+        from utils import load_params
+        test_cases = (('parameters.py', ('time_step', 'event')),
+                      ('example_parameters/parameters_ex_2.py', ('time_step', 'event', 'batch')))
+        for test_path, test_engine_names in test_cases:
+            test_dict = load_params(test_path)
+            test_dict['D_PARAMS']['T'] = 0
+            test_engines = dict()
+            for test_engine in test_engine_names:
+                test_dict['SIM_CTRL']['ENGINE'] = test_engine
+                test_params = param_interpreter(copy.deepcopy(test_dict))
+                test_engines[test_engine] = [simulate(test_params, np.random.default_rng(test_seed))
+                                             for test_seed in range(20)]
+            for test_engine in test_engine_names:
+                assert test_engines[test_engine] == test_engines['time_step']
+            assert all(test_result['CARGO_TRANS'] == 0 for test_result in test_engines['time_step'])
+            print("Engines %s agree on 20 simulations of %s without robots."
+                  % (', '.join(test_engine_names), test_path))
+
         param_dict = param_interpreter(PARAM_DICT)
         mean_s_time_arr = np.zeros(param_dict['SIM_CTRL']['N'])     # Mean service time
         mean_wq_time_arr = np.zeros(param_dict['SIM_CTRL']['N'])    # Mean queue wait time
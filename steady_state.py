@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+"""
+File Description: File defining the steady state mode of the simulation used for DWRS.
+    Instead of N independent replications starting from an empty docking station, a single long run of T_SIM_IN time
+    steps is simulated by the time stepped engine, and the sums of the results are recorded for every window of WINDOW
+    time steps. The warm-up period, biased by the empty start, is found by MSER-5 on the window series of the queue
+    length and of the queue wait time per time step, and truncated. The rest of the run is split in N batches, whose
+    results are used like the results of N replications: by the batch means method, their mean estimates the steady
+    state mean and their spread its confidence interval.
+"""
+
+# ******************************************    Libraries to be imported    ****************************************** #
+from __future__ import print_function, division
+import numpy as np
+from utils import ENGINE_VERSION
+from result_cache import cache_key
+from samplers import replication_rng
+from port_simulation import Terminal
+from simulation_func import METRICS
+
+# Number of time steps of a window of the recorded series.
+WINDOW = 10
+# Number of windows averaged into a batch by MSER.
+MSER_BATCH = 5
+# Minimum number of windows of a batch. Shorter batches are strongly correlated with each other, so their spread does
+# not give a valid confidence interval. A batch is also at least as long as the truncated warm-up.
+MIN_BATCH_WINDOWS = 30
+# Columns of the recorded series: the sum and the number of the service and queue wait times of the ships undocked
+# and docked in a window, the integral of the queue length and the number of containers transported.
+SERV_TOTAL, SERV_COUNT, WQ_TOTAL, WQ_COUNT, Q_AREA, CARGO = range(6)
+
+
+# ****************************************        Function Declaration        **************************************** #
+def mser(series, batch_size=MSER_BATCH):
+    """
+    This function is used to find the truncation point of a series by the MSER-m rule.
+    The series is averaged over batches of batch_size values, and the truncation leaving out the first d batches is
+    the one minimizing the variance of the mean of the remaining batches, sum((y_i - mean) ** 2) / (k - d) ** 2, for d
+    up to half of the k batches.
+
+    :param ndarray series: The series.
+    :param int batch_size: Number of values of a batch, m.
+    :return: Number of values of the series to truncate.
+    :rtype: int
+    """
+    num_batches = len(series) // batch_size
+    if num_batches < 2:
+        return 0
+    batch_means = series[:num_batches * batch_size].reshape(num_batches, batch_size).mean(axis=1)
+
+    # The sums over the remaining batches of every truncation are the reversed cumulative sums.
+    num_left = np.arange(num_batches, 0, -1)
+    left_sum = np.cumsum(batch_means[::-1])[::-1]
+    left_sq_sum = np.cumsum(batch_means[::-1] ** 2)[::-1]
+    statistic = (left_sq_sum - left_sum ** 2 / num_left) / num_left ** 2
+    return int(np.argmin(statistic[:num_batches // 2 + 1])) * batch_size
+
+
+# ****************************************        Function Declaration        **************************************** #
+def simulate_steady_state(params, rng=np.random):
+    """
+    Function that implements the steady state simulation.
+
+    :param dict params: A dictionary containing the interpreted parameters.
+    :param rng: The random number generator to sample from (np.random.Generator, the global np.random or
+        RandomStreams).
+    :return: A dictionary holding the truncated warm-up under 'WARM_UP' and the length of a batch under 'BATCH_LEN' (in
+        time steps), and a list of the values of the N batches for every metric in METRICS. The counts CARGO_TRANS and
+        SHIPS_SERVICED are per batch.
+    :raises ValueError: If the batches are shorter than MIN_BATCH_WINDOWS windows or than the warm-up, or if a batch
+        has no ship docked or undocked.
+    """
+    sim_ctrl = params['SIM_CTRL']
+    num_windows = sim_ctrl['T_SIM_IN'] // WINDOW
+    terminal = Terminal(params, rng)
+
+    series = np.zeros((num_windows, 6))
+    prev_sums = np.zeros(6)
+    for ind in range(num_windows):
+        t_end = (ind + 1) * WINDOW
+        terminal.run(t_end)
+        q_stats = terminal.q_stats
+        q_area = q_stats.area + q_stats.value * (t_end - q_stats.time)
+        sums = np.array([terminal.s_stats.total, terminal.s_stats.count, terminal.wq_stats.total,
+                         terminal.wq_stats.count, q_area, terminal.c_var])
+        series[ind] = sums - prev_sums
+        prev_sums = sums
+
+    warm_up = max(mser(series[:, Q_AREA]), mser(series[:, WQ_TOTAL]))
+    batch_windows = (num_windows - warm_up) // sim_ctrl['N']
+    min_windows = max(MIN_BATCH_WINDOWS, warm_up)
+    if batch_windows < min_windows:
+        raise ValueError("The steady state run of %d time steps is too short for %d batches of at least %d time steps "
+                         "after a warm-up of %d time steps." % (sim_ctrl['T_SIM_IN'], sim_ctrl['N'],
+                                                                min_windows * WINDOW, warm_up * WINDOW))
+    # The windows left over by the batches are truncated with the warm-up.
+    warm_up = num_windows - batch_windows * sim_ctrl['N']
+    batches = series[warm_up:].reshape(sim_ctrl['N'], batch_windows, 6).sum(axis=1)
+    # The mean times of a batch without ships are undefined.
+    num_empty = np.count_nonzero((batches[:, SERV_COUNT] == 0) | (batches[:, WQ_COUNT] == 0))
+    if num_empty:
+        raise ValueError("%d of the %d batches of %d time steps have no ship docked or undocked, use longer batches."
+                         % (num_empty, sim_ctrl['N'], batch_windows * WINDOW))
+
+    result = {'WARM_UP': warm_up * WINDOW, 'BATCH_LEN': batch_windows * WINDOW,
+              'MEAN_SERV_TIME': batches[:, SERV_TOTAL] / batches[:, SERV_COUNT],
+              'MEAN_WQ_TIME': batches[:, WQ_TOTAL] / batches[:, WQ_COUNT],
+              'MEAN_Q_LEN': batches[:, Q_AREA] / (batch_windows * WINDOW),
+              'CARGO_TRANS': batches[:, CARGO],
+              'SHIPS_SERVICED': batches[:, SERV_COUNT]}
+    for metric in METRICS:
+        result[metric] = result[metric].tolist()
+    return result
+
+
+# ****************************************        Function Declaration        **************************************** #
+def replicate_steady_state(params, seed_seq, cache=None):
+    """
+    Function that runs the steady state simulation with its own random number generator.
+
+    :param dict params: A dictionary containing the interpreted parameters.
+    :param np.random.SeedSequence seed_seq: The seed sequence of the run.
+    :param ResultCache cache: Optional result cache. A cached result is returned instead of simulating again.
+    :return: The result dictionary of the steady state simulation.
+    """
+    if cache is None:
+        return simulate_steady_state(params, rng=replication_rng(params, seed_seq))
+
+    # The batches depend on the number of batches N, left out of the parameter digest.
+    key = cache_key(params, seed_seq, ENGINE_VERSION, 'steady_state', params['SIM_CTRL']['N'], WINDOW, MSER_BATCH)
+    result = cache.get(key)
+    if result is None:
+        result = simulate_steady_state(params, rng=replication_rng(params, seed_seq))
+        cache.put(key, result)
+    return result
+
+
+# ******************************************        Isolated Testing        ****************************************** #
+if __name__ == '__main__':
+    # MSER must find the end of a decaying transient.
+    test_rng = np.random.default_rng(0)
+    test_series = 10 * np.exp(-np.arange(2000) / 100) + test_rng.normal(0, 1, 2000)
+    print("MSER-5 truncation of a transient with time constant 100: %d." % mser(test_series))
+    assert 200 <= mser(test_series) <= 800
+    assert mser(test_rng.normal(0, 1, 2000)) < 200
+
+    # The batch means of a 60 day run must agree with 30 independent runs of 10 days, at a fifth of the simulated time.
+    import copy
+    from utils import load_params, param_interpreter
+    from simulation_func import replicate
+    from stopping_rule import ci_half_width
+
+    test_dict = load_params('parameters.py')
+    # Batches of 40 time steps, from a day split in 30 batches, are rejected.
+    test_dict['SIM_CTRL'].update(N=30, STEADY_STATE=True, CI_TARGET=None)
+    try:
+        replicate_steady_state(param_interpreter(copy.deepcopy(test_dict)), np.random.SeedSequence(0))
+        raise AssertionError("Batches of 40 time steps must be rejected.")
+    except ValueError as test_err:
+        print(test_err)
+
+    test_dict['D_PARAMS'].update(A_MEAN=20, L=1000)
+    test_dict['SIM_CTRL'].update(N=30, T_SIM_IN=60 * 1440, STEADY_STATE=True)
+    test_steady = replicate_steady_state(param_interpreter(copy.deepcopy(test_dict)), np.random.SeedSequence(0))
+    test_dict['SIM_CTRL'].update(T_SIM_IN=10 * 1440, STEADY_STATE=False)
+    test_params = param_interpreter(test_dict)
+    test_reps = [replicate(test_params, test_seq) for test_seq in np.random.SeedSequence(0).spawn(30)]
+    print("Warm-up of %d time steps, batches of %d time steps." % (test_steady['WARM_UP'], test_steady['BATCH_LEN']))
+    for test_metric in ('MEAN_WQ_TIME', 'MEAN_Q_LEN'):
+        test_mean, test_hw = ci_half_width(np.array(test_steady[test_metric]), 0.95)
+        test_rep_mean, test_rep_hw = ci_half_width(np.array([rep[test_metric] for rep in test_reps]), 0.95)
+        print("%s: batch means %2.4f +/- %2.4f, replications %2.4f +/- %2.4f."
+              % (test_metric, test_mean, test_hw, test_rep_mean, test_rep_hw))
+        assert abs(test_mean - test_rep_mean) < test_hw + test_rep_hw
+
+"""
+Author(s): Yash Bansod, Shivam Mishra
+Repository: https://github.com/YashBansod
+Organization: University of Maryland at College Park
+"""
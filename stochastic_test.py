@@ -5,13 +5,15 @@ Dock Worker Robot Simulation Stochastic Test Routine.
 
 # ******************************************    Libraries to be imported    ****************************************** #
 from __future__ import print_function, division
-import importlib.util
 import argparse
+import asyncio
 import numpy as np
-from tqdm import tqdm
 from os.path import join
-from utils import param_interpreter
-from simulation_func import simulate
+from utils import load_params
+from sweep import expand_grid, plan_sweep, run_sweep, stream_sweep
+from result_store import ResultStore
+from result_cache import ResultCache
+from output_functions import plan_output
 
 
 # ******************************************        Main Program Start      ****************************************** #
@@ -22,72 +24,42 @@ def main(args):
     exp_id = 'exp_2'
 
     param_path = join(args.dir_path, args.parameter)
-    spec = importlib.util.spec_from_file_location("", param_path)
-    p_module = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(p_module)
-    param_dict = param_interpreter(p_module.PARAM_DICT)
-    st_params = param_dict['S_PARAMS']
-
-    k_val_range = [('triangular', 4, 6, 7), ('triangular', 7, 9, 10), ('triangular', 10, 12, 13)]
-    csp_val_range = [('triangular', 1, 3, 4), ('triangular', 2, 4, 5), ('triangular', 3, 5, 6)]
-    cpt_val_range = [('triangular', 0, 2, 3), ('triangular', 1, 3, 4), ('triangular', 2, 4, 5)]
-    cst_val_range = [('triangular', 3, 5, 6), ('triangular', 5, 7, 8), ('triangular', 7, 9, 10)]
-
-    num_exp = len(k_val_range) * len(csp_val_range) * len(cpt_val_range) * len(cst_val_range)
-
-    mean_s_time_arr = np.zeros(num_exp)     # Mean service time
-    mean_wq_time_arr = np.zeros(num_exp)    # Mean queue wait time
-    mean_q_len_arr = np.zeros(num_exp)      # Mean queue length
-    num_c_arr = np.zeros(num_exp)           # Number of cargo containers transported to city
-    num_s_arr = np.zeros(num_exp)           # Number of ships processed
-
-    std_s_time_arr = np.zeros(num_exp)  # STD service time
-    std_wq_time_arr = np.zeros(num_exp)  # STD queue wait time
-    std_q_len_arr = np.zeros(num_exp)  # STD queue length
-    std_c_arr = np.zeros(num_exp)  # STD of cargo containers transported to city
-    std_s_arr = np.zeros(num_exp)  # STD of ships processed
-
-    np.random.seed(args.seed)
-
-    ind = 0
-    for k_val in k_val_range:
-        st_params['K'] = k_val
-        for csp_val in csp_val_range:
-            st_params['CSP'] = csp_val
-            for cpt_val in cpt_val_range:
-                st_params['CPT'] = cpt_val
-                for cst_val in cst_val_range:
-                    st_params['CST'] = cst_val
-
-                    _mean_s_time_arr = np.zeros(param_dict['SIM_CTRL']['N'])  # Mean service time
-                    _mean_wq_time_arr = np.zeros(param_dict['SIM_CTRL']['N'])  # Mean queue wait time
-                    _mean_q_len_arr = np.zeros(param_dict['SIM_CTRL']['N'])  # Mean queue length
-                    _num_c_arr = np.zeros(param_dict['SIM_CTRL']['N'])  # Number of cargo containers transported to city
-                    _num_s_arr = np.zeros(param_dict['SIM_CTRL']['N'])  # Number of ships processed
-
-                    np.random.seed(args.seed)
-
-                    for sim_num in tqdm(range(param_dict['SIM_CTRL']['N'])):
-                        sim_result = simulate(param_dict)
-
-                        _mean_s_time_arr[sim_num] = sim_result['MEAN_SERV_TIME']
-                        _mean_wq_time_arr[sim_num] = sim_result['MEAN_WQ_TIME']
-                        _mean_q_len_arr[sim_num] = sim_result['MEAN_Q_LEN']
-                        _num_c_arr[sim_num] = sim_result['CARGO_TRANS']
-                        _num_s_arr[sim_num] = sim_result['SHIPS_SERVICED']
-
-                    mean_s_time_arr[ind] = _mean_s_time_arr.mean()
-                    mean_wq_time_arr[ind] = _mean_wq_time_arr.mean()
-                    mean_q_len_arr[ind] = _mean_q_len_arr.mean()
-                    num_c_arr[ind] = _num_c_arr.mean()
-                    num_s_arr[ind] = _num_s_arr.mean()
-
-                    std_s_time_arr[ind] = _mean_s_time_arr.std()
-                    std_wq_time_arr[ind] = _mean_wq_time_arr.std()
-                    std_q_len_arr[ind] = _mean_q_len_arr.std()
-                    std_c_arr[ind] = _num_c_arr.std()
-                    std_s_arr[ind] = _num_s_arr.std()
-                    ind += 1
+    param_dict = load_params(param_path)
+
+    grid = [('K', [('triangular', 4, 6, 7), ('triangular', 7, 9, 10), ('triangular', 10, 12, 13)]),
+            ('CSP', [('triangular', 1, 3, 4), ('triangular', 2, 4, 5), ('triangular', 3, 5, 6)]),
+            ('CPT', [('triangular', 0, 2, 3), ('triangular', 1, 3, 4), ('triangular', 2, 4, 5)]),
+            ('CST', [('triangular', 3, 5, 6), ('triangular', 5, 7, 8), ('triangular', 7, 9, 10)])]
+    points = expand_grid(param_dict, grid)
+    num_exp = len(points)
+
+    store = ResultStore(args.store) if args.store is not None else None
+    cache = ResultCache(args.cache) if args.cache is not None else None
+    try:
+        if store is not None:
+            # Only the grid points missing from the store are simulated, e.g. after a value was added to the grid.
+            plan_output(plan_sweep(points, points[0]['SIM_CTRL']['N'], seed=args.seed, store=store))
+        if args.stream:
+            sim_results = asyncio.run(_stream_results(points, args, store, cache))
+        else:
+            sim_results = run_sweep(points, points[0]['SIM_CTRL']['N'], seed=args.seed, workers=args.workers,
+                                    store=store, cache=cache)
+    finally:
+        if store is not None:
+            store.close()
+
+    # With the stopping rule, the replications that were not run are NaN.
+    mean_s_time_arr = np.nanmean(sim_results['MEAN_SERV_TIME'], axis=1)    # Mean service time
+    mean_wq_time_arr = np.nanmean(sim_results['MEAN_WQ_TIME'], axis=1)     # Mean queue wait time
+    mean_q_len_arr = np.nanmean(sim_results['MEAN_Q_LEN'], axis=1)         # Mean queue length
+    num_c_arr = np.nanmean(sim_results['CARGO_TRANS'], axis=1)             # Number of cargo containers transported
+    num_s_arr = np.nanmean(sim_results['SHIPS_SERVICED'], axis=1)          # Number of ships processed
+
+    std_s_time_arr = np.nanstd(sim_results['MEAN_SERV_TIME'], axis=1)      # STD service time
+    std_wq_time_arr = np.nanstd(sim_results['MEAN_WQ_TIME'], axis=1)       # STD queue wait time
+    std_q_len_arr = np.nanstd(sim_results['MEAN_Q_LEN'], axis=1)           # STD queue length
+    std_c_arr = np.nanstd(sim_results['CARGO_TRANS'], axis=1)              # STD of cargo containers transported to city
+    std_s_arr = np.nanstd(sim_results['SHIPS_SERVICED'], axis=1)           # STD of ships processed
 
     if args.write:
         header = 'S_T(u), S_T(s), WQ_T(u), WQ_T(s), Q_L(u), Q_L(s), C(u), C(s), S(u), S(s)'
@@ -102,11 +74,38 @@ def main(args):
         output_file[:, 7] = std_c_arr
         output_file[:, 8] = num_s_arr
         output_file[:, 9] = std_s_arr
+        if points[0]['SIM_CTRL']['CI_TARGET'] is not None:
+            # The number of replications run by the stopping rule for every experiment.
+            header += ', N'
+            output_file = np.column_stack((output_file, sim_results['NUM_REPS']))
         # noinspection PyTypeChecker
         np.savetxt('./test_results/stochastic_test_%s.csv' % exp_id, output_file,
                    fmt='%0.2f', delimiter=', ', header=header)
 
 
+# ****************************************        Function Declaration        **************************************** #
+async def _stream_results(points, args, store, cache):
+    """
+    Function that streams the sweep, printing the mean results of every grid point as soon as it is done.
+
+    :return: The results of the sweep, as returned by run_sweep.
+    """
+    point_stats = [None] * len(points)
+    async for stats in stream_sweep(points, points[0]['SIM_CTRL']['N'], seed=args.seed, workers=args.workers,
+                                    store=store, cache=cache):
+        point_stats[stats['POINT']] = stats
+        print("Grid point %d (%d simulations): %s" % (stats['POINT'], stats['NUM_REPS'], ', '.join(
+            '%s %2.2f' % (metric, mean) for metric, mean in stats['MEAN'].items())))
+
+    num_reps = np.array([stats['NUM_REPS'] for stats in point_stats])
+    sim_results = {'NUM_REPS': num_reps}
+    for metric in point_stats[0]['RESULTS']:
+        sim_results[metric] = np.full((len(points), num_reps.max()), np.nan)
+        for p_ind, stats in enumerate(point_stats):
+            sim_results[metric][p_ind, :stats['NUM_REPS']] = stats['RESULTS'][metric]
+    return sim_results
+
+
 # ******************************************        Main Program End        ****************************************** #
 if __name__ == '__main__':
 
@@ -118,6 +117,11 @@ if __name__ == '__main__':
     argparser.add_argument('-v', '--verbose', action='store_true', dest='debug', help='Print text results.')
     argparser.add_argument('-w', '--write', action='store_true', dest='write', help='Write results as pickle file.')
     argparser.add_argument('-s', '--seed', default=None, type=int, help='Set seed for repeating executions')
+    argparser.add_argument('-k', '--workers', default=1, type=int, help='Number of worker processes for replications.')
+    argparser.add_argument('--store', default=None, type=str, help='Path of a result store to checkpoint and resume.')
+    argparser.add_argument('--cache', default=None, type=str, help='Directory of the result cache.')
+    argparser.add_argument('-t', '--stream', action='store_true',
+                           help='Print the results of every grid point as soon as it is done.')
 
     sim_args = argparser.parse_args()
 
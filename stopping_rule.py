@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+"""
+File Description: File defining the sequential stopping rule of the simulation.
+    Instead of running a fixed number of replications, the replications can be run in rounds of SIM_CTRL['N'] until
+    the Student t confidence interval of the mean of every targeted result is narrow enough, i.e. its half-width
+    relative to the mean is at most the target given in SIM_CTRL['CI_TARGET'], or until SIM_CTRL['N_MAX'] replications
+    have been run.
+"""
+
+# ******************************************    Libraries to be imported    ****************************************** #
+from __future__ import print_function, division
+import math
+import numpy as np
+from distributions import norm_ppf
+
+
+# ****************************************        Function Declaration        **************************************** #
+def t_ppf(p, df):
+    """
+    This function is used to compute the quantile function of the Student t distribution.
+    The quantile is exact for 1 and 2 degrees of freedom and otherwise computed with the Cornish-Fisher expansion around
+    the standard normal quantile, which is accurate to within 0.1% from 5 degrees of freedom on.
+
+    :param float p: The probability at which the quantile is evaluated. Must lie in (0, 1).
+    :param int df: The degrees of freedom.
+    :return: The p quantile of the Student t distribution.
+    :rtype: float
+    """
+    if df == 1:
+        return math.tan(math.pi * (p - 0.5))
+    elif df == 2:
+        return (2 * p - 1) / math.sqrt(2 * p * (1 - p))
+
+    z = norm_ppf(p)
+    return (z + (z ** 3 + z) / (4 * df)
+            + (5 * z ** 5 + 16 * z ** 3 + 3 * z) / (96 * df ** 2)
+            + (3 * z ** 7 + 19 * z ** 5 + 17 * z ** 3 - 15 * z) / (384 * df ** 3)
+            + (79 * z ** 9 + 776 * z ** 7 + 1482 * z ** 5 - 1920 * z ** 3 - 945 * z) / (92160 * df ** 4))
+
+
+# ****************************************        Function Declaration        **************************************** #
+def ci_half_width(values, level):
+    """
+    This function is used to compute the confidence interval of the mean of a number of replications.
+    Replications without a value (NaN) are left out.
+
+    :param ndarray values: The values of a result in every replication.
+    :param float level: The confidence level of the interval.
+    :return: A (mean, half-width) tuple. The half-width is infinite if there are less than two values.
+    """
+    values = values[~np.isnan(values)]
+    if len(values) < 2:
+        return (values.mean() if len(values) else float('nan')), float('inf')
+    half_width = t_ppf(0.5 + level / 2, len(values) - 1) * values.std(ddof=1) / math.sqrt(len(values))
+    return values.mean(), half_width
+
+
+# ****************************************        Function Declaration        **************************************** #
+def target_met(values, target, level):
+    """
+    This function is used to check whether the confidence interval of a result is within its target.
+
+    :param ndarray values: The values of a result in every replication.
+    :param float target: The maximum half-width of the interval relative to the mean.
+    :param float level: The confidence level of the interval.
+    :rtype: bool
+    """
+    mean, half_width = ci_half_width(values, level)
+    return half_width <= target * abs(mean)
+
+
+# ****************************************        Function Declaration        **************************************** #
+def targets_met(results, params):
+    """
+    This function is used to check whether the replications run so far satisfy the stopping rule.
+
+    :param dict results: A dictionary holding an array of the replication values for every result.
+    :param dict params: A dictionary containing the interpreted parameters.
+    :return: True if every target of SIM_CTRL['CI_TARGET'] is met.
+    :rtype: bool
+    """
+    sim_ctrl = params['SIM_CTRL']
+    return all(target_met(np.asarray(results[metric], dtype=float), target, sim_ctrl['CI_LEVEL'])
+               for metric, target in sim_ctrl['CI_TARGET'].items())
+
+
+# ******************************************        Isolated Testing        ****************************************** #
+if __name__ == '__main__':
+    for test_df, test_t in ((1, 12.7062), (2, 4.3027), (5, 2.5706), (10, 2.2281), (30, 2.0423)):
+        print("t quantile 0.975 with %d degrees of freedom: %2.4f (table %2.4f)" % (test_df, t_ppf(0.975, test_df),
+                                                                                     test_t))
+
+"""
+Author(s): Yash Bansod, Shivam Mishra
+Repository: https://github.com/YashBansod
+Organization: University of Maryland at College Park
+"""
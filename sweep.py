@@ -0,0 +1,323 @@
+#!/usr/bin/env python
+"""
+File Description: File defining the parameter sweep functions used by the test routines.
+    A sweep is described by a declarative grid, a list of (parameter name, values) pairs. The grid is expanded into
+    independent per-point parameter dictionaries, and the (grid point x replication) tasks are scheduled in chunks over
+    a pool of worker processes. Finished replications can be checkpointed to a ResultStore, so that an interrupted
+    sweep only computes the missing replications when it is run again with the same seed. A sweep can be planned against
+    the store beforehand, telling which grid points are stored, and which are new or were invalidated by a change of
+    the simulation engine and have to be simulated. With the sequential stopping rule, every grid point runs rounds of
+    replications until its confidence interval targets are met. A sweep can also be streamed from an asyncio event
+    loop, yielding the statistics of every grid point as soon as it is done.
+"""
+
+# ******************************************    Libraries to be imported    ****************************************** #
+from __future__ import print_function, division
+import asyncio
+import copy
+import itertools
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from utils import ENGINE_VERSION, param_interpreter
+from simulation_func import METRICS, replicate
+from result_store import replication_key, point_key
+from stopping_rule import ci_half_width, targets_met
+from output_functions import progress
+
+# Number of finished replications written to the result store at once.
+CHECKPOINT_SIZE = 64
+
+
+# ****************************************        Function Declaration        **************************************** #
+def expand_grid(params, grid):
+    """
+    This function is used to expand a parameter grid into the parameter dictionaries of its grid points.
+    The grid points are ordered like nested loops over the grid, with the first parameter as the outermost loop.
+
+    :param dict params: A dictionary containing the base parameters, as defined in the parameter file.
+    :param list[tuple] grid: A list of (parameter name, list of values) pairs. A parameter name is a key of the
+        SIM_CTRL, D_PARAMS or S_PARAMS section of the parameters.
+    :return: A list of interpreted parameter dictionaries, one per grid point. The dictionaries share no state with
+        each other or with the base parameters.
+    """
+    names = [name for name, _ in grid]
+    sections = [_find_section(params, name) for name in names]
+
+    points = []
+    for values in itertools.product(*[vals for _, vals in grid]):
+        point = copy.deepcopy(params)
+        for section, name, val in zip(sections, names, values):
+            point[section][name] = val
+        points.append(param_interpreter(point))
+    return points
+
+
+# ****************************************        Function Declaration        **************************************** #
+def plan_sweep(points, num_reps, seed=None, store=None):
+    """
+    This function is used to plan a sweep against the replications already in a result store. run_sweep reads the
+    stored replications back and only simulates the others, merged into its results in grid order.
+
+    :param list[dict] points: The parameter dictionaries of the grid points.
+    :param int num_reps: Number of replications per grid point, or per round with the stopping rule.
+    :param int seed: Seed of the sweep. Without a seed or a store every grid point is new.
+    :param ResultStore store: The result store.
+    :return: The status of every grid point: 'stored' if its num_reps replications (its first round with the stopping
+        rule) are in the store, 'partial' if some of them are, 'invalidated' if none are but the grid point was
+        simulated by another version of the simulation engine, else 'new'.
+    :rtype: list[str]
+    """
+    _check_points(points)
+    if seed is None or store is None:
+        return ['new'] * len(points)
+
+    seed_seqs = np.random.SeedSequence(seed).spawn(num_reps)
+    keys = [[replication_key(point, seed_seq) for seed_seq in seed_seqs] for point in points]
+    p_keys = [point_key(point, seed_seqs[0].entropy) for point in points]
+    stored = store.get_many(key for rep_keys in keys for key in rep_keys)
+    versions = store.get_versions(p_keys)
+
+    plan = []
+    for rep_keys, p_key in zip(keys, p_keys):
+        num_stored = sum(key in stored for key in rep_keys)
+        if num_stored == num_reps:
+            plan.append('stored')
+        elif num_stored:
+            plan.append('partial')
+        elif versions.get(p_key, ENGINE_VERSION) != ENGINE_VERSION:
+            plan.append('invalidated')
+        else:
+            plan.append('new')
+    return plan
+
+
+# ****************************************        Function Declaration        **************************************** #
+def run_sweep(points, num_reps, seed=None, workers=1, store=None, cache=None):
+    """
+    This function is used to run a number of replications of the simulation for every grid point.
+    Replication r of every grid point uses the same seed, so the grid points are compared on common random numbers.
+    If the parameters of the grid points set confidence interval targets (SIM_CTRL['CI_TARGET']), the replications of
+    every grid point are run in rounds of num_reps until its targets are met or SIM_CTRL['N_MAX'] is reached.
+
+    :param list[dict] points: The parameter dictionaries of the grid points.
+    :param int num_reps: Number of replications per grid point, or per round with the stopping rule.
+    :param int seed: Seed of the sweep. Replications can only be resumed from the store if a seed is given.
+    :param int workers: Number of worker processes.
+    :param ResultStore store: Optional result store used to checkpoint and resume the sweep.
+    :param ResultCache cache: Optional result cache shared with other simulation runs.
+    :return: A dictionary holding a (number of grid points, number of replications) array for every metric in
+        METRICS, and the number of replications run for every grid point under 'NUM_REPS'. With the stopping rule,
+        the replications that were not run are NaN.
+    """
+    _check_points(points)
+    sequential = [point['SIM_CTRL']['CI_TARGET'] is not None for point in points]
+    max_reps = max([num_reps] + [point['SIM_CTRL']['N_MAX'] for point, seq in zip(points, sequential) if seq])
+
+    results = {metric: np.full((len(points), max_reps), np.nan) for metric in METRICS}
+    results['NUM_REPS'] = np.zeros(len(points), dtype=int)
+    seed_seqs = np.random.SeedSequence(seed).spawn(max_reps)
+
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        active = list(range(len(points)))
+        while active:
+            tasks = [(p_ind, r_ind) for p_ind in active
+                     for r_ind in range(results['NUM_REPS'][p_ind], results['NUM_REPS'][p_ind] + num_reps)]
+            _run_tasks(points, seed_seqs, tasks, results, executor, workers, store, cache)
+            results['NUM_REPS'][active] += num_reps
+
+            # Grid points stay active until the targets of their stopping rule are met.
+            active = [p_ind for p_ind in active if sequential[p_ind] and
+                      results['NUM_REPS'][p_ind] < points[p_ind]['SIM_CTRL']['N_MAX'] and
+                      not targets_met({metric: results[metric][p_ind, :results['NUM_REPS'][p_ind]]
+                                       for metric in METRICS}, points[p_ind])]
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    return results
+
+
+# ****************************************        Function Declaration        **************************************** #
+async def stream_sweep(points, num_reps, seed=None, workers=1, store=None, cache=None, max_pending=None):
+    """
+    This function is used to run a sweep like run_sweep, streaming the statistics of every grid point as soon as its
+    replications are done. The replications run in a pool of worker processes, or in a thread if workers is 1, so the
+    event loop is never blocked, and they get the same results as with run_sweep.
+    At most max_pending grid points are run ahead of the consumer: no grid point is started while that many are running
+    or waiting to be consumed. Closing the iterator or cancelling the task consuming it cancels the replications that
+    did not start.
+
+    :param list[dict] points: The parameter dictionaries of the grid points.
+    :param int num_reps: Number of replications per grid point, or per round with the stopping rule.
+    :param int seed: Seed of the sweep. Replications can only be resumed from the store if a seed is given.
+    :param int workers: Number of worker processes.
+    :param ResultStore store: Optional result store used to checkpoint and resume the sweep.
+    :param ResultCache cache: Optional result cache shared with other simulation runs.
+    :param int max_pending: Maximum number of grid points run ahead of the consumer, twice workers by default.
+    :return: An asynchronous iterator over the dictionaries of the grid points, in the order they are done. A dictionary
+        holds the index of the grid point under 'POINT', the number of replications run under 'NUM_REPS', an array of
+        the replication values for every metric under 'RESULTS', and the mean, standard deviation and confidence
+        interval half-width (at SIM_CTRL['CI_LEVEL']) of every metric under 'MEAN', 'STD' and 'CI_HALF_WIDTH'.
+    """
+    _check_points(points)
+    max_pending = max_pending or 2 * workers
+    max_reps = max([num_reps] + [point['SIM_CTRL']['N_MAX'] for point in points
+                                 if point['SIM_CTRL']['CI_TARGET'] is not None])
+    seed_seqs = np.random.SeedSequence(seed).spawn(max_reps)
+
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else ThreadPoolExecutor(max_workers=1)
+    running, next_ind = set(), 0
+    try:
+        while next_ind < len(points) or running:
+            while next_ind < len(points) and len(running) < max_pending:
+                running.add(asyncio.ensure_future(_stream_point(points, next_ind, num_reps, seed_seqs, executor, store,
+                                                                cache)))
+                next_ind += 1
+            done, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    finally:
+        for task in running:
+            task.cancel()
+        await asyncio.gather(*running, return_exceptions=True)
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+# ****************************************        Function Declaration        **************************************** #
+async def _stream_point(points, p_ind, num_reps, seed_seqs, executor, store, cache):
+    """
+    This function is used to run the replications of a grid point of a streamed sweep.
+
+    :return: The dictionary of the grid point streamed by stream_sweep.
+    """
+    loop = asyncio.get_running_loop()
+    point = points[p_ind]
+    sim_ctrl = point['SIM_CTRL']
+    values = {metric: [] for metric in METRICS}
+    num_done = 0
+    while True:
+        r_inds = range(num_done, num_done + num_reps)
+        keys = [replication_key(point, seed_seqs[r_ind]) for r_ind in r_inds] if store is not None else []
+        # The store is read and written in a thread, so the event loop is not blocked by the SQLite I/O.
+        stored = await loop.run_in_executor(None, store.get_many, keys) if store is not None else dict()
+        futures = [None if keys and keys[ind] in stored else
+                   loop.run_in_executor(executor, replicate, point, seed_seqs[r_ind], cache)
+                   for ind, r_ind in enumerate(r_inds)]
+        sim_results = iter(await asyncio.gather(*[future for future in futures if future is not None]))
+
+        checkpoint = []
+        for ind, future in enumerate(futures):
+            if future is None:
+                sim_result = stored[keys[ind]]
+            else:
+                sim_result = next(sim_results)
+                if store is not None:
+                    checkpoint.append((keys[ind], sim_result))
+            for metric in METRICS:
+                values[metric].append(sim_result[metric])
+        if checkpoint:
+            await loop.run_in_executor(None, store.put_many, checkpoint, [point_key(point, seed_seqs[0].entropy)])
+
+        num_done += num_reps
+        if sim_ctrl['CI_TARGET'] is None or num_done >= sim_ctrl['N_MAX'] or targets_met(values, point):
+            break
+
+    stats = {'POINT': p_ind, 'NUM_REPS': num_done, 'RESULTS': dict(), 'MEAN': dict(), 'STD': dict(),
+             'CI_HALF_WIDTH': dict()}
+    for metric in METRICS:
+        metric_values = np.array(values[metric], dtype=float)
+        stats['RESULTS'][metric] = metric_values
+        stats['MEAN'][metric], stats['CI_HALF_WIDTH'][metric] = ci_half_width(metric_values, sim_ctrl['CI_LEVEL'])
+        stats['STD'][metric] = np.nanstd(metric_values)
+    return stats
+
+
+# ****************************************        Function Declaration        **************************************** #
+def _run_tasks(points, seed_seqs, tasks, results, executor, workers, store, cache):
+    """
+    This function is used to run a list of (grid point, replication) tasks and to write their results.
+
+    :param list[dict] points: The parameter dictionaries of the grid points.
+    :param list[np.random.SeedSequence] seed_seqs: The seed sequences of the replications.
+    :param list[tuple] tasks: The (grid point index, replication index) pairs to run.
+    :param dict results: The result arrays of the sweep.
+    :param ProcessPoolExecutor executor: The pool of worker processes, None to run the tasks in this process.
+    :param int workers: Number of worker processes of the pool.
+    :param ResultStore store: Optional result store used to checkpoint and resume the sweep.
+    :param ResultCache cache: Optional result cache shared with other simulation runs.
+    """
+    task_keys = dict()
+    if store is not None:
+        task_keys = {task: replication_key(points[task[0]], seed_seqs[task[1]]) for task in tasks}
+        stored = store.get_many(task_keys.values())
+        for (p_ind, r_ind), key in task_keys.items():
+            if key in stored:
+                for metric in METRICS:
+                    results[metric][p_ind, r_ind] = stored[key][metric]
+        tasks = [task for task in tasks if task_keys[task] not in stored]
+
+    task_params = (points[p_ind] for p_ind, _ in tasks)
+    task_seeds = (seed_seqs[r_ind] for _, r_ind in tasks)
+
+    checkpoint, checkpoint_points = [], []
+    try:
+        if executor is None:
+            sim_results = map(replicate, task_params, task_seeds, itertools.repeat(cache))
+        else:
+            chunk_size = max(1, len(tasks) // (4 * workers))
+            sim_results = executor.map(replicate, task_params, task_seeds, itertools.repeat(cache),
+                                       chunksize=chunk_size)
+
+        for (p_ind, r_ind), sim_result in zip(tasks, progress(sim_results, total=len(tasks))):
+            for metric in METRICS:
+                results[metric][p_ind, r_ind] = sim_result[metric]
+
+            if store is not None:
+                checkpoint.append((task_keys[p_ind, r_ind], sim_result))
+                checkpoint_points.append(point_key(points[p_ind], seed_seqs[r_ind].entropy))
+                if len(checkpoint) >= CHECKPOINT_SIZE:
+                    store.put_many(checkpoint, checkpoint_points)
+                    checkpoint, checkpoint_points = [], []
+    finally:
+        if checkpoint:
+            store.put_many(checkpoint, checkpoint_points)
+
+
+# ****************************************        Function Declaration        **************************************** #
+def _check_points(points):
+    """
+    This function is used to check that the grid points can be swept. The steady state mode gives batches of a single
+    long run instead of independent replications, so it cannot be swept.
+
+    :param list[dict] points: The parameter dictionaries of the grid points.
+    """
+    if any(point['SIM_CTRL'].get('STEADY_STATE') for point in points):
+        raise NotImplementedError("Sweeps are not implemented for the steady state mode.")
+
+
+# ****************************************        Function Declaration        **************************************** #
+def _find_section(params, name):
+    """
+    This function is used to find the section of the parameters holding a given parameter.
+
+    :param dict params: A dictionary containing parameters.
+    :param str name: Name of the parameter.
+    :return: Name of the section.
+    :rtype: str
+    """
+    for section in ('SIM_CTRL', 'D_PARAMS', 'S_PARAMS'):
+        if name in params[section]:
+            return section
+    raise KeyError("Unknown parameter '%s' in sweep grid." % name)
+
+
+# ******************************************        Isolated Testing        ****************************************** #
+if __name__ == '__main__':
+    raise NotImplementedError('Isolated testing not implemented. Test it with the test routines.')
+
+"""
+Author(s): Yash Bansod, Shivam Mishra
+Repository: https://github.com/YashBansod
+Organization: University of Maryland at College Park
+"""
@@ -5,7 +5,61 @@ File Description: File defining various utility functions used in the simulation
 
 # ******************************************    Libraries to be imported    ****************************************** #
 from __future__ import print_function, division
+import hashlib
+import importlib.util
+import json
 import numpy as np
+from distributions import Distribution, compile_distribution
+
+# Version of the simulation engines. It must be increased whenever a change alters the simulation results, so that
+# cached results of the previous version are not reused.
+ENGINE_VERSION = 3
+
+
+# ****************************************        Function Declaration        **************************************** #
+def load_params(param_path):
+    """
+    This function is used to load the parameter dictionary from a parameter file.
+    A JSON (.json) or TOML (.toml) file holds the parameter dictionary itself and is parsed without executing code;
+    distributions are given as lists, e.g. ["triangular", 4, 6, 7]. Any other file is a Python module defining
+    PARAM_DICT and is executed.
+
+    :param str param_path: Path of the parameter file.
+    :return: The parameter dictionary, not interpreted.
+    :rtype: dict
+    """
+    if param_path.endswith('.json'):
+        with open(param_path) as param_file:
+            return specs_to_tuples(json.load(param_file))
+    elif param_path.endswith('.toml'):
+        try:
+            import tomllib
+        except ImportError:
+            raise ImportError("TOML parameter files require Python 3.11 or later.")
+        with open(param_path, 'rb') as param_file:
+            return specs_to_tuples(tomllib.load(param_file))
+
+    spec = importlib.util.spec_from_file_location("", param_path)
+    p_module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(p_module)
+    return p_module.PARAM_DICT
+
+
+# ****************************************        Function Declaration        **************************************** #
+def specs_to_tuples(val):
+    """
+    This function is used to turn the distributions of a parameter dictionary decoded from JSON or TOML into tuples.
+
+    :param val: The parameter dictionary, or a value of it.
+    :return: The value with every list starting with the name of a distribution turned into a tuple.
+    """
+    if isinstance(val, dict):
+        return {key: specs_to_tuples(item) for key, item in val.items()}
+    elif isinstance(val, list):
+        if val and isinstance(val[0], str):
+            return tuple(val)
+        return [specs_to_tuples(item) for item in val]
+    return val
 
 
 # ****************************************        Function Declaration        **************************************** #
@@ -16,21 +70,63 @@ def param_interpreter(params):
     :param dict params: A dictionary containing parameters.
     :return: The modified parameter dictionary.
     """
+    sim_ctrl = params['SIM_CTRL']
     st_params = params['S_PARAMS']
 
-    det_cond = type(st_params['K']) == int and type(st_params['CSP']) == int and \
-        type(st_params['CPT']) == int and type(st_params['CST']) == int
+    if 'ENGINE' not in sim_ctrl.keys():
+        sim_ctrl['ENGINE'] = 'time_step'
+    elif sim_ctrl['ENGINE'] not in ('time_step', 'event', 'batch'):
+        raise ValueError("Invalid simulation engine specified.")
+
+    if 'VARIANCE_REDUCTION' not in sim_ctrl.keys():
+        sim_ctrl['VARIANCE_REDUCTION'] = None
+    elif sim_ctrl['VARIANCE_REDUCTION'] not in (None, 'crn', 'antithetic'):
+        raise ValueError("Invalid variance reduction mode specified.")
+    elif sim_ctrl['VARIANCE_REDUCTION'] == 'antithetic' and sim_ctrl['ENGINE'] == 'batch':
+        raise NotImplementedError("Antithetic replications are not implemented for the batch engine.")
+
+    # The sequential stopping rule is disabled unless confidence interval targets are given.
+    sim_ctrl.setdefault('CI_TARGET', None)
+    sim_ctrl.setdefault('CI_LEVEL', 0.95)
+    sim_ctrl.setdefault('N_MAX', 100 * sim_ctrl['N'])
+    if not 0 < sim_ctrl['CI_LEVEL'] < 1:
+        raise ValueError("Invalid confidence level specified.")
+    if sim_ctrl['CI_TARGET'] is not None and not all(target > 0 for target in sim_ctrl['CI_TARGET'].values()):
+        raise ValueError("Invalid confidence interval target specified.")
+
+    # The steady state mode runs a single long simulation, split in N batches after the warm-up.
+    sim_ctrl.setdefault('STEADY_STATE', False)
+    if sim_ctrl['STEADY_STATE']:
+        if sim_ctrl['ENGINE'] == 'batch' or params.get('TERMINALS') is not None:
+            raise NotImplementedError("The steady state mode is only implemented for single terminal ports.")
+        if sim_ctrl['VARIANCE_REDUCTION'] == 'antithetic' or sim_ctrl['CI_TARGET'] is not None:
+            raise NotImplementedError("The steady state mode has neither antithetic replications nor a stopping rule.")
+
+    # A port of several terminals is given as a list of D_PARAMS overrides, one for every terminal.
+    if params.get('TERMINALS') is not None:
+        if sim_ctrl['ENGINE'] != 'time_step':
+            raise NotImplementedError("Multi-terminal ports are only implemented for the time_step engine.")
+        if sim_ctrl['VARIANCE_REDUCTION'] == 'antithetic':
+            raise NotImplementedError("Antithetic replications are not implemented for multi-terminal ports.")
+        if not params['TERMINALS'] or not all(set(terminal) <= set(params['D_PARAMS'])
+                                              for terminal in params['TERMINALS']):
+            raise ValueError("Invalid terminals specified.")
+        params['TERMINALS'] = [dict(params['D_PARAMS'], **terminal) for terminal in params['TERMINALS']]
+        sim_ctrl.setdefault('TRANSFER_TIME', 60)
+        sim_ctrl.setdefault('TRANSFER_QUEUE', 5)
+        if sim_ctrl['TRANSFER_TIME'] < 1 or sim_ctrl['TRANSFER_QUEUE'] < 1:
+            raise ValueError("Invalid robot transfer settings specified.")
+
+    # Every distribution is compiled once here, so the simulation never has to parse the specification tuples.
+    for key in ('K', 'CSP', 'CPT', 'CST'):
+        st_params[key] = compile_distribution(st_params[key])
+
+    det_cond = st_params['K'].deterministic and st_params['CSP'].deterministic and \
+        st_params['CPT'].deterministic and st_params['CST'].deterministic
 
     if 'MODE' in params.keys():
         if params['MODE'] == 'deterministic' and not det_cond:
-            if type(st_params['K']) != int:
-                raise NotImplementedError
-            elif type(st_params['CSP']) != int:
-                raise NotImplementedError
-            elif type(st_params['CPT']) != int:
-                raise NotImplementedError
-            elif type(st_params['CST']) != int:
-                raise NotImplementedError
+            raise NotImplementedError
 
         elif params['MODE'] == 'stochastic' and det_cond:
             raise ValueError("Invalid distributions defined for stochastic parameters in stochastic mode.")
@@ -45,11 +141,12 @@ def param_interpreter(params):
 
 
 # ****************************************        Function Declaration        **************************************** #
-def t_arr_creator(params):
+def t_arr_creator(params, rng=np.random):
     """
     This function is used to create the t_arr array. The t_arr tells if a ship arrival happens at given time step.
 
     :param dict params: A dictionary containing parameters.
+    :param rng: The random number generator to sample from (np.random.Generator or the global np.random).
     :return: A 1-D numpy array denoting t_arr.
     """
     if params['MODE'] == 'deterministic':
@@ -59,9 +156,14 @@ def t_arr_creator(params):
     elif params['MODE'] == 'stochastic':
         a_mean = params['D_PARAMS']['A_MEAN']
         t_sim_in = params['SIM_CTRL']['T_SIM_IN']
-        arr_list = random_generator(('exponential', a_mean), sz=t_sim_in)
-        arr_list = np.cumsum(arr_list)
-        assert arr_list[-1] >= t_sim_in
+        # Inter-arrival times are drawn in blocks of the expected number of arrivals until the horizon is covered.
+        block_size = int(t_sim_in / a_mean) + 16
+        arr_blocks, arr_end = [], 0
+        while arr_end < t_sim_in:
+            arr_block = arr_end + np.cumsum(random_generator(('exponential', a_mean), sz=block_size, rng=rng))
+            arr_blocks.append(arr_block)
+            arr_end = arr_block[-1]
+        arr_list = np.concatenate(arr_blocks)
         arr_list = arr_list[arr_list < t_sim_in]
     else:
         raise NotImplementedError
@@ -73,77 +175,83 @@ def t_arr_creator(params):
 
 
 # ****************************************        Function Declaration        **************************************** #
-def dist_interpreter(dist):
+def dist_interpreter(dist, rng=np.random):
     """
     This function is used to sample a value from a distribution.
 
-    :param dist: An integer specifying a deterministic value or a tuple specifying a random distribution.
+    :param dist: An integer specifying a deterministic value, a tuple specifying a random distribution or a compiled
+        distribution object.
+    :param rng: The random number generator to sample from (np.random.Generator or the global np.random).
     :return: A sample from the distribution.
     :rtype: int
     """
     if type(dist) == int:
         return dist
-    elif type(dist) == tuple:
-        return random_generator(dist)[0]
-    else:
-        raise ValueError("Invalid distribution specified.")
+    dist = compile_distribution(dist)
+    if dist.deterministic:
+        return dist.value
+    return int(dist.sample(1, rng)[0])
 
 
 # ****************************************        Function Declaration        **************************************** #
-def random_generator(dist, sz=1):
+def random_generator(dist, sz=1, rng=np.random):
     """
     This function is used to sample a value from a random distribution.
 
-    :param dist: A tuple specifying a random distribution.
+    :param dist: A tuple specifying a random distribution or a compiled distribution object.
     :param sz: An integer specifying the number of values to generate
+    :param rng: The random number generator to sample from (np.random.Generator or the global np.random).
     :return: A sample from the distribution.
     :rtype: ndarray
     """
-    dist_type = dist[0].lower()
-    dist_args = dist[1:]
-
-    if dist_type == 'uniform':
-        val = np.ceil(np.random.uniform(*dist_args, size=sz)).astype(np.int)
-    elif dist_type == 'triangular':
-        val = np.ceil(np.random.triangular(*dist_args, size=sz)).astype(np.int)
-    elif dist_type == 'exponential':
-        val = np.ceil(np.random.exponential(*dist_args, size=sz)).astype(np.int)
-    elif dist_type == 'normal':
-        val = np.ceil(np.random.normal(*dist_args, size=sz)).astype(np.int)
-    else:
-        raise NotImplementedError("Procedure to handle the given distribution is not implemented.")
-    return val
+    return compile_distribution(dist).sample(sz, rng)
 
 
 # ****************************************        Function Declaration        **************************************** #
 def time_estimator(dist):
     """
     This function is used to get an estimate time value from a distribution.
+    The estimate is the 90th percentile (0.9 quantile), cached on the compiled distribution object.
 
-    :param dist: An integer specifying a deterministic value or a tuple specifying a random distribution.
+    :param dist: An integer specifying a deterministic value, a tuple specifying a random distribution or a compiled
+        distribution object.
     :return: An estimate of time from a given distribution.
-    :rtype: int
+    :rtype: int or float
     """
-    if type(dist) == int:
-        val = dist
-    elif type(dist) == tuple:
-        dist_type = dist[0].lower()
-        dist_args = dist[1:]
-        # 90th percentile / 0.9 quantile
-        if dist_type == 'uniform':
-            val = dist_args[0] + 0.9 * (dist_args[1] - dist_args[0])
-        elif dist_type == 'triangular':
-            val = dist_args[2] - np.sqrt((dist_args[2] - dist_args[0]) * (dist_args[2] - dist_args[1]) * 0.1)
-        elif dist_type == 'exponential':
-            val = -np.log(0.1) * dist_args[0]
-        elif dist_type == 'normal':
-            # TODO: Implement the Quantile function for Normal distribution
-            val = dist_args[1] + 1.282 * dist_args[1]
-        else:
-            raise NotImplementedError("Procedure to handle the given distribution is not implemented.")
-    else:
-        raise ValueError("Invalid distribution specified.")
-    return val
+    return compile_distribution(dist).estimate
+
+
+# ****************************************        Function Declaration        **************************************** #
+def param_digest(params, *extra):
+    """
+    This function is used to compute a canonical hash of an interpreted parameter dictionary.
+    Distributions are hashed by their specification. The number of simulations SIM_CTRL['N'] and the settings of the
+    stopping rule are left out as they do not change the result of a single simulation run. The steady state mode is
+    only left out when it is off, so the digests of the other runs do not depend on whether it is set.
+
+    :param dict params: A dictionary containing the interpreted parameters.
+    :param extra: Further JSON serializable values to include in the hash, such as a seed.
+    :return: The hexadecimal SHA-256 digest.
+    :rtype: str
+    """
+    def canonical(val):
+        if isinstance(val, Distribution):
+            return canonical(val.spec)
+        elif isinstance(val, dict):
+            return {str(key): canonical(item) for key, item in val.items()}
+        elif isinstance(val, (tuple, list)):
+            return [canonical(item) for item in val]
+        elif isinstance(val, np.generic):
+            return val.item()
+        return val
+
+    params = canonical(params)
+    for key in ('N', 'CI_TARGET', 'CI_LEVEL', 'N_MAX'):
+        params['SIM_CTRL'].pop(key, None)
+    if not params['SIM_CTRL'].get('STEADY_STATE'):
+        params['SIM_CTRL'].pop('STEADY_STATE', None)
+    text = json.dumps([params, canonical(list(extra))], sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
 
 
 # ******************************************        Isolated Testing        ****************************************** #
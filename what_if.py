@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+"""
+Dock Worker Robot Simulation What-If Routine.
+"""
+
+# ******************************************    Libraries to be imported    ****************************************** #
+from __future__ import print_function, division
+import argparse
+import copy
+import itertools
+import time
+import numpy as np
+from os.path import join
+from sweep import expand_grid, run_sweep
+from result_store import ResultStore
+from result_cache import ResultCache
+from response_surface import ResponseSurface, param_mean, spec_mean
+from simulation_func import METRICS
+from utils import load_params, param_interpreter
+
+# The grid of the stochastic test routine, simulated to build the response surface.
+GRID = [('K', [('triangular', 4, 6, 7), ('triangular', 7, 9, 10), ('triangular', 10, 12, 13)]),
+        ('CSP', [('triangular', 1, 3, 4), ('triangular', 2, 4, 5), ('triangular', 3, 5, 6)]),
+        ('CPT', [('triangular', 0, 2, 3), ('triangular', 1, 3, 4), ('triangular', 2, 4, 5)]),
+        ('CST', [('triangular', 3, 5, 6), ('triangular', 5, 7, 8), ('triangular', 7, 9, 10)])]
+
+
+# ****************************************        Function Declaration        **************************************** #
+def refine_values(values, steps):
+    """
+    This function is used to get the candidate values of a parameter between its grid values.
+    Between two integers, or two distributions of the same kind, steps - 1 values are interpolated and rounded to
+    integers.
+
+    :param list values: The grid values of the parameter.
+    :param int steps: Number of steps between two grid values.
+    :return: The grid values and the interpolated values, in order.
+    :rtype: list
+    """
+    refined = [values[0]]
+    for val_0, val_1 in zip(values[:-1], values[1:]):
+        for step in range(1, steps):
+            if isinstance(val_0, int) and isinstance(val_1, int):
+                refined.append(int(round(val_0 + (val_1 - val_0) * step / steps)))
+            elif isinstance(val_0, tuple) and isinstance(val_1, tuple) and val_0[0] == val_1[0] and \
+                    len(val_0) == len(val_1):
+                refined.append(val_0[:1] + tuple(int(round(arg_0 + (arg_1 - arg_0) * step / steps))
+                                                 for arg_0, arg_1 in zip(val_0[1:], val_1[1:])))
+        refined.append(val_1)
+    return [val for ind, val in enumerate(refined) if val not in refined[:ind]]
+
+
+# ****************************************        Function Declaration        **************************************** #
+def simulate_points(surface, points, args, store, cache):
+    """
+    This function is used to simulate grid points and fit the response surface to them.
+
+    :param ResponseSurface surface: The response surface.
+    :param list[dict] points: The interpreted parameter dictionaries of the grid points.
+    :param args: The program arguments.
+    :param ResultStore store: The result store, or None.
+    :param ResultCache cache: The result cache, or None.
+    """
+    sim_results = run_sweep(points, points[0]['SIM_CTRL']['N'], seed=args.seed, workers=args.workers, store=store,
+                            cache=cache)
+    for ind, point in enumerate(points):
+        surface.add(point, {metric: sim_results[metric][ind] for metric in METRICS})
+    surface.fit()
+    print("Response surface fitted to %d grid points." % len(surface))
+
+
+# ******************************************        Main Program Start      ****************************************** #
+def main(args):
+    """
+    The main of the program.
+    """
+    param_path = join(args.dir_path, args.parameter)
+    param_dict = load_params(param_path)
+
+    store = ResultStore(args.store) if args.store is not None else None
+    cache = ResultCache(args.cache) if args.cache is not None else None
+    try:
+        if args.build:
+            surface = ResponseSurface([name for name, _ in GRID])
+            simulate_points(surface, expand_grid(param_dict, GRID), args, store, cache)
+        else:
+            surface = ResponseSurface.load(args.surface)
+
+        # Every round simulates the candidates between the grid values where the surface is most uncertain.
+        candidates = list(itertools.product(*[refine_values(values, args.steps) for _, values in GRID]))
+        cand_x = np.array([[spec_mean(val) for val in candidate] for candidate in candidates])
+        for _ in range(args.refine):
+            rel_std = np.zeros(len(candidates))
+            for metric in args.metrics:
+                mean, std = surface.predict(cand_x, metric)
+                rel_std = np.fmax(rel_std, std / np.maximum(np.abs(mean), 1e-9))
+            chosen = [ind for ind in np.argsort(-rel_std)[:args.points] if rel_std[ind] > args.tolerance]
+            if not chosen:
+                print("Relative deviation of the response surface below %s everywhere." % args.tolerance)
+                break
+            print("Simulating %d grid points of relative deviation up to %2.4f." % (len(chosen), rel_std[chosen[0]]))
+            points = [expand_grid(param_dict, [(name, [val]) for (name, _), val in zip(GRID, candidates[ind])])
+                      for ind in chosen]
+            points = [point for grid_points in points for point in grid_points]
+            simulate_points(surface, points, args, store, cache)
+    finally:
+        if store is not None:
+            store.close()
+
+    if args.build or args.refine:
+        surface.save(args.surface)
+
+    if args.query is not None:
+        # The parameters not given keep the value of the parameter file.
+        base_params = param_interpreter(copy.deepcopy(param_dict))
+        query = {name: param_mean(base_params, name) for name in surface.names}
+        for item in args.query:
+            name, val = item.split('=')
+            if name not in query:
+                raise ValueError("Parameter %s is not a coordinate of the response surface %s." % (name, surface.names))
+            query[name] = float(val)
+        query_x = np.array([query[name] for name in surface.names])
+
+        print(', '.join('%s = %s' % (name, query[name]) for name in surface.names))
+        for metric in METRICS:
+            start = time.perf_counter()
+            mean, std = surface.predict(query_x, metric)
+            print("%s: %2.4f +/- %2.4f (%2.1f us)" % (metric, mean, std, 1e6 * (time.perf_counter() - start)))
+
+
+# ******************************************        Main Program End        ****************************************** #
+if __name__ == '__main__':
+
+    argparser = argparse.ArgumentParser(description='DWRS What-If Routine.')
+
+    argparser.add_argument('--dir_path', default='./', type=str, help='Directory path of parameter file.')
+    argparser.add_argument('-p', '--parameter', default='parameters.py', type=str, help='Name of the parameter file.')
+    argparser.add_argument('-s', '--seed', default=None, type=int, help='Set seed for repeating executions')
+    argparser.add_argument('-k', '--workers', default=1, type=int, help='Number of worker processes for replications.')
+    argparser.add_argument('--store', default=None, type=str, help='Path of a result store to checkpoint and resume.')
+    argparser.add_argument('--cache', default=None, type=str, help='Directory of the result cache.')
+    argparser.add_argument('--surface', default='./test_results/response_surface.npz', type=str,
+                           help='Path of the response surface file.')
+    argparser.add_argument('-b', '--build', action='store_true', help='Build the response surface from the test grid.')
+    argparser.add_argument('-r', '--refine', default=0, type=int, help='Number of refinement rounds.')
+    argparser.add_argument('--points', default=8, type=int, help='Maximum grid points simulated per refinement round.')
+    argparser.add_argument('--steps', default=3, type=int, help='Refinement steps between two values of the test grid.')
+    argparser.add_argument('--tolerance', default=0.02, type=float,
+                           help='Relative deviation below which grid points are not simulated.')
+    argparser.add_argument('--metrics', default=list(METRICS), nargs='+', choices=METRICS,
+                           help='Metrics whose deviation decides the refinement.')
+    argparser.add_argument('-q', '--query', default=None, nargs='*', metavar='NAME=MEAN',
+                           help='Predict the metrics for the given parameter means, e.g. -q K=9 CST=7.')
+
+    sim_args = argparser.parse_args()
+
+    print(__doc__)
+
+    try:
+        main(sim_args)
+        print('\nFile executed successfully!\n')
+    except KeyboardInterrupt:
+        print('\nProcess interrupted by user. Bye!')
+
+"""
+Author(s): Yash Bansod, Shivam Mishra
+Repository: https://github.com/YashBansod
+Organization: University of Maryland at College Park
+"""